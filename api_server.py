@@ -0,0 +1,355 @@
+"""
+Headless HTTP/JSON API serving the latest MarketAnalyzer snapshot.
+
+A single background task refreshes the analysis and keeps the latest snapshot in memory,
+so any number of clients can poll or subscribe without adding upstream load.
+
+Endpoints:
+    GET /health                     -> service status, snapshot version and skipped work per stage
+    GET /signals                    -> scalar signals per board + style/macro/AI verdict
+    GET /boards/<key>/series        -> daily bars + EMA200 for a board (sh / sz / cyb)
+    GET /macro/<margin|money>       -> macro history table
+    GET /events                     -> server-sent events, one "snapshot" event per changed refresh
+
+Tables accept ?format=arrow for an Arrow IPC stream (requires pyarrow).
+Every response carries an ETag; If-None-Match returns 304 Not Modified.
+
+Usage:
+    python api_server.py --host 127.0.0.1 --port 8765
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+from urllib.parse import urlsplit, parse_qs
+
+from core import alerts, snapshot
+from framework.timezone_utils import get_beijing_now, is_trading_hours
+
+TRADING_REFRESH_SECONDS = 10
+CLOSED_REFRESH_SECONDS = 300
+SSE_KEEPALIVE_SECONDS = 15
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    406: "Not Acceptable",
+    503: "Service Unavailable"
+}
+
+
+class SnapshotService:
+    """
+    Owns the analyzer and the latest snapshot.
+    Encoded response bodies are cached per snapshot version, so repeated requests
+    cost a dict lookup instead of re-serializing DataFrames.
+    """
+
+    def __init__(self, analyzer=None, api_key=None, model_name='gemini-3-pro-preview', alert_engine=None,
+                 journal=None, poller=None):
+        if analyzer is None:
+            from core.market_logic import MarketAnalyzer
+            analyzer = MarketAnalyzer(api_key=api_key, model_name=model_name,
+                                      tick_store=poller.store if poller is not None else None)
+        self.analyzer = analyzer
+        self.alert_engine = alert_engine
+        # Quote collector whose priorities follow the alert engine's threshold distances
+        self.poller = poller
+        self.journal = journal
+        self.result = None
+        self.version = 0
+        self.updated_at = None
+        self.last_error = None
+        self._bodies = {}
+        self._subscribers = set()
+
+    async def refresh(self):
+        """Run one analysis off the event loop and publish it if it succeeded."""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.analyzer.analyze_market_status)
+        if "error" in result:
+            self.last_error = result["error"]
+            print(f"Snapshot refresh failed: {result['error']}")
+            return False
+        self.last_error = None
+        if result is self.result:
+            # Unchanged inputs: the analyzer returned the published snapshot, so version, ETags,
+            # subscribers, journal and alerts all stay as they are
+            return True
+
+        self.result = result
+        self.version += 1
+        self.updated_at = get_beijing_now()
+        self._bodies = {}
+        self._broadcast()
+        if self.journal is not None:
+            self.journal.record(result)
+        if self.alert_engine is not None:
+            self.alert_engine.process(alerts.analysis_frame(result))
+            if self.poller is not None:
+                self.poller.set_alert_distance(self.alert_engine.threshold_distance())
+        return True
+
+    async def run_forever(self):
+        """Refresh every 10s during trading hours, every 5 minutes otherwise."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Snapshot refresh exception: {e}")
+            delay = TRADING_REFRESH_SECONDS if is_trading_hours() else CLOSED_REFRESH_SECONDS
+            await asyncio.sleep(delay)
+
+    # --- Response bodies ---
+
+    def body(self, route, fmt="json"):
+        """
+        Encoded body for a route at the current version.
+        Returns: (bytes, content_type, etag) or None if the route has no data.
+        """
+        cache_key = (route, fmt)
+        if cache_key not in self._bodies:
+            self._bodies[cache_key] = self._encode(route, fmt)
+        return self._bodies[cache_key]
+
+    def _encode(self, route, fmt):
+        if route == "signals":
+            payload = snapshot.extract_signals(self.result)
+        elif route.startswith("boards/") and route.endswith("/series"):
+            payload = snapshot.board_series(self.result, route.split("/")[1])
+        elif route.startswith("macro/"):
+            payload = snapshot.macro_history(self.result, route.split("/")[1])
+        else:
+            payload = None
+
+        if payload is None:
+            return None
+
+        if fmt == "arrow":
+            if not hasattr(payload, "columns"):
+                return None
+            data = snapshot.frame_to_arrow(payload)
+            content_type = "application/vnd.apache.arrow.stream"
+        else:
+            data = snapshot.dumps(payload)
+            content_type = "application/json; charset=utf-8"
+
+        etag = '"%d-%s"' % (self.version, hashlib.sha1(data).hexdigest()[:16])
+        return data, content_type, etag
+
+    # --- Server-sent events ---
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def event_message(self):
+        """SSE frame for the current snapshot (signals only, encoded once per version)."""
+        encoded = self.body("signals")
+        if encoded is None:
+            return None
+        data = encoded[0].decode("utf-8")
+        return f"id: {self.version}\nevent: snapshot\ndata: {data}\n\n".encode("utf-8")
+
+    def _broadcast(self):
+        message = self.event_message()
+        if message is None:
+            return
+        for queue in list(self._subscribers):
+            # Slow subscribers only need the latest snapshot: drop the stale one
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(message)
+
+
+class ApiServer:
+    """Minimal HTTP/1.1 server on asyncio streams (no framework dependency)."""
+
+    def __init__(self, service, host="127.0.0.1", port=8765):
+        self.service = service
+        self.host = host
+        self.port = port
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        refresher = asyncio.create_task(self.service.run_forever())
+        print(f"Snapshot API listening on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                if method != "GET":
+                    await self._respond(writer, 405, b"", keep_alive=keep_alive)
+                elif urlsplit(target).path == "/events":
+                    await self._stream_events(writer)
+                    break
+                else:
+                    await self._route(writer, target, headers, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return None
+
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _route(self, writer, target, headers, keep_alive):
+        url = urlsplit(target)
+        route = url.path.strip("/")
+        fmt = parse_qs(url.query).get("format", ["json"])[0]
+        service = self.service
+
+        if route == "health":
+            body = snapshot.dumps({
+                "version": service.version,
+                "updated_at": service.updated_at,
+                "last_error": service.last_error,
+                "skipped": service.analyzer.skip_stats() if hasattr(service.analyzer, "skip_stats") else {}
+            })
+            await self._respond(writer, 200, body, keep_alive=keep_alive)
+            return
+
+        if fmt not in ("json", "arrow"):
+            await self._respond(writer, 400, b"unsupported format", keep_alive=keep_alive)
+            return
+        if service.result is None:
+            await self._respond(writer, 503, b"snapshot not ready", keep_alive=keep_alive)
+            return
+
+        try:
+            encoded = service.body(route, fmt)
+        except ImportError:
+            await self._respond(writer, 406, b"arrow output requires pyarrow", keep_alive=keep_alive)
+            return
+        if encoded is None:
+            await self._respond(writer, 404, b"not found", keep_alive=keep_alive)
+            return
+
+        data, content_type, etag = encoded
+        if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+            await self._respond(writer, 304, b"", etag=etag, keep_alive=keep_alive)
+        else:
+            await self._respond(writer, 200, data, content_type=content_type, etag=etag, keep_alive=keep_alive)
+
+    async def _respond(self, writer, status, body, content_type="text/plain; charset=utf-8", etag=None, keep_alive=True):
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        if status != 304:
+            head.append(f"Content-Type: {content_type}")
+        head.append(f"Content-Length: {len(body)}")
+        if etag:
+            head.append(f"ETag: {etag}")
+            head.append("Cache-Control: no-cache")
+        head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: keep-alive\r\n\r\n")
+        queue = self.service.subscribe()
+        try:
+            # Send the current snapshot immediately so new subscribers don't wait a cycle
+            message = self.service.event_message() if self.service.result is not None else None
+            if message:
+                writer.write(message)
+            await writer.drain()
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = b": keep-alive\n\n"
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.service.unsubscribe(queue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve MarketAnalyzer snapshots over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--alerts", nargs="?", const="default", default=None,
+                        help="enable alerts (optionally with a JSON rule file)")
+    parser.add_argument("--alert-log", default=None, help="append alerts to this JSON Lines file")
+    parser.add_argument("--alert-webhook", default=None, help="POST alerts to this URL")
+    parser.add_argument("--journal", default=None, help="record every snapshot into this journal directory")
+    args = parser.parse_args()
+
+    engine, poller = None, None
+    if args.alerts:
+        rules = None if args.alerts == "default" else alerts.load_rules(args.alerts)
+        sinks = [alerts.StdoutSink()]
+        if args.alert_log:
+            sinks.append(alerts.FileSink(args.alert_log))
+        if args.alert_webhook:
+            sinks.append(alerts.WebhookSink(args.alert_webhook))
+        engine = alerts.AlertEngine(rules, sinks)
+        # Quotes come from a background collector that polls near-threshold codes more often
+        from core.market_logic import BOARDS
+        from framework.quote_poller import QuotePoller
+        codes = [b["code"] for b in BOARDS.values()]
+        poller = QuotePoller(codes).start()
+
+    journal = None
+    if args.journal:
+        from core.signal_journal import SignalJournal
+        journal = SignalJournal(args.journal).start()
+
+    service = SnapshotService(api_key=os.getenv("GEMINI_API_KEY"), alert_engine=engine, journal=journal,
+                              poller=poller)
+    try:
+        asyncio.run(ApiServer(service, args.host, args.port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.stop()
+        if poller is not None:
+            poller.stop()
+
+
+if __name__ == "__main__":
+    main()
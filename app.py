@@ -4,10 +4,32 @@ import plotly.express as px
 from datetime import datetime
 import pytz
 
-from core.market_logic import MarketAnalyzer
+from core.market_logic import MarketAnalyzer, BOARDS
+from core.market_map import MarketMap, COLOR_RANGE, COLOR_SCALE
+from core.commentary import CommentaryScheduler, default_model, sector_summaries
+from core.signal_journal import SignalJournal
+from core import alerts
+from framework.quote_poller import QuotePoller
+from framework.macro_registry import MacroScheduler
+from framework.universe import fetch_sectors
+from framework.timezone_utils import is_trading_hours
+from framework import validation
+from framework.fingerprint import ChangeGate, bars_fingerprint, digest
+from framework.shared_panel import ENV_PANEL_NAME
 import pandas as pd
 import os
 
+# Labels of framework.validation flags in data-quality captions
+VALIDATION_LABELS = {
+    "zero_volume": "零成交",
+    "missing_volume": "缺成交量",
+    "unit_jump": "单位跳变",
+    "stale": "重复K线",
+    "duplicate_day": "重复日期",
+    "gap": "缺失交易日",
+    "outlier_return": "异常涨跌"
+}
+
 st.set_page_config(page_title="Macro Market Dashboard (Real-time + AI)", layout="wide", page_icon="📈")
 
 # Sidebar Configuration
@@ -29,31 +51,97 @@ with st.sidebar:
     
     st.info("Data Sources:\n- Quotes: Tencent Finance (Real-time)\n- Macro: AkShare (Daily/Monthly)\n- Analysis: Gemini 3 Pro")
 
-def is_trading_hours():
-    """Check if current Beijing time is within trading hours"""
-    beijing_tz = pytz.timezone('Asia/Shanghai')
-    now = datetime.now(beijing_tz)
-    
-    # Weekend check
-    if now.weekday() >= 5:  # Saturday=5, Sunday=6
-        return False
-    
-    # Trading hours: 9:00-11:30, 13:00-15:00
-    current_time = now.time()
-    morning_start = datetime.strptime("09:00", "%H:%M").time()
-    morning_end = datetime.strptime("11:30", "%H:%M").time()
-    afternoon_start = datetime.strptime("13:00", "%H:%M").time()
-    afternoon_end = datetime.strptime("15:00", "%H:%M").time()
-    
-    return (morning_start <= current_time <= morning_end) or \
-           (afternoon_start <= current_time <= afternoon_end)
+@st.cache_resource
+def get_quote_poller():
+    """One background quote collector per server process; reruns read its tick store."""
+    codes = [b["code"] for b in BOARDS.values()]
+    return QuotePoller(codes, watch=codes).start()
+
+@st.cache_resource
+def get_macro_scheduler():
+    """
+    Background macro fetcher; pages read its store and never call AkShare themselves.
+    With a shared panel the collector fetches for the host and this only reloads its cache.
+    """
+    return MacroScheduler(fetch=os.getenv(ENV_PANEL_NAME) is None).start()
+
+@st.cache_resource
+def get_commentary(key=None, model="gemini-3-pro-preview"):
+    """Per-board/per-sector commentary within the model's token budget (None without a model)."""
+    ai_model = default_model(key, model)
+    return CommentaryScheduler(ai_model) if ai_model is not None else None
+
+@st.cache_resource
+def get_analyzer(key=None, model="gemini-3-pro-preview"):
+    """Long-lived analyzer: keeps the daily (slow tier) state so reruns only refresh quotes."""
+    return MarketAnalyzer(api_key=key, model_name=model, tick_store=get_quote_poller().store,
+                          macro_store=get_macro_scheduler().store,
+                          commentary_scheduler=get_commentary(key, model))
+
+@st.cache_resource
+def get_journal():
+    """Signal journal shared by all sessions; writes happen on its own thread."""
+    return SignalJournal().start()
+
+@st.cache_resource
+def get_alert_engine():
+    """Default alert rules without sinks: only tracks threshold distances for poll priorities."""
+    return alerts.AlertEngine()
 
 @st.cache_data(ttl=10) # Cache for 10 seconds during trading hours
 def get_analysis(key=None, model="gemini-3-pro-preview", cache_key=None):
     """Fetch market analysis. cache_key prevents updates outside trading hours."""
     # Pass key to analyzer
-    analyzer = MarketAnalyzer(api_key=key, model_name=model)
-    return analyzer.analyze_market_status()
+    analyzer = get_analyzer(key=key, model=model)
+    previous = analyzer.last_result
+    result = analyzer.analyze_market_status()
+    # Runs once per refresh (cache miss), not once per viewer; unchanged inputs return the
+    # previous result object, which is already journaled
+    if result is not previous:
+        get_journal().record(result)
+        if "error" not in result:
+            # Codes close to an alert threshold get polled more often
+            engine = get_alert_engine()
+            engine.process(alerts.analysis_frame(result))
+            get_quote_poller().set_alert_distance(engine.threshold_distance())
+    return result
+
+@st.cache_resource
+def get_chart_gate():
+    """Figures per (chart, board, timeframe), rebuilt only when the plotted bars' fingerprint changes."""
+    return ChangeGate(max_entries=64)
+
+@st.cache_data(ttl=24 * 3600)
+def get_sectors():
+    """Industry/board per stock (classification changes rarely)."""
+    return fetch_sectors()
+
+@st.cache_data(ttl=10, max_entries=2)
+def get_market_map(cache_key=None):
+    """
+    Full-market quotes aggregated once per refresh; sessions only draw the result.
+    Quotes come from the background poller's tick store: the universe is registered there at
+    low priority (seeded once, then refreshed under the poller's request budget in session),
+    so a rerun never fetches the market itself.
+    """
+    sectors = get_sectors()
+    if sectors.empty:
+        return None
+    poller = get_quote_poller()
+    poller.add_codes(sectors.index, seed=True)
+    return MarketMap(poller.store.latest_quotes(list(sectors.index)), sectors)
+
+@st.cache_data(ttl=10, max_entries=4)
+def get_sector_commentary(by, key=None, model="gemini-3-pro-preview", cache_key=None):
+    """{group: comment} for the market-map tiles; only groups whose signals changed are re-asked."""
+    scheduler = get_commentary(key, model)
+    market_map = get_market_map(cache_key)
+    if scheduler is None or market_map is None:
+        return {}
+    summaries = sector_summaries(market_map.tiles(by), by)
+    scheduler.submit(summaries)
+    scheduler.run_once()
+    return {s["name"]: (scheduler.get(s["id"]) or {}).get("comment") for s in summaries}
 
 def main():
     st.title("🛡️ A股宏观战法看板 (Live)")
@@ -72,9 +160,11 @@ def main():
             cache_key = now.strftime("%Y-%m-%d-CLOSED")
         
         # Use session state to store key if needed, or just pass from sidebar
+        analysis_key = api_key if 'api_key' in locals() and api_key else None
+        analysis_model = model_name if 'model_name' in locals() and model_name else "gemini-3-pro-preview"
         data = get_analysis(
-            key=api_key if 'api_key' in locals() and api_key else None, 
-            model=model_name if 'model_name' in locals() and model_name else "gemini-3-pro-preview",
+            key=analysis_key, 
+            model=analysis_model,
             cache_key=cache_key
         )
         
@@ -202,6 +292,12 @@ def main():
             st.plotly_chart(fig_money, use_container_width=True)
     st.caption("数据来源: 两融数据 (沪深交易所 via AkShare) / 货币供应 (中国人民银行 via AkShare)")
 
+    # Every registered macro series, read from the local cache (fetched in the background)
+    with st.expander("宏观指标一览 (Macro Series)"):
+        macro_table = get_macro_scheduler().store.latest()
+        macro_table['date'] = pd.to_datetime(macro_table['date']).dt.strftime('%Y-%m-%d')
+        st.dataframe(macro_table[['title', 'value', 'unit', 'date']], use_container_width=True)
+
     st.divider()
 
     # Display last update time with Beijing timezone
@@ -239,6 +335,11 @@ def main():
         st.caption(f"🔄 最后更新: {current_time} | ✅ 交易时间 - 数据每10秒自动刷新")
     else:
         st.caption(f"🔄 最后更新: {current_time} | ⏸️ 非交易时间 - 数据已暂停刷新")
+    # Work skipped because upstream fingerprints were unchanged (skips / evaluations per stage)
+    skip_stats = get_analyzer(key=analysis_key, model=analysis_model).skip_stats()
+    if skip_stats:
+        st.caption("♻️ 输入未变化跳过: " + ", ".join(
+            f"{stage} {c['skips']}/{c['runs'] + c['skips']}" for stage, c in skip_stats.items()))
     
     # Grid for Boards
     cols = st.columns(3)
@@ -292,7 +393,9 @@ def main():
     st.divider()
     
     # --- Detailed Charts ---
-    tab1, tab2, tab3 = st.tabs(["趋势与K线", "资金成交量", "风格轮动"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["趋势与K线", "资金成交量", "风格轮动", "信号历史", "全市场"])
+    # Indicator series are shared with the analyzer: each is computed once per data version
+    indicator_cache = get_analyzer(key=analysis_key, model=analysis_model).indicator_cache
     
     # Chart Helper
     def plot_board_charts(chart_func):
@@ -309,34 +412,71 @@ def main():
 
     with tab1:
         st.caption("蓝色线为EMA200牛熊分界线。线上做多，线下防守。")
+        # All timeframes are served from the analyzer's bar cache: switching never hits the network
+        timeframes = {"日K": "day", "周K": "week", "月K": "month", "60分": "60m", "30分": "30m", "15分": "15m", "5分": "5m"}
+        tf_label = st.radio("周期", list(timeframes), horizontal=True)
+        timeframe = timeframes[tf_label]
+        bar_cache = get_analyzer(key=analysis_key, model=analysis_model).bar_cache
+        
         def chart_trend(df, info):
-            fig = go.Figure()
-            # Convert index to string to avoid gap rendering issues if type=category doesn't work perfectly with datetimes
-            # But usually type='category' is enough. 
-            # To ensure clean labels, we can filter ticks.
+            commentary = info.get("commentary")
+            if commentary:
+                st.caption(f"🤖 {commentary.get('verdict') or ''} {commentary.get('comment') or ''}")
+            if timeframe != "day":
+                df = bar_cache.get(info['code'], timeframe)
+                if df.empty:
+                    st.warning("暂无该周期数据")
+                    return
+            date_fmt = '%m-%d %H:%M' if timeframe.endswith('m') else '%Y-%m-%d'
+            # The build id changes with every rebuild, e.g. after a corporate action rewrote
+            # adjusted history that the last bar alone would not reveal
+            version = (info['build_id'], bars_fingerprint(df))
+            def build():
+                # Daily EMA200 (live value included) comes with the analysis; other timeframes use the cache
+                if timeframe == "day":
+                    ema = info['trend']['series']
+                else:
+                    ema = indicator_cache.get((info['code'], timeframe), "ema", df, version, span=200)
+                fig = go.Figure()
+                # Convert index to string to avoid gap rendering issues if type=category doesn't work perfectly with datetimes
+                # But usually type='category' is enough. 
+                # To ensure clean labels, we can filter ticks.
             
-            # Colors: Red Up, Green Down (A-Share style)
-            fig.add_trace(go.Candlestick(x=df.index.strftime('%Y-%m-%d'), # Use string dates for categorical axis
-                            open=df['open'], high=df['high'],
-                            low=df['low'], close=df['close'], name='K线',
-                            increasing_line_color='red', decreasing_line_color='green'))
+                # Colors: Red Up, Green Down (A-Share style)
+                fig.add_trace(go.Candlestick(x=df.index.strftime(date_fmt), # Use string dates for categorical axis
+                                open=df['open'], high=df['high'],
+                                low=df['low'], close=df['close'], name='K线',
+                                increasing_line_color='red', decreasing_line_color='green'))
                             
-            fig.add_trace(go.Scatter(x=df.index.strftime('%Y-%m-%d'), 
-                                     y=df['close'].ewm(span=200, adjust=False).mean(), 
-                                     name='EMA200', 
-                                     line=dict(color='blue', width=2)))
+                fig.add_trace(go.Scatter(x=df.index.strftime(date_fmt), 
+                                         y=ema, 
+                                         name='EMA200', 
+                                         line=dict(color='blue', width=2)))
             
-            # Layout: Remove gaps using category axis
-            fig.update_layout(
-                xaxis_rangeslider_visible=False, 
-                height=400,
-                xaxis=dict(
-                    type='category', 
-                    nticks=10, # Avoid overcrowding labels
-                    tickangle=-45
+                # Layout: Remove gaps using category axis
+                fig.update_layout(
+                    xaxis_rangeslider_visible=False, 
+                    height=400,
+                    xaxis=dict(
+                        type='category', 
+                        nticks=10, # Avoid overcrowding labels
+                        tickangle=-45
+                    )
                 )
-            )
+                return fig
+
+            # Reruns with unchanged bars reuse the figure instead of rebuilding it
+            fig = get_chart_gate().run(("trend", info['code'], timeframe), version, build)
             st.plotly_chart(fig, use_container_width=True)
+            
+            # Intraday 1-minute closes collected by the background poller
+            intraday = info.get('intraday')
+            if intraday is not None and not intraday.empty:
+                intraday = intraday[intraday.index.normalize() == intraday.index[-1].normalize()]
+                fig_intraday = go.Figure(go.Scatter(x=intraday.index, y=intraday['close'], name='分时',
+                                                    line=dict(color='purple', width=1.5)))
+                fig_intraday.update_layout(title="分时走势 (1分钟)", height=250, margin=dict(l=0, r=0, t=30, b=0))
+                st.plotly_chart(fig_intraday, use_container_width=True)
         plot_board_charts(chart_trend)
         
     with tab2:
@@ -344,93 +484,92 @@ def main():
         def chart_funding(df, info):
             # Filter to show only recent 90 days for better visualization
             df_display = df.tail(90)
-            
-            # Debug: Show data info
-            if len(df_display) > 0:
-                vol_min = df_display['volume'].min()
-                vol_max = df_display['volume'].max()
-                vol_mean = df_display['volume'].mean()
-                zero_count = (df_display['volume'] == 0).sum()
-                non_zero_count = (df_display['volume'] > 0).sum()
-                
-                st.info(f"📊 数据范围: {df_display.index.min().strftime('%Y-%m-%d')} 至 {df_display.index.max().strftime('%Y-%m-%d')} | 共 {len(df_display)} 个交易日")
-                st.caption(f"🔍 成交量统计: 最小={vol_min:,.0f}, 最大={vol_max:,.0f}, 均值={vol_mean:,.0f} | 零值天数={zero_count}, 非零天数={non_zero_count}")
-                
-                # Check if data is problematic
-                if zero_count > len(df_display) * 0.9:
-                    st.error("❌ 数据异常: 90%以上的交易日成交量为0，请检查数据源")
-                    return
-            else:
+            if len(df_display) == 0:
                 st.warning("⚠️ 无成交量数据")
                 return
-            
-            # Filter out zero/null values for better visualization
-            df_filtered = df_display[df_display['volume'] > 0].copy()
-            
-            if len(df_filtered) == 0:
-                st.error("❌ 所有交易日成交量均为0")
+
+            # Validation flags were computed when the bars were loaded (framework/validation.py)
+            flags_all = (info["flags"] if "flags" in info else validation.validate_bars(df)).to_numpy()
+            flags = flags_all[-len(df_display):]
+            traded = (flags & validation.NO_VOLUME) == 0
+            st.info(f"📊 数据范围: {df_display.index.min().strftime('%Y-%m-%d')} 至 {df_display.index.max().strftime('%Y-%m-%d')} | 共 {len(df_display)} 个交易日")
+            issues = validation.summarize(flags)
+            if issues:
+                st.caption("🔍 数据校验: " + ", ".join(f"{VALIDATION_LABELS.get(k, k)} {v}天" for k, v in issues.items()))
+
+            # Check if data is problematic
+            if traded.sum() < len(df_display) * 0.1:
+                st.error("❌ 数据异常: 90%以上的交易日成交量为0，请检查数据源")
                 return
-            
+
+            # Filter out zero/null values for better visualization
+            df_filtered = df_display[traded]
+
             st.caption(f"📈 实际绘制 {len(df_filtered)} 个非零成交量交易日")
+            fingerprint = (info.get('build_id'), digest(bars_fingerprint(df_display), flags.tobytes()))
             
-            fig = go.Figure()
+            def build():
+                fig = go.Figure()
             
-            # Volume Colors: Red if Close > Open, Green if Close <= Open
-            # Need to iterate or use vector logic. 
-            # Simple vector:
-            colors = ['red' if c > o else 'green' for c, o in zip(df_filtered['close'], df_filtered['open'])]
+                # Volume Colors: Red if Close > Open, Green if Close <= Open
+                # Need to iterate or use vector logic. 
+                # Simple vector:
+                colors = ['red' if c > o else 'green' for c, o in zip(df_filtered['close'], df_filtered['open'])]
             
-            # Convert dates to string for categorical axis
-            x_dates = df_filtered.index.strftime('%Y-%m-%d').tolist()
+                # Convert dates to string for categorical axis
+                x_dates = df_filtered.index.strftime('%Y-%m-%d').tolist()
             
-            fig.add_trace(go.Bar(
-                x=x_dates, 
-                y=df_filtered['volume'].tolist(), 
-                name='成交量', 
-                marker_color=colors,
-                hovertemplate='日期: %{x}<br>成交量: %{y:,.0f} 手<extra></extra>'
-            ))
+                fig.add_trace(go.Bar(
+                    x=x_dates, 
+                    y=df_filtered['volume'].tolist(), 
+                    name='成交量', 
+                    marker_color=colors,
+                    hovertemplate='日期: %{x}<br>成交量: %{y:,.0f} 手<extra></extra>'
+                ))
                                  
-            # Calculate MA20 on filtered data
-            ma20_values = df_filtered['volume'].rolling(20, min_periods=1).mean()
+                # The Funding signal's MA20 series (all traded days, live value appended by the analyzer)
+                ma20_values = info['funding']['series'].reindex(df_filtered.index)
             
-            fig.add_trace(go.Scatter(
-                x=x_dates, 
-                y=ma20_values.tolist(), 
-                name='MA20', 
-                line=dict(color='orange', width=2),
-                hovertemplate='日期: %{x}<br>MA20: %{y:,.0f}<extra></extra>'
-            ))
+                fig.add_trace(go.Scatter(
+                    x=x_dates, 
+                    y=ma20_values.tolist(), 
+                    name='MA20', 
+                    line=dict(color='orange', width=2),
+                    hovertemplate='日期: %{x}<br>MA20: %{y:,.0f}<extra></extra>'
+                ))
                                      
-            fig.update_layout(
-                height=400,
-                xaxis=dict(
-                    type='category',
-                    showgrid=True,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickangle=-45,
-                    # Ensure all dates are shown
-                    tickmode='auto',
-                    nticks=20
-                ),
-                yaxis=dict(
-                    title='成交量 (手)',
-                    showgrid=True,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    rangemode='tozero'  # Start from zero
-                ),
-                title=f"成交量 (最近90日: {df_display.index.min().strftime('%Y-%m-%d')} ~ {df_display.index.max().strftime('%Y-%m-%d')}) - 单位: 手",
-                hovermode='x unified',
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                ),
-                bargap=0.1  # Small gap between bars
-            )
+                fig.update_layout(
+                    height=400,
+                    xaxis=dict(
+                        type='category',
+                        showgrid=True,
+                        gridcolor='rgba(128,128,128,0.2)',
+                        tickangle=-45,
+                        # Ensure all dates are shown
+                        tickmode='auto',
+                        nticks=20
+                    ),
+                    yaxis=dict(
+                        title='成交量 (手)',
+                        showgrid=True,
+                        gridcolor='rgba(128,128,128,0.2)',
+                        rangemode='tozero'  # Start from zero
+                    ),
+                    title=f"成交量 (最近90日: {df_display.index.min().strftime('%Y-%m-%d')} ~ {df_display.index.max().strftime('%Y-%m-%d')}) - 单位: 手",
+                    hovermode='x unified',
+                    showlegend=True,
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="right",
+                        x=1
+                    ),
+                    bargap=0.1  # Small gap between bars
+                )
+                return fig
+
+            fig = get_chart_gate().run(("funding", info['code']), fingerprint, build)
             st.plotly_chart(fig, use_container_width=True)
         plot_board_charts(chart_funding)
         
@@ -454,5 +593,73 @@ def main():
         else:
             st.write("数据不足")
 
+        correlation = data.get('correlation') or {}
+        if "error" not in correlation and correlation:
+            names = correlation['names']
+            st.subheader(f"指数联动: {correlation['status']}")
+            for item in correlation['decoupled']:
+                a, b = (names.get(c, c) for c in item['pair'])
+                st.warning(f"{a} / {b} 相关性走弱: 20日 {item['short']:.2f} (120日 {item['long']:.2f})")
+            table = correlation['vs_benchmark'].rename(index=names).round(2)
+            st.caption(f"滚动相关系数与Beta (相对{names.get(correlation['benchmark'], correlation['benchmark'])}, 日收益率)")
+            st.dataframe(table, use_container_width=True)
+
+    with tab4:
+        # Signal evolution read back from the journal (no recomputation)
+        span = st.radio("区间", ["今日", "近30天"], horizontal=True, key="journal_span")
+        start = datetime.now(pytz.timezone('Asia/Shanghai')).date()
+        if span != "今日":
+            start = start - pd.Timedelta(days=30)
+        history = get_journal().read(start=start)
+        if history.empty:
+            st.write("暂无记录")
+        else:
+            for field, title in (("bias_20", "乖离率 (%)"), ("ema200_gap", "距EMA200 (%)"), ("volatility_rank", "波动率分位")):
+                fig_hist = go.Figure()
+                for key, board in BOARDS.items():
+                    col = f"{key}_{field}"
+                    if col in history.columns:
+                        fig_hist.add_trace(go.Scatter(x=history['ts'], y=history[col], name=board['name'], mode='lines'))
+                fig_hist.update_layout(title=title, height=280, hovermode="x unified", margin=dict(l=0, r=0, t=30, b=0))
+                st.plotly_chart(fig_hist, use_container_width=True)
+
+    with tab5:
+        # Sector tiles first; stock-level nodes are only sent for the drilled-down group
+        by_label = st.radio("分组", ["行业", "板块"], horizontal=True, key="map_by")
+        by = "industry" if by_label == "行业" else "board"
+        market_map = get_market_map(cache_key)
+        if market_map is None or not len(market_map):
+            st.write("暂无全市场数据 (后台行情加载中)")
+        else:
+            tiles = market_map.tiles(by)
+            choice = st.selectbox("下钻", ["(全部)"] + tiles.index.tolist(), key="map_group")
+            group = None if choice == "(全部)" else choice
+            nodes = market_map.treemap(by, group)
+            fig_map = go.Figure(go.Treemap(
+                ids=nodes["ids"], labels=nodes["labels"], parents=nodes["parents"], values=nodes["values"],
+                text=nodes["text"], textinfo="label+text", branchvalues="remainder",
+                marker=dict(colors=nodes["colors"], colorscale=COLOR_SCALE, cmin=-COLOR_RANGE, cmax=COLOR_RANGE, cmid=0),
+                hovertemplate="%{label}<br>%{text}<br>成交额 %{value:,.0f}<extra></extra>"
+            ))
+            fig_map.update_layout(height=520, margin=dict(l=0, r=0, t=30, b=0),
+                                  title=f"全市场 {len(market_map)} 只 · 面积=成交额 · 颜色=涨跌幅")
+            st.plotly_chart(fig_map, use_container_width=True)
+
+            if group is not None:
+                points = market_map.scatter(by, group)
+                fig_points = go.Figure(go.Scattergl(
+                    x=points["x"], y=points["y"], text=points["text"], mode="markers",
+                    marker=dict(color=points["x"], colorscale=COLOR_SCALE, cmin=-COLOR_RANGE, cmax=COLOR_RANGE, size=6),
+                    hovertemplate="%{text}<br>涨跌幅 %{x:.2f}%<br>成交额 %{y:.2f}亿<extra></extra>"
+                ))
+                fig_points.update_layout(title=f"{group} 个股分布", height=360, yaxis_type="log",
+                                         xaxis_title="涨跌幅 (%)", yaxis_title="成交额 (亿)",
+                                         margin=dict(l=0, r=0, t=30, b=0))
+                st.plotly_chart(fig_points, use_container_width=True)
+            comments = get_sector_commentary(by, analysis_key, analysis_model, cache_key)
+            if any(comments.values()):
+                tiles = tiles.assign(点评=tiles.index.map(lambda g: comments.get(str(g))))
+            st.dataframe(tiles, use_container_width=True)
+
 if __name__ == "__main__":
     main()
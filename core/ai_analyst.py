@@ -1,10 +1,11 @@
-import google.generativeai as genai
 import os
 
 class GeminiAnalyst:
     def __init__(self, api_key=None, model_name='gemini-3-pro-preview'):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if self.api_key:
+            # The SDK is only imported when a key is configured
+            import google.generativeai as genai
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(model_name)
         else:
@@ -14,6 +15,7 @@ class GeminiAnalyst:
         """List available models for the configured API key."""
         if not self.api_key:
             return ["API Key not set"]
+        import google.generativeai as genai
         try:
             return [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
         except Exception as e:
@@ -62,3 +64,25 @@ class GeminiAnalyst:
             if "403" in error_msg or "leaked" in error_msg.lower():
                 return "🚨 **Security Alert**: Your API Key was reported as leaked/invalid by Google. Please generate a NEW key at [Google AI Studio](https://aistudio.google.com/) and update your Streamlit Secrets."
             return f"AI Analysis failed: {error_msg}"
+
+
+class GeminiModel:
+    """
+    JSON-output Gemini model for batched requests (core.commentary).
+    generate(prompt) -> (text, {"prompt_tokens", "completion_tokens"}); raises on failure.
+    """
+
+    def __init__(self, api_key=None, model_name='gemini-3-pro-preview'):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.model_name = model_name
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        self.model = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "application/json"})
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, {
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "completion_tokens": getattr(usage, "candidates_token_count", None)
+        }
@@ -0,0 +1,320 @@
+"""
+Signal alert engine.
+Rules are declarative thresholds on signal fields ("ema200_gap above 0", "scissors below -5").
+After each refresh the engine receives a signal frame (one row per subject: instrument or
+"MACRO", one column per field) and fires only when a rule's state flips, with hysteresis so
+a value hovering at the threshold does not flap. Rules are evaluated at once as a
+(rules x subjects) matrix restricted to subjects whose fields changed since the last frame;
+the state matrix is carried between ticks.
+
+Rule file (JSON list):
+    [{"name": "bias_hot", "field": "bias_20", "above": 5, "hysteresis": 1,
+      "message": "乖离率过热"}, ...]
+"""
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+MACRO_SUBJECT = "MACRO"
+
+
+class Rule:
+    """
+    Active while field > above (or field < below).
+    Once active it stays active until the value retreats `hysteresis` past the threshold.
+    on: transitions that produce alerts ("enter", "exit" or both).
+    subjects: restrict to these subjects (None = every row of the signal frame).
+    """
+
+    def __init__(self, name, field, above=None, below=None, hysteresis=0.0,
+                 on=("enter",), subjects=None, message=None):
+        if (above is None) == (below is None):
+            raise ValueError(f"Rule {name}: exactly one of above/below is required")
+        self.name = name
+        self.field = field
+        self.above = above
+        self.below = below
+        self.hysteresis = abs(hysteresis)
+        self.on = tuple(on)
+        self.subjects = None if subjects is None else set(subjects)
+        self.message = message or name
+
+    @classmethod
+    def from_dict(cls, spec):
+        spec = dict(spec)
+        return cls(spec.pop("name"), spec.pop("field"), **spec)
+
+    @property
+    def threshold(self):
+        return self.above if self.above is not None else self.below
+
+    @property
+    def band(self):
+        """Distance scale near the threshold: the hysteresis, or 10% of |threshold| (min 0.01) without one."""
+        return self.hysteresis or max(0.1 * abs(self.threshold), 0.01)
+
+    @property
+    def sign(self):
+        """+1 for "above" rules, -1 for "below" (evaluated as -value above -threshold)."""
+        return 1.0 if self.above is not None else -1.0
+
+
+# Dashboard defaults: EMA200 crosses, bias beyond +-5%, M1-M2 scissors leaving the -5% zone
+DEFAULT_RULES = [
+    Rule("ema200_up", "ema200_gap", above=0, hysteresis=0.5, message="站上EMA200 (牛熊线)"),
+    Rule("ema200_down", "ema200_gap", below=0, hysteresis=0.5, message="跌破EMA200 (牛熊线)"),
+    Rule("bias_hot", "bias_20", above=5, hysteresis=1, message="乖离率 > 5% (过热)"),
+    Rule("bias_panic", "bias_20", below=-5, hysteresis=1, message="乖离率 < -5% (恐慌)"),
+    Rule("scissors_deep", "scissors", below=-5, hysteresis=0.3, on=("enter", "exit"),
+         subjects=[MACRO_SUBJECT], message="M1-M2剪刀差 -5% 区间")
+]
+
+
+def load_rules(path):
+    """Rules from a JSON file (list of Rule keyword dicts)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [Rule.from_dict(spec) for spec in json.load(f)]
+
+
+def analysis_frame(result):
+    """
+    Signal frame from an analyze_market_status() result: one row per board (canonical
+    code, including its correlation/beta vs the benchmark) plus a MACRO row with the
+    margin/money snapshot.
+    """
+    rows = {}
+    for info in result.get("boards", {}).values():
+        if "error" in info or "trend" not in info:
+            continue
+        price, ema = info["trend"]["current_price"], info["trend"]["ema200"]
+        rows[info["code"]] = {
+            "close": price,
+            "ema200": ema,
+            "ema200_gap": (price / ema - 1) * 100 if ema else np.nan,
+            "bias_20": info["sentiment"]["score"],
+            "panic_score": info["sentiment"]["panic_score"],
+            "volume_ratio": info["funding"]["value"] / info["funding"]["ma20"] if info["funding"]["ma20"] else np.nan,
+            "volatility_rank": info["timing"]["volatility_rank"]
+        }
+
+    # Rolling correlation / beta vs the benchmark board (corr_20, beta_20, ..., corr_120, beta_120)
+    vs_benchmark = result.get("correlation", {}).get("vs_benchmark")
+    if vs_benchmark is not None:
+        for code, values in vs_benchmark.iterrows():
+            if code in rows:
+                rows[code].update(values.to_dict())
+
+    macro = result.get("macro", {})
+    money, margin = macro.get("money") or {}, macro.get("margin") or {}
+    if "error" not in money and money.get("history") is not None:
+        rows[MACRO_SUBJECT] = {
+            "scissors": money.get("scissors"),
+            "m1_yoy": money.get("m1_yoy"),
+            "m2_yoy": money.get("m2_yoy")
+        }
+    if "error" not in margin and margin.get("history") is not None:
+        rows.setdefault(MACRO_SUBJECT, {})["margin_balance"] = margin.get("margin_balance")
+
+    return pd.DataFrame.from_dict(rows, orient="index", dtype="float64")
+
+
+class AlertEngine:
+    """
+    Evaluates rules against successive signal frames.
+    The first frame a subject appears in only establishes its state (no alerts), so a
+    restart does not re-announce every condition that is already true.
+    """
+
+    def __init__(self, rules=None, sinks=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.sinks = list(sinks or [])
+        self._subjects = pd.Index([])
+        self._state = np.zeros((len(self.rules), 0), dtype=bool)
+        self._seen = np.zeros(0, dtype=bool)
+        self._applies_cache = (None, None)
+        self._lock = threading.Lock()
+        self._compile()
+
+    def _compile(self):
+        self._field_names = list(dict.fromkeys(r.field for r in self.rules))
+        self._rule_field = np.array([self._field_names.index(r.field) for r in self.rules], dtype=int)
+        sign = np.array([r.sign for r in self.rules])
+        threshold = np.array([r.threshold for r in self.rules], dtype=float)
+        hysteresis = np.array([r.hysteresis for r in self.rules])
+        # In signed space every rule is "x > enter" to activate and "x >= keep" to stay active
+        self._sign = sign[:, None]
+        self._enter = (sign * threshold)[:, None]
+        self._keep = (sign * threshold - hysteresis)[:, None]
+        self._band = np.array([r.band for r in self.rules])[:, None]
+        self._fire_enter = np.array(["enter" in r.on for r in self.rules])[:, None]
+        self._fire_exit = np.array(["exit" in r.on for r in self.rules])[:, None]
+        self._last = np.full((0, len(self._field_names)), np.nan)
+
+    def process(self, signals, timestamp=None):
+        """
+        Evaluate one signal frame, deliver alerts to the sinks and return them.
+        Subjects missing from the frame (or NaN values) keep their previous state.
+        """
+        if signals is None or signals.empty or not self.rules:
+            return []
+        with self._lock:
+            alerts = self._evaluate(signals, timestamp or time.time())
+        if not alerts:
+            return alerts
+        for sink in self.sinks:
+            try:
+                sink.emit(alerts)
+            except Exception as e:
+                print(f"Alert sink {type(sink).__name__} failed: {e}")
+        return alerts
+
+    def _evaluate(self, signals, timestamp):
+        self._align(signals.index)
+        cols = self._subjects.get_indexer(signals.index)
+        frame = signals.reindex(columns=self._field_names).to_numpy(dtype="float64")
+
+        # Incremental: only subjects whose rule fields changed since the last frame are evaluated
+        last = self._last[cols]
+        same = (frame == last) | (np.isnan(frame) & np.isnan(last))
+        rows = np.flatnonzero(~same.all(axis=1) | ~self._seen[cols])
+        self._last[cols] = frame
+        if len(rows) == 0:
+            return []
+        subjects = cols[rows]
+
+        # (rules x changed subjects) matrix of signed values
+        values = frame[rows][:, self._rule_field].T * self._sign
+        prev = self._state[:, subjects]
+        active = np.where(prev, values >= self._keep, values > self._enter)
+        active = np.where(np.isnan(values), prev, active)
+        applies = self._applies(signals.index)[:, rows]
+
+        seen = self._seen[subjects]
+        entered = active & ~prev & applies & seen & self._fire_enter
+        exited = prev & ~active & applies & seen & self._fire_exit
+
+        self._state[:, subjects] = active & applies
+        self._seen[subjects] = True
+
+        alerts = []
+        for transition, mask in (("enter", entered), ("exit", exited)):
+            rule_idx, col_idx = np.nonzero(mask)
+            names = signals.index[rows[col_idx]]
+            for r, c, subject in zip(rule_idx.tolist(), col_idx.tolist(), names):
+                rule = self.rules[r]
+                alerts.append({
+                    "time": timestamp,
+                    "rule": rule.name,
+                    "subject": subject,
+                    "field": rule.field,
+                    "value": float(values[r, c]) * rule.sign,
+                    "threshold": rule.threshold,
+                    "transition": transition,
+                    "message": rule.message
+                })
+        return alerts
+
+    def _align(self, index):
+        """Grow the state matrix for subjects seen for the first time."""
+        new = index.difference(self._subjects)
+        if len(new) == 0:
+            return
+        self._subjects = self._subjects.append(new)
+        self._state = np.concatenate([self._state, np.zeros((len(self.rules), len(new)), dtype=bool)], axis=1)
+        self._seen = np.concatenate([self._seen, np.zeros(len(new), dtype=bool)])
+        self._last = np.concatenate([self._last, np.full((len(new), len(self._field_names)), np.nan)])
+
+    def _applies(self, index):
+        """(rules x subjects) mask of rule scope; reused while the frame's subjects are unchanged."""
+        cached_index, mask = self._applies_cache
+        if cached_index is not None and cached_index.equals(index):
+            return mask
+        mask = np.ones((len(self.rules), len(index)), dtype=bool)
+        for r, rule in enumerate(self.rules):
+            if rule.subjects is not None:
+                mask[r] = index.isin(rule.subjects)
+        self._applies_cache = (index, mask)
+        return mask
+
+    def threshold_distance(self):
+        """
+        Per subject, distance of its last values to the nearest rule threshold, in units of
+        each rule's band (Rule.band), so fields of different scales (% vs ranks) compare; inf
+        when no rule applies. Feeds QuotePoller priorities: near-threshold codes are polled more.
+        """
+        with self._lock:
+            values = self._last[:, self._rule_field].T * self._sign
+            distance = np.abs(values - self._enter) / self._band
+            for r, rule in enumerate(self.rules):
+                if rule.subjects is not None:
+                    distance[r, ~self._subjects.isin(rule.subjects)] = np.inf
+            distance = np.where(np.isnan(distance), np.inf, distance)
+            nearest = distance.min(axis=0) if len(self.rules) else np.full(len(self._subjects), np.inf)
+            return pd.Series(nearest, index=self._subjects, name="threshold_distance")
+
+    def active(self):
+        """Currently active (rule, subject) pairs."""
+        with self._lock:
+            return [(self.rules[r].name, self._subjects[c]) for r, c in zip(*np.nonzero(self._state))]
+
+
+# --- Sinks ---
+
+def format_alert(alert):
+    verb = "进入" if alert["transition"] == "enter" else "离开"
+    stamp = pd.Timestamp(alert["time"], unit="s", tz="UTC").tz_convert("Asia/Shanghai").strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{stamp}] {alert['subject']} {verb} {alert['message']} ({alert['field']}={alert['value']:.2f})"
+
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def emit(self, alerts):
+        for alert in alerts:
+            print(format_alert(alert), file=self.stream)
+
+
+class FileSink:
+    """Appends alerts to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, alerts):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False, default=str) + "\n")
+
+
+class WebhookSink:
+    """
+    POSTs each batch as JSON to `url`. Without a url it is a stub that only records the
+    payloads in `sent` (useful for local runs and tests); with one nothing is kept.
+    """
+
+    def __init__(self, url=None, timeout=5, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.session = session
+        self.sent = []
+
+    def emit(self, alerts):
+        payload = {"alerts": alerts}
+        if not self.url:
+            self.sent.append(payload)
+            return
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        response = self.session.post(
+            self.url,
+            data=json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
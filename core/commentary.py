@@ -0,0 +1,343 @@
+"""
+Batched, budgeted AI commentary for boards and sectors.
+
+Every subject (a board, an industry or listing-board tile of the market map) is reduced to a
+compact summary: categorical `signals` (what the commentary is about) and a few rounded
+`values`. The CommentaryScheduler
+    - re-requests commentary only for subjects whose signals changed since their last one,
+      most-changed and boards first
+    - packs several subjects into one JSON-output request (one comment per subject id)
+    - stays within a tokens-per-minute and requests-per-minute budget; what does not fit
+      waits for the next run_once()
+    - records prompt/completion tokens and latency per call
+Models implement generate(prompt) -> (text, usage): GeminiModel (core.ai_analyst) online,
+StandinModel here for offline runs and tests.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DEFAULT_TPM = 30000
+DEFAULT_RPM = 10
+MAX_BATCH = 12
+MAX_PROMPT_TOKENS = 4000
+
+# Token estimate for budgeting before the call (mixed Chinese/JSON text); actual usage is
+# recorded afterwards when the model reports it
+CHARS_PER_TOKEN = 2.0
+COMPLETION_TOKENS_PER_ITEM = 80
+
+# Boards are commented before sectors when both changed
+KIND_WEIGHT = {"board": 10, "sector": 0}
+
+VERDICTS = ("偏多", "中性", "偏空")
+ITEMS_MARKER = "ITEMS_JSON:"
+
+# Set to use the StandinModel instead of Gemini (offline runs, load tests)
+STANDIN_ENV = "AMARKET_AI_STANDIN"
+
+PROMPT_HEADER = f"""你是一位专业的A股量化交易员。下面每一行是一个指数或板块的信号摘要
+(signals 为状态, values 为数值: pct_chg 涨跌幅%, ema200_gap 相对EMA200偏离%, bias_20 乖离率%,
+volume_ratio 量比, volatility_rank 波动率分位, breadth 上涨家数占比)。
+请为每个条目给出简短点评, 只输出JSON数组, 每个元素为
+{{"id": 条目id, "verdict": {"/".join(VERDICTS)} 之一, "comment": 不超过60字的中文点评}}。
+"""
+
+
+def default_model(api_key=None, model_name="gemini-3-pro-preview"):
+    """StandinModel if STANDIN_ENV is set, GeminiModel if a key is configured, else None."""
+    if os.getenv(STANDIN_ENV):
+        return StandinModel()
+    if api_key or os.getenv("GEMINI_API_KEY"):
+        from core.ai_analyst import GeminiModel
+        return GeminiModel(api_key, model_name)
+    return None
+
+
+def estimate_tokens(text):
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def board_summary(info):
+    """Summary of one analyze_market_status() board entry."""
+    trend, funding = info["trend"], info["funding"]
+    ema = trend["ema200"]
+    return {
+        "id": f"board:{info['code']}",
+        "kind": "board",
+        "name": info["name"],
+        "signals": {
+            "trend": trend["status"],
+            "funding": funding["status"],
+            "sentiment": info["sentiment"]["status"],
+            "timing": info["timing"]["status"]
+        },
+        "values": {
+            "pct_chg": round(float(info["data"]["pctChg"].iat[-1]), 2),
+            "ema200_gap": round((trend["current_price"] / ema - 1) * 100, 2) if ema else None,
+            "bias_20": round(float(info["sentiment"]["score"]), 2),
+            "volume_ratio": round(funding["value"] / funding["ma20"], 2) if funding["ma20"] else None,
+            "volatility_rank": round(float(info["timing"]["volatility_rank"]), 2)
+        }
+    }
+
+
+def sector_summaries(tiles, by="industry"):
+    """Summaries of market-map tiles (MarketMap.tiles() rows)."""
+    out = []
+    for group, row in tiles.iterrows():
+        pct, count = float(row["pct_chg"]), int(row["count"])
+        breadth = row["advancers"] / count if count else 0.0
+        out.append({
+            "id": f"sector:{by}:{group}",
+            "kind": "sector",
+            "name": str(group),
+            "signals": {
+                "direction": "上涨" if pct > 0.5 else ("下跌" if pct < -0.5 else "持平"),
+                "breadth": "普涨" if breadth > 0.7 else ("普跌" if row["decliners"] / max(count, 1) > 0.7 else "分化")
+            },
+            "values": {
+                "pct_chg": round(pct, 2),
+                "breadth": round(float(breadth), 2),
+                "count": count,
+                "amount_yi": round(float(row["amount"]) / 1e8, 1)
+            }
+        })
+    return out
+
+
+def build_prompt(items):
+    """One request for several subjects; the model echoes each id in its answer."""
+    lines = [json.dumps({k: item[k] for k in ("id", "name", "signals", "values")}, ensure_ascii=False)
+             for item in items]
+    return PROMPT_HEADER + ITEMS_MARKER + "\n" + "\n".join(lines) + "\n"
+
+
+def parse_response(text):
+    """Model output -> {id: {"verdict", "comment"}}; tolerates a ```json fence around the array."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    entries = json.loads(text)
+    if isinstance(entries, dict):
+        entries = entries.get("items", [entries])
+    return {
+        str(e["id"]): {"verdict": e.get("verdict"), "comment": e.get("comment", "")}
+        for e in entries if isinstance(e, dict) and "id" in e
+    }
+
+
+class StandinModel:
+    """
+    Offline stand-in: answers a build_prompt() request with one rule-based comment per item,
+    token counts estimated from the text and an optional fixed latency.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        body = prompt.split(ITEMS_MARKER, 1)[1]
+        answers = []
+        for line in body.strip().splitlines():
+            item = json.loads(line)
+            pct = item["values"].get("pct_chg") or 0.0
+            verdict = VERDICTS[0] if pct > 0.5 else (VERDICTS[2] if pct < -0.5 else VERDICTS[1])
+            answers.append({
+                "id": item["id"],
+                "verdict": verdict,
+                "comment": f"{item['name']}: " + "，".join(str(v) for v in item["signals"].values())
+            })
+        text = json.dumps(answers, ensure_ascii=False)
+        return text, {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+
+
+class TokenBudget:
+    """Sliding one-minute window of requests and tokens."""
+
+    def __init__(self, tpm=DEFAULT_TPM, rpm=DEFAULT_RPM):
+        self.tpm = tpm
+        self.rpm = rpm
+        self._events = deque()   # [time, tokens]
+
+    def _trim(self, now):
+        while self._events and self._events[0][0] <= now - 60:
+            self._events.popleft()
+
+    def allows(self, tokens, now):
+        self._trim(now)
+        used = sum(t for _, t in self._events)
+        return len(self._events) < self.rpm and used + tokens <= self.tpm
+
+    def spend(self, tokens, now):
+        """Record a request; returns its entry so an estimate can be settled to actual usage."""
+        entry = [now, tokens]
+        self._events.append(entry)
+        return entry
+
+    @staticmethod
+    def settle(entry, tokens):
+        entry[1] = tokens
+
+    def usage(self, now):
+        self._trim(now)
+        return {"requests": len(self._events), "tokens": sum(t for _, t in self._events)}
+
+
+class CommentaryScheduler:
+    """
+    Keeps one commentary per subject id up to date within the budget.
+    submit() registers the latest summaries, run_once() sends as many batched requests as the
+    budget allows, get() returns the last commentary of a subject.
+    """
+
+    def __init__(self, model, tpm=DEFAULT_TPM, rpm=DEFAULT_RPM, max_batch=MAX_BATCH,
+                 max_prompt_tokens=MAX_PROMPT_TOKENS):
+        self.model = model
+        self.budget = TokenBudget(tpm, rpm)
+        self.max_batch = max_batch
+        self.max_prompt_tokens = max_prompt_tokens
+        self._latest = {}        # id -> summary
+        self._commented = {}     # id -> signals the current commentary was written for
+        self._commentary = {}    # id -> {"verdict", "comment", "time"}
+        self._pending = {}       # id -> (priority, submit order)
+        self._in_flight = set()
+        self._order = 0
+        self._calls = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def submit(self, summaries):
+        """Register summaries; subjects whose signals differ from their last commentary become pending."""
+        with self._lock:
+            for summary in summaries:
+                sid = summary["id"]
+                self._latest[sid] = summary
+                previous = self._commented.get(sid)
+                if previous == summary["signals"]:
+                    self._pending.pop(sid, None)
+                    continue
+                changed = len(summary["signals"]) if previous is None else \
+                    sum(previous.get(k) != v for k, v in summary["signals"].items())
+                if sid not in self._pending:
+                    self._order += 1
+                    order = self._order
+                else:
+                    order = self._pending[sid][1]
+                self._pending[sid] = (KIND_WEIGHT.get(summary.get("kind"), 0) + changed, order)
+
+    def _next_batch(self, exclude):
+        """Highest priority pending subjects, up to max_batch items and max_prompt_tokens."""
+        ranked = sorted((s for s in self._pending if s not in exclude and s not in self._in_flight),
+                        key=lambda s: (-self._pending[s][0], self._pending[s][1]))
+        batch = []
+        for sid in ranked[:self.max_batch]:
+            candidate = batch + [self._latest[sid]]
+            if batch and estimate_tokens(build_prompt(candidate)) > self.max_prompt_tokens:
+                break
+            batch = candidate
+        return batch
+
+    def run_once(self, now=None):
+        """Send batched requests while something is pending and the budget allows. Returns subjects commented."""
+        done = 0
+        # Subjects are tried at most once per run, so an id the model keeps omitting cannot loop
+        attempted = set()
+        while True:
+            with self._lock:
+                now_ = time.time() if now is None else now
+                batch = self._next_batch(attempted) if self._pending else []
+                if not batch:
+                    return done
+                prompt = build_prompt(batch)
+                estimate = estimate_tokens(prompt) + COMPLETION_TOKENS_PER_ITEM * len(batch)
+                if not self.budget.allows(estimate, now_):
+                    return done
+                # Reserve the estimate; settled to the reported usage below
+                reservation = self.budget.spend(estimate, now_)
+                ids = [item["id"] for item in batch]
+                attempted.update(ids)
+                self._in_flight.update(ids)
+
+            started = time.perf_counter()
+            record = {"time": now_, "items": len(batch), "ok": False, "error": None,
+                      "prompt_tokens": None, "completion_tokens": None}
+            try:
+                text, usage = self.model.generate(prompt)
+                record.update(usage)
+                answers = parse_response(text)
+                record["ok"] = True
+            except Exception as e:
+                answers = {}
+                record["error"] = str(e)
+            record["latency_ms"] = (time.perf_counter() - started) * 1000
+
+            with self._lock:
+                if record["prompt_tokens"] is not None:
+                    self.budget.settle(reservation, record["prompt_tokens"] + (record["completion_tokens"] or 0))
+                self._calls.append(record)
+                self._in_flight.difference_update(ids)
+                for item in batch:
+                    answer = answers.get(item["id"])
+                    if answer is None:
+                        continue
+                    self._commentary[item["id"]] = dict(answer, time=now_)
+                    self._commented[item["id"]] = item["signals"]
+                    # Signals that changed again while the call ran stay pending
+                    if self._latest[item["id"]]["signals"] == item["signals"]:
+                        self._pending.pop(item["id"], None)
+                    done += 1
+            if not answers:
+                # Failed or empty call: leave the subjects pending for the next run
+                return done
+
+    def get(self, sid):
+        with self._lock:
+            return self._commentary.get(sid)
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending)
+
+    def calls(self):
+        """Per-call records: time, items, prompt/completion tokens, latency_ms, ok, error."""
+        with self._lock:
+            return list(self._calls)
+
+    def metrics(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            calls = list(self._calls)
+            usage = self.budget.usage(now)
+            pending = len(self._pending)
+        latency = np.array([c["latency_ms"] for c in calls]) if calls else np.zeros(0)
+        return {
+            "calls": len(calls),
+            "failed": sum(not c["ok"] for c in calls),
+            "items": sum(c["items"] for c in calls if c["ok"]),
+            "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] or 0 for c in calls),
+            "latency_ms_p50": float(np.percentile(latency, 50)) if len(latency) else None,
+            "latency_ms_max": float(latency.max()) if len(latency) else None,
+            "pending": pending,
+            "minute_requests": usage["requests"],
+            "minute_tokens": usage["tokens"]
+        }
+
+
+def annotate_boards(scheduler, boards):
+    """Submit the boards of a result, run the scheduler and attach each board's commentary."""
+    valid = {key: info for key, info in boards.items() if "error" not in info}
+    scheduler.submit([board_summary(info) for info in valid.values()])
+    scheduler.run_once()
+    for info in valid.values():
+        info["commentary"] = scheduler.get(f"board:{info['code']}")
+    return boards
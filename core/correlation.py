@@ -0,0 +1,164 @@
+"""
+Rolling correlation and beta across instruments, updated incrementally.
+
+For every window (20/60/120 days) the engine keeps co-moment sums of daily returns over the
+last `window` completed days as (instruments x instruments) matrices: pair counts, sums,
+sums of squares and cross products, pairwise-complete (a missing return only drops the pairs
+it belongs to, like pandas' rolling corr). A completed day enters as a rank-1 update and the
+day leaving the window as a rank-1 downdate, so a new bar costs O(N^2) per window and history
+is never rescanned. The live (forming) bar is swapped in only at evaluation time, so ticks
+cost the same and leave the stored sums untouched.
+
+Regime: a pair has decoupled when its short-window correlation drops below BREAKDOWN_LEVEL,
+or more than BREAKDOWN_DROP below its long-window level.
+"""
+import numpy as np
+import pandas as pd
+
+WINDOWS = (20, 60, 120)
+
+# Share of a window's days a pair must have in common before its statistics are reported
+MIN_COVERAGE = 0.8
+
+# Short-window correlation below this level, or this far under the long-window one, is a breakdown
+BREAKDOWN_LEVEL = 0.5
+BREAKDOWN_DROP = 0.3
+
+
+class _CoMoments:
+    """Pairwise-complete co-moment sums of one window (entry [i, j] covers days both i and j traded)."""
+
+    def __init__(self, size):
+        self.n = np.zeros((size, size))
+        self.sx = np.zeros((size, size))     # sum of x_i
+        self.sxx = np.zeros((size, size))    # sum of x_i ** 2
+        self.sxy = np.zeros((size, size))    # sum of x_i * x_j
+
+    @staticmethod
+    def terms(x):
+        valid = ~np.isnan(x)
+        m = valid.astype("float64")
+        v = np.where(valid, x, 0.0)
+        return np.outer(m, m), np.outer(v, m), np.outer(v * v, m), np.outer(v, v)
+
+    def add(self, x, sign=1.0):
+        for total, term in zip((self.n, self.sx, self.sxx, self.sxy), self.terms(x)):
+            total += sign * term
+
+    def moments(self, enter=None, leave=None):
+        """
+        Sums with one day's terms() swapped in/out, without modifying the stored ones
+        (terms are passed precomputed: the live day enters every window).
+        """
+        sums = [self.n, self.sx, self.sxx, self.sxy]
+        for terms, sign in ((enter, 1.0), (leave, -1.0)):
+            if terms is not None:
+                sums = [total + sign * term for total, term in zip(sums, terms)]
+        return sums
+
+
+def correlation_from_moments(n, sx, sxx, sxy, min_periods):
+    """
+    (correlation, covariance, variance of column instrument) matrices from co-moment sums;
+    NaN where a pair has fewer than min_periods common days.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = (sxy - sx * sx.T / n) / (n - 1)
+        var_row = (sxx - sx * sx / n) / (n - 1)
+        var_col = var_row.T
+        corr = cov / np.sqrt(var_row * var_col)
+    short = n < min_periods
+    for matrix in (corr, cov, var_col):
+        matrix[short] = np.nan
+    # Clip rounding noise of the running sums
+    return np.clip(corr, -1.0, 1.0), cov, var_col
+
+
+class CorrelationEngine:
+    """
+    Rolling correlation matrices and betas for a fixed set of instruments.
+    seed() loads history once; push() adds each completed day; evaluate(live) returns the
+    statistics with the live day's returns included.
+    benchmark: instrument betas are measured against (default: the first one).
+    """
+
+    def __init__(self, instruments, windows=WINDOWS, benchmark=None, min_coverage=MIN_COVERAGE):
+        self.instruments = list(instruments)
+        self.windows = tuple(sorted(windows))
+        self.benchmark = benchmark or self.instruments[0]
+        self.min_periods = {w: max(int(np.ceil(w * min_coverage)), 2) for w in self.windows}
+        self._bench = self.instruments.index(self.benchmark)
+        self.reset()
+
+    def reset(self):
+        size = len(self.instruments)
+        self._sums = {w: _CoMoments(size) for w in self.windows}
+        self._history = np.empty((0, size))
+
+    def seed(self, returns):
+        """
+        Load completed-day returns (DataFrame dates x instruments, fractions, NaN = no trade).
+        Only the longest window's tail is kept.
+        """
+        self.reset()
+        values = returns.reindex(columns=self.instruments).to_numpy(dtype="float64")
+        for x in values[-self.windows[-1]:]:
+            self.push(x)
+
+    def push(self, x):
+        """Add one completed day (returns in instrument order); the oldest day leaves each window."""
+        x = np.asarray(x, dtype="float64")
+        for w, sums in self._sums.items():
+            sums.add(x)
+            if len(self._history) >= w:
+                sums.add(self._history[-w], sign=-1.0)
+        self._history = np.vstack([self._history, x])[-self.windows[-1]:]
+
+    def evaluate(self, live=None):
+        """
+        Statistics over each window's last days, with the live day's returns (if given) as
+        the newest observation.
+        Returns: {"windows": {w: {"corr": DataFrame, "beta": Series}}, "benchmark",
+                  "vs_benchmark": DataFrame (corr_<w>, beta_<w> per instrument),
+                  "status": "联动" | "分化", "decoupled": [{"pair", "short", "long"}]}
+        """
+        enter = None if live is None else _CoMoments.terms(np.asarray(live, dtype="float64"))
+        labels = self.instruments
+        windows, vs_benchmark = {}, {}
+        for w, sums in self._sums.items():
+            leave = None
+            if enter is not None and len(self._history) >= w:
+                leave = _CoMoments.terms(self._history[-w])
+            corr, cov, var_col = correlation_from_moments(*sums.moments(enter, leave), self.min_periods[w])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                beta = cov[:, self._bench] / var_col[:, self._bench]
+            windows[w] = {
+                "corr": pd.DataFrame(corr, index=labels, columns=labels),
+                "beta": pd.Series(beta, index=labels, name=f"beta_{w}")
+            }
+            vs_benchmark[f"corr_{w}"] = corr[:, self._bench]
+            vs_benchmark[f"beta_{w}"] = beta
+
+        decoupled = self._breakdowns(windows[self.windows[0]]["corr"], windows[self.windows[-1]]["corr"])
+        return {
+            "windows": windows,
+            "benchmark": self.benchmark,
+            "vs_benchmark": pd.DataFrame(vs_benchmark, index=labels),
+            "status": "分化" if decoupled else "联动",
+            "decoupled": decoupled
+        }
+
+    @staticmethod
+    def _breakdowns(short, long):
+        s, lo = short.to_numpy(), long.to_numpy()
+        upper = np.triu(np.ones(s.shape, dtype=bool), k=1)
+        with np.errstate(invalid="ignore"):
+            broken = upper & ~np.isnan(s) & ((s < BREAKDOWN_LEVEL) | (s < lo - BREAKDOWN_DROP))
+        labels = short.index
+        return [{"pair": (labels[i], labels[j]), "short": float(s[i, j]), "long": float(lo[i, j])}
+                for i, j in zip(*np.nonzero(broken))]
+
+
+def daily_returns(closes):
+    """Close-to-close returns (fractions) of a (dates x instruments) close panel, first row dropped."""
+    return closes.pct_change(fill_method=None).iloc[1:]
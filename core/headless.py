@@ -0,0 +1,266 @@
+"""
+Headless snapshot runner for cron and batch jobs (pre-open warm-up, post-close archive).
+
+Runs selected stages of the analysis without Streamlit:
+    quotes       realtime quotes of the boards (plus --codes)
+    klines       daily K-lines (cached on disk per Beijing day, so reruns skip the network)
+    macro        refresh due macro series into the macro store
+    indicators   the board/style signals (needs klines; uses quotes and the macro store if present)
+    commentary   AI commentary: market-level plus batched per-board comments (needs indicators and
+                 GEMINI_API_KEY, or AMARKET_AI_STANDIN=1 for the offline stand-in model)
+Only the modules a selected stage needs are imported (no Streamlit, AkShare only for macro,
+the Gemini SDK only for commentary).
+
+Usage:
+    python -m core.headless                                  # all stages but commentary -> JSON on stdout
+    python -m core.headless --skip macro --out snapshot.json
+    python -m core.headless --stages klines                  # pre-open warm-up of the K-line cache
+    python -m core.headless --format arrow --out archive/    # one Arrow IPC file per table
+"""
+import argparse
+import os
+import sys
+import time
+
+STAGES = ("quotes", "klines", "macro", "indicators", "commentary")
+DEFAULT_STAGES = ("quotes", "klines", "macro", "indicators")
+REQUIRES = {
+    "indicators": ("klines",),
+    "commentary": ("indicators",)
+}
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cli_cache")
+KLINE_COUNT = 400
+
+
+def resolve_stages(stages=None, skip=()):
+    """Selected stages in execution order; raises ValueError on unknown names or missing prerequisites."""
+    selected = list(stages or DEFAULT_STAGES)
+    unknown = [s for s in list(selected) + list(skip) if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    selected = [s for s in STAGES if s in selected and s not in skip]
+    for stage in selected:
+        missing = [r for r in REQUIRES.get(stage, ()) if r not in selected]
+        if missing:
+            raise ValueError(f"Stage {stage} needs {', '.join(missing)}")
+    return selected
+
+
+def _board_codes():
+    from core.market_logic import BOARDS
+    return [b["code"] for b in BOARDS.values()]
+
+
+def run_quotes(codes):
+    from framework.data_source import default_router
+    return default_router().quotes(codes)
+
+
+def run_klines(codes, cache_dir=DEFAULT_CACHE_DIR, refresh=False, count=KLINE_COUNT):
+    """
+    Daily bars per instrument, from today's cache file when present.
+    Bars fetched before the open stay valid all day: the analyzer places the live bar from
+    the quote's trade date. Returns: ({instrument: DataFrame}, "cache" | "network").
+    """
+    from framework.timezone_utils import get_beijing_now
+    from framework.universe import load_bars, load_stored_bars, save_bars
+
+    path = os.path.join(cache_dir, f"klines-{get_beijing_now().strftime('%Y-%m-%d')}-{count}.pkl")
+    bars = {} if refresh else load_stored_bars(path)
+    missing = [c for c in codes if c not in bars]
+    if not missing:
+        return {c: bars[c] for c in codes}, "cache"
+
+    from framework.data_source import default_router
+    bars.update(load_bars(missing, default_router(), count=count, workers=min(len(missing), 8)))
+    save_bars(bars, path)
+    return {c: bars[c] for c in codes if c in bars}, "network"
+
+
+def run_macro(store, series=None, workers=4):
+    """Fetch the due series (all registered ones if `series` is None) into the store."""
+    from framework.macro_registry import REGISTRY, MacroScheduler
+
+    registry = REGISTRY if series is None else {n: REGISTRY[n] for n in series}
+    scheduler = MacroScheduler(store, registry, workers=workers)
+    try:
+        fetched = scheduler.run_once(wait=True)
+    finally:
+        scheduler.stop()
+    return fetched, scheduler.stats()
+
+
+class StageSource:
+    """DataSource serving the quotes and K-lines already produced by earlier stages (no I/O)."""
+    name = "stages"
+    capabilities = frozenset({"daily_bars", "minute_bars", "quotes"})
+
+    def __init__(self, bars, quotes=None):
+        import pandas as pd
+        self._empty = pd.DataFrame()
+        self.bars = bars
+        self._quotes = quotes if quotes is not None else self._empty
+
+    def daily_bars(self, instrument, count=300):
+        df = self.bars.get(instrument)
+        return self._empty if df is None else df.tail(count)
+
+    def minute_bars(self, instrument, period=1, count=320):
+        return self._empty
+
+    def quotes(self, instruments):
+        return self._quotes
+
+
+def run_indicators(bars, quotes, macro_store, commentary=False, api_key=None):
+    """Returns: (analysis result, commentary scheduler metrics or None)."""
+    from core.market_logic import MarketAnalyzer
+
+    scheduler = None
+    if commentary:
+        from core.commentary import CommentaryScheduler, default_model
+        model = default_model(api_key)
+        scheduler = CommentaryScheduler(model) if model is not None else None
+    analyzer = MarketAnalyzer(api_key=api_key, source=StageSource(bars, quotes), macro_store=macro_store,
+                              commentary=commentary, commentary_scheduler=scheduler)
+    return analyzer.analyze_market_status(), scheduler.metrics() if scheduler is not None else None
+
+
+def run(stages, codes=(), cache_dir=DEFAULT_CACHE_DIR, refresh=False, macro_root=None, macro_series=None,
+        api_key=None):
+    """
+    Run the selected stages.
+    Returns: (outputs, tables, timings) where outputs is the JSON document, tables maps names
+    to DataFrames for Arrow output and timings holds milliseconds per stage.
+    """
+    outputs, tables, timings = {"stages": stages}, {}, {}
+    codes = list(dict.fromkeys(_board_codes() + list(codes))) if stages else []
+    quotes, bars, store = None, {}, None
+
+    def timed(stage, func, *args, **kwargs):
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        timings[stage] = (time.perf_counter() - started) * 1000
+        return value
+
+    if "quotes" in stages:
+        quotes = timed("quotes", run_quotes, codes)
+        outputs["quotes"] = quotes
+        tables["quotes"] = quotes
+
+    if "klines" in stages:
+        bars, origin = timed("klines", run_klines, codes, cache_dir, refresh)
+        outputs["klines"] = {code: {"rows": len(df), "last_date": df.index[-1] if len(df) else None, "source": origin}
+                             for code, df in bars.items()}
+        for code, df in bars.items():
+            tables[f"bars_{code}"] = df
+
+    if "macro" in stages or "indicators" in stages:
+        from framework.macro_registry import DEFAULT_ROOT, MacroStore
+        store = MacroStore(macro_root or DEFAULT_ROOT)
+    if "macro" in stages:
+        fetched, stats = timed("macro", run_macro, store, macro_series)
+        latest = store.latest()
+        outputs["macro"] = {"fetched": fetched, "stats": stats, "latest": latest}
+        tables["macro"] = latest
+
+    if "indicators" in stages:
+        result, commentary_metrics = timed("indicators", run_indicators, bars, quotes, store,
+                                           commentary="commentary" in stages, api_key=api_key)
+        if commentary_metrics is not None:
+            outputs["commentary_metrics"] = commentary_metrics
+        if "error" in result:
+            outputs["error"] = result["error"]
+        else:
+            from core import snapshot
+            from core.signal_journal import journal_row
+            import pandas as pd
+
+            outputs["signals"] = snapshot.extract_signals(result)
+            tables["signals"] = pd.DataFrame([journal_row(result)])
+
+    return outputs, tables, timings
+
+
+def write_json(outputs, out=None):
+    from core import snapshot
+
+    payload = snapshot.dumps(outputs)
+    if out is None or out == "-":
+        sys.stdout.buffer.write(payload + b"\n")
+    else:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "wb") as f:
+            f.write(payload)
+
+
+def write_arrow(tables, out=None):
+    """
+    Arrow IPC output: with a directory, one <table>.arrow file per table; on stdout, the
+    signals table (or the first table produced).
+    """
+    from core import snapshot
+
+    tables = {name: df for name, df in tables.items() if df is not None and not df.empty}
+    if not tables:
+        return
+    if out is None or out == "-":
+        name = "signals" if "signals" in tables else next(iter(tables))
+        sys.stdout.buffer.write(snapshot.frame_to_arrow(tables[name]))
+        return
+    os.makedirs(out, exist_ok=True)
+    for name, df in tables.items():
+        payload = snapshot.frame_to_arrow(df)
+        with open(os.path.join(out, f"{name}.arrow"), "wb") as f:
+            f.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the market analysis headlessly")
+    parser.add_argument("--stages", default=None, help=f"comma-separated subset of {','.join(STAGES)} "
+                                                       f"(default: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument("--skip", default="", help="comma-separated stages to leave out")
+    parser.add_argument("--codes", default="", help="extra instruments to quote/load, e.g. 600519.SH")
+    parser.add_argument("--format", choices=["json", "arrow"], default="json")
+    parser.add_argument("--out", default=None, help="output file (json) or directory (arrow); default stdout")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--refresh", action="store_true", help="ignore today's K-line cache")
+    parser.add_argument("--macro-root", default=None, help="macro store directory")
+    parser.add_argument("--macro-series", default=None, help="comma-separated series (default: all registered)")
+    parser.add_argument("--timings", action="store_true", help="print stage timings to stderr")
+    args = parser.parse_args()
+
+    def split(value):
+        return [x.strip() for x in value.split(",") if x.strip()] if value else []
+
+    try:
+        stages = resolve_stages(split(args.stages) or None, split(args.skip))
+    except ValueError as e:
+        parser.error(str(e))
+    if args.format == "arrow":
+        from framework.columnar import parquet_available
+        if not parquet_available():
+            parser.error("--format arrow requires the optional pyarrow package")
+
+    started = time.perf_counter()
+    outputs, tables, timings = run(stages, split(args.codes), args.cache_dir, args.refresh, args.macro_root,
+                                   split(args.macro_series) or None, api_key=os.getenv("GEMINI_API_KEY"))
+    outputs["timings_ms"] = timings
+
+    if args.format == "arrow":
+        write_arrow(tables, args.out)
+    else:
+        write_json(outputs, args.out)
+
+    if args.timings:
+        total = (time.perf_counter() - started) * 1000
+        detail = ", ".join(f"{stage} {ms:.0f}" for stage, ms in timings.items())
+        print(f"stages: {detail}; total {total:.0f} ms", file=sys.stderr)
+    if "error" in outputs:
+        print(outputs["error"], file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import threading
+from collections import OrderedDict
+
 import pandas as pd
 import numpy as np
 
@@ -67,3 +70,79 @@ def calculate_nhr(df_list, current_date, lookback=250):
     """
     # TODO: Implement full market scan or use cached aggregate data/proxy
     return 0.5
+
+def ema_step(prev_ema, value, span=200):
+    """
+    Advances an EMA (adjust=False) by one observation.
+    Matches calculate_ema, so a precomputed EMA can be extended with a live price in O(1).
+    """
+    alpha = 2.0 / (span + 1)
+    return prev_ema + alpha * (value - prev_ema)
+
+def volatility_rank(sorted_window, current_vol):
+    """
+    Percentile of current_vol within a lookback window, given the previous (lookback-1)
+    values pre-sorted. Equivalent to detect_volatility_contraction's rank without rescanning.
+    """
+    if np.isnan(current_vol):
+        return 1.0
+    below = np.searchsorted(sorted_window, current_vol, side='left')
+    return below / (len(sorted_window) + 1)
+
+def panel_volatility_rank(vol_panel, lookback=60):
+    """
+    detect_volatility_contraction's rank for every column of a (dates x instruments) panel.
+    Returns: Series of the last row's percentile within each column's last `lookback` rows
+    (1.0 where a column has fewer than `lookback` valid values, e.g. recent listings).
+    """
+    window = vol_panel.to_numpy(dtype=float)[-lookback:]
+    current = window[-1]
+    # NaN compares False, same as the Series version
+    rank = (window < current).mean(axis=0) if len(window) else np.ones(vol_panel.shape[1])
+    has_history = vol_panel.notna().sum().to_numpy() >= lookback
+    return pd.Series(np.where(has_history, rank, 1.0), index=vol_panel.columns)
+
+# Indicators served by IndicatorCache: name -> function(data, **params)
+INDICATORS = {
+    "ema": lambda df, span=200, column="close": calculate_ema(df[column], span=span),
+    "sma": lambda df, window=20, column="close", min_periods=None:
+        df[column].rolling(window=window, min_periods=min_periods).mean(),
+    "volatility": lambda df, window=20: calculate_volatility(df, window=window),
+    # data: (series_a, series_b); value: (ratio, ratio_trend)
+    "relative_strength": lambda pair, window=20: calculate_relative_strength(pair[0], pair[1], window=window)
+}
+
+class IndicatorCache:
+    """
+    Memoized indicator series keyed by (instrument, indicator, params, data version), LRU-bounded
+    to max_entries series. The version names the input data (a board build id, a bars fingerprint):
+    every distinct series is computed once per version, whichever caller (analyzer, chart) asks
+    first. Cached values are shared, so callers copy before modifying them.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, instrument, indicator, data, version, **params):
+        key = (instrument, indicator, tuple(sorted(params.items())), version)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = INDICATORS[indicator](data, **params)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -1,211 +1,558 @@
-from framework.tencent_loader import TencentLoader
+from framework.data_source import default_router
 from framework.macro_loader import MacroLoader
+from framework.timezone_utils import get_beijing_now, is_trading_hours
+from framework.intraday_bar import IntradayBarBuilder
+from framework.bar_cache import BarCache
+from framework import validation
+from framework.adjustment import find_store
+from framework.fingerprint import ChangeGate, bars_fingerprint, digest, frame_fingerprint, \
+    quote_fingerprint, quotes_fingerprint
 from core.ai_analyst import GeminiAnalyst
 from core import indicators
+from core.commentary import annotate_boards
+from core.correlation import CorrelationEngine, daily_returns
+import numpy as np
 import pandas as pd
+import itertools
+import threading
+import time
+
+# Boards analyzed by the dashboard (canonical IDs: 000001.SH=上证, 399001.SZ=深证, 399006.SZ=创业板)
+BOARDS = {
+    "sh": {"code": "000001.SH", "name": "上证指数"},
+    "sz": {"code": "399001.SZ", "name": "深证成指"},
+    "cyb": {"code": "399006.SZ", "name": "创业板指"}
+}
+
+# Max age (seconds) of a tick-store quote during trading hours before falling back to the network
+QUOTE_MAX_AGE = 30
+
+# Seconds to wait before retrying a slow-tier rebuild that left a board without data
+SLOW_TIER_RETRY_SECONDS = 60
 
 class MarketAnalyzer:
-    def __init__(self, api_key=None, model_name='gemini-3-pro-preview'):
-        self.loader = TencentLoader()
+    """
+    Two-tier analyzer.
+    - Slow tier (refresh_daily_state): daily K-lines, macro series and precomputed indicator
+      state (EMA200 seed, rolling-window tails, volatility window), rebuilt once per trading day.
+    - Fast tier (apply_quotes): applies a realtime quote batch to that state and recomputes only
+      the quote-dependent signals in O(1) per board.
+    Keep one instance alive between refreshes so ticks only cost one quote request.
+    With a tick_store (fed by a QuotePoller) quotes are read from memory instead, and with a
+    macro_store (fed by a MacroScheduler) macro blocks are too.
+    commentary=False skips the AI step (ai_commentary is None and no model is configured).
+    With a commentary_scheduler (core.commentary) each board also gets its own commentary,
+    re-requested only when its signals change.
+    Every stage is gated on fingerprints of its inputs (framework.fingerprint): an unchanged
+    quote, K-line or macro table reuses the previous output, and an unchanged run returns the
+    previous result object itself. skip_stats() counts runs vs skips per stage.
+    When the source serves bars from an AdjustmentStore, each board's factor version is part
+    of its build fingerprint, and a corporate action reported by the store forces a rebuild:
+    a dividend rewrites forward-adjusted history without touching the last bar.
+    """
+    def __init__(self, api_key=None, model_name='gemini-3-pro-preview', tick_store=None, source=None,
+                 macro_store=None, commentary=True, commentary_scheduler=None):
+        # Routed data source: Tencent first, Baostock K-line fallback
+        self.source = source or default_router()
         self.macro_loader = MacroLoader()
-        self.ai = GeminiAnalyst(api_key=api_key, model_name=model_name)
-        
+        self.ai = GeminiAnalyst(api_key=api_key, model_name=model_name) if commentary else None
+        self.commentary_scheduler = commentary_scheduler if commentary else None
+        self.boards = BOARDS
+        self.daily_state = None
+        self._ai_commentary = None
+        self.tick_store = tick_store
+        self.macro_store = macro_store
+        self._macro_fingerprint = (None, None)
+        self.gate = ChangeGate()
+        self._build_ids = itertools.count(1)
+        self.last_result = None
+        self.bar_builder = IntradayBarBuilder()
+        self.bar_cache = BarCache()
+        # Indicator series per board build, shared with the dashboard's chart builders
+        self.indicator_cache = indicators.IndicatorCache()
+        self._lock = threading.Lock()
+        self.adjustments = find_store(self.source)
+        self._factors_changed = False
+        if self.adjustments is not None:
+            self.adjustments.subscribe(self._on_corporate_action)
+
     def analyze_market_status(self):
         """
         Main analysis function returning a dict of signals and AI commentary.
         """
         try:
-            # Define boards (Tencent codes: sh000001=上证, sz399001=深证, sz399006=创业板)
-            boards = {
-                "sh": {"code": "sh000001", "name": "上证指数"},
-                "sz": {"code": "sz399001", "name": "深证成指"},
-                "cyb": {"code": "sz399006", "name": "创业板指"}
-            }
-            
-            results = {}
-            latest_date = None
-            
-            # 1. Fetch Real-time Quotes Batch
-            codes = [b["code"] for b in boards.values()]
-            realtime_df = self.loader.fetch_realtime_quotes(codes)
-            
-            # 2. Fetch Macro Data (Liquidity)
-            margin_data = self.macro_loader.fetch_market_margin()
-            money_supply = self.macro_loader.fetch_money_supply()
-            
-            # 3. Analyze per board
-            for key, info in boards.items():
-                code = info["code"]
-                
-                # A. Real-time Snapshot
-                if realtime_df.empty:
-                    rt_row = None
-                else:
-                    rt_row = realtime_df[realtime_df['code'] == code.replace("sh","").replace("sz","")]
-                    if rt_row.empty: 
-                         # Try full match if replace didn't work (though loader handles this)
-                         rt_row = realtime_df[realtime_df['code'] == code]
-                
-                # B. Historical K-Line (for EMA200 - needs at least 200 days of data)
-                kline_df = self.loader.fetch_k_line(code, day_count=400)
-                
-                if kline_df.empty:
-                    results[key] = {"error": "Failed to fetch k-line data"}
-                    continue
-                
-                # Append real-time price to k-line for latest indicator calc? 
-                # Ideally yes, but for simplicity we rely on k-line end + real-time quote deviation
-                # Actually, Tencent k-line usually includes today's partial candle if market is open.
-                
-                df = kline_df
-                latest_date = df.index[-1]
-                
-                # Use real-time price if available and valid (market open), else fallback to K-line (market close)
-                # Logic: If RT volume is effectively 0 or price is 0, assume non-trading/pre-market -> use last close
-                current_price = df['close'].iloc[-1]
-                current_vol = df['volume'].iloc[-1]
-                
-                is_realtime_valid = False
-                if rt_row is not None and not rt_row.empty:
-                    rt_price = float(rt_row.iloc[0]['close'])
-                    rt_vol = float(rt_row.iloc[0]['volume'])
-                    if rt_price > 0 and rt_vol > 0:
-                        current_price = rt_price
-                        current_vol = rt_vol # Note: RT vol is cumulative for the day
-                        is_realtime_valid = True
-                
-                # If falling back to K-line (non-trading), ensure we depend on the last completed day if today is not started
-                
-                # --- PATCH REALTIME DATA ---
-                # To ensure Relative Strength and MA calculations use the LATEST price (Real-time),
-                # we must update the dataframe's last close price if we have valid real-time data.
-                if is_realtime_valid:
-                    # Check if K-line index matches today, or if we need to append?
-                    # Tencent K-line usually contains today.
-                    # We simply overwrite the last close with the accurate RT price.
-                    # This ensures indicators.calculate_relative_strength uses the RT price.
-                    df.at[df.index[-1], 'close'] = current_price
-                    # NOTE: Do NOT overwrite volume! Real-time volume units (shares) differ from
-                    # K-line volume units (hands), causing 100x inflation and chart corruption.
-                    # df.at[df.index[-1], 'volume'] = current_vol  # BUGFIX: Commented out
-                
-                # ---------------------------
-                
-                # --- Analysis ---
-                
-                # Step 1: Funding (Water)
-                vol_ma20 = df['volume'].rolling(20).mean()
-                funding = {
-                    "value": current_vol,
-                    "ma20": vol_ma20.iloc[-1],
-                    "status": "放量" if current_vol > vol_ma20.iloc[-1] else "缩量",
-                    "description": "成交量 vs 20日均量"
-                }
-                
-                # Step 2: Sentiment (NHR/Bias)
-                # NHR requires scanning all stocks, which is heavy. 
-                # Proxy: Use Bias as "Overheat/Panic" gauge for the index itself.
-                price_ma20 = df['close'].rolling(20).mean()
-                bias_20 = (current_price - price_ma20.iloc[-1]) / price_ma20.iloc[-1] * 100
-                
-                # Panic Index Proxy: If drop > 3% in a day or bias < -5
-                panic_score = 0
-                pct_chg = df['pctChg'].iloc[-1]
-                if pct_chg < -3: panic_score += 50
-                if bias_20 < -5: panic_score += 40
-                
-                sentiment_status = "过热" if bias_20 > 5 else ("极度恐慌" if bias_20 < -7 else ("恐慌" if bias_20 < -5 else "中性"))
-                sentiment = {
-                    "score": bias_20,
-                    "panic_score": panic_score, # Proxy for "Panic Index"
-                    "status": sentiment_status,
-                    "description": "乖离率 & 暴跌"
-                }
-
-                # Step 3: Trend (EMA200) - The "Red Line"
-                ema200 = indicators.calculate_ema(df['close'], span=200)
-                trend_status = "牛市 (做多)" if current_price > ema200.iloc[-1] else "熊市 (防守)"
-                trend = {
-                    "current_price": current_price,
-                    "ema200": ema200.iloc[-1],
-                    "status": trend_status,
-                    "series": ema200
-                }
-                
-                # Step 4: Timing (Vol)
-                vol_series = indicators.calculate_volatility(df)
-                is_contracting, rank = indicators.detect_volatility_contraction(vol_series)
-                timing = {
-                    "volatility_rank": rank,
-                    "is_contracting": is_contracting,
-                    "status": "即将变盘" if is_contracting else "波动扩大",
-                    "description": "波动率收敛"
-                }
-                
-                results[key] = {
-                    "name": info["name"],
-                    "data": df,
-                    "funding": funding,
-                    "sentiment": sentiment,
-                    "trend": trend,
-                    "timing": timing
-                }
-
-            # Step 5: Style (Relative Strength)
-            if "sh" in results and "cyb" in results and "data" in results["sh"] and "data" in results["cyb"]:
-                df_sh = results["sh"]["data"]
-                df_cyb = results["cyb"]["data"]
-                rs_line, rs = indicators.calculate_relative_strength(df_cyb['close'], df_sh['close'])
-                current_rs = rs_line.iloc[-1]
-                prev_rs = rs_line.iloc[-2]
-                
-                # Logic: Suggested style based on Trend (RS vs MA20)
-                # If RS is above its 20-day MA, Growth is leading.
-                rs_ma20 = rs_line.rolling(20).mean()
-                current_ma20 = rs_ma20.iloc[-1]
-                
-                is_growth_stronger = current_rs > current_ma20
-                
-                # Determine trend strength description
-                if is_growth_stronger:
-                     trend_desc = "强化 (RS > MA20)" if current_rs > prev_rs else "震荡 (RS > MA20)"
-                else:
-                     trend_desc = "弱势 (RS < MA20)"
-                
-                style = {
-                   "rs_value": current_rs,
-                   "trend": trend_desc, 
-                   "suggestion": "成长/科技 (创业板)" if is_growth_stronger else "价值/蓝筹 (沪指)",
-                   "rs_line": rs_line,
-                   "rs_ma20": rs_ma20, # Pass MA20 for charting
-                   "is_growth": is_growth_stronger
-                }
-            else:
-                style = {"error": "Insufficient data"}
-
-            # Step 6: AI Commentary
-            # Prepare context for AI
-            # Use Shanghai Index as the "Market" representative
-            sh_data = results.get("sh", {})
-            ai_context = {
-                "margin_balance": f"{margin_data.get('margin_balance', 0):.2f}B ({margin_data.get('date')})",
-                "m1_m2_scissors": f"{money_supply.get('scissors', 0):.2f}% ({money_supply.get('date')})",
-                "nhr": "N/A (Requires Full Market Scan)", # Placeholder
-                "panic_index": sh_data.get("sentiment", {}).get("status", "N/A"),
-                "trend_status": sh_data.get("trend", {}).get("status", "N/A")
-            }
-            
-            ai_commentary = self.ai.analyze_market(ai_context)
-
-            return {
-                "date": latest_date,
-                "boards": results,
-                "style": style,
-                "macro": {
-                    "margin": margin_data,
-                    "money": money_supply
-                },
-                "ai_commentary": ai_commentary
-            }
+            with self._lock:
+                codes = [b["code"] for b in self.boards.values()]
+                realtime_df = self._fetch_quotes(codes)
+                state = self.refresh_daily_state(realtime_df)
+                fingerprint = (quotes_fingerprint(realtime_df), self._state_fingerprint(state),
+                               len(self.commentary_scheduler.pending()) if self.commentary_scheduler else 0)
+                self.last_result = self.gate.run("analysis", fingerprint, lambda: self.apply_quotes(realtime_df))
+                return self.last_result
         except Exception as e:
             return {"error": f"Analysis failed: {str(e)}", "boards": {}, "style": {}}
+
+    def _fetch_quotes(self, codes):
+        """Quotes from the tick store when it is current, otherwise from the network."""
+        store = self.tick_store
+        if store is not None:
+            # Outside trading hours the last stored quote is the latest there is
+            if store.has_fresh(codes, QUOTE_MAX_AGE) or (not is_trading_hours() and store.has_fresh(codes, None)):
+                return store.latest_quotes(codes)
+        return self.source.quotes(codes)
+
+    # --- Slow tier ---
+
+    def refresh_daily_state(self, realtime_df=None, force=False):
+        """
+        Rebuild K-line history, macro data and indicator state if the day changed, a valid quote
+        reports a newer trade date than the live bar (new session), or a previous build left
+        a board without data. Returns the current state.
+        """
+        today = get_beijing_now().strftime("%Y-%m-%d")
+        quotes = self._index_quotes(realtime_df)
+        state = self.daily_state
+        if not force and state is not None and state["day"] == today and not self._factors_changed:
+            has_errors = any("error" in b for b in state["boards"].values())
+            # Pre-open quotes already carry the new date without a trade: only a valid quote
+            # starts a session, otherwise every refresh would rebuild until the first trade
+            new_session = any(
+                self._is_valid_quote(quotes.get(b["code"]))
+                and self._quote_trade_date(quotes.get(b["code"])) is not None
+                and self._quote_trade_date(quotes.get(b["code"])) > b["live_date"]
+                for b in state["boards"].values() if "error" not in b
+            )
+            retry_due = has_errors and time.time() - state["built_at"] >= SLOW_TIER_RETRY_SECONDS
+            if not new_session and not retry_due:
+                return state
+
+        boards = {}
+        for key, info in self.boards.items():
+            # Historical K-Line (for EMA200 - needs at least 200 days of data)
+            kline_df = self.source.daily_bars(info["code"], count=400)
+            if kline_df.empty:
+                boards[key] = {"error": "Failed to fetch k-line data"}
+                continue
+            # Same last K-line bar and quote as the previous build (e.g. the midnight rebuild
+            # outside trading hours): the previous state, live bar included, is still exact
+            rt_row = quotes.get(info["code"])
+            fingerprint = (bars_fingerprint(kline_df), quote_fingerprint(rt_row), self._factor_version(info["code"]))
+            boards[key] = self.gate.run(("board_state", info["code"]), fingerprint,
+                                        lambda: self._seed_board(info, kline_df, rt_row))
+        # Corporate actions seen while fetching are already in these bars
+        self._factors_changed = False
+
+        # With a macro store the scheduler keeps macro data current; nothing to fetch here
+        with_store = self.macro_store is not None
+        self.daily_state = {
+            "day": today,
+            "built_at": time.time(),
+            "boards": boards,
+            "style": self._build_style_state(boards),
+            "correlation": self._build_correlation_state(boards),
+            "margin": None if with_store else self.macro_loader.fetch_market_margin(),
+            "money": None if with_store else self.macro_loader.fetch_money_supply()
+        }
+        return self.daily_state
+
+    def _on_corporate_action(self, instrument, first_changed):
+        """AdjustmentStore callback: adjusted history changed, rebuild on the next refresh."""
+        if instrument in {b["code"] for b in self.boards.values()}:
+            self._factors_changed = True
+
+    def _factor_version(self, instrument):
+        return self.adjustments.version(instrument) if self.adjustments is not None else 0
+
+    def _seed_board(self, info, kline_df, rt_row):
+        board = self._build_board_state(info, kline_df, rt_row)
+        # Seed the multi-timeframe cache (daily + recent 1-minute history)
+        self.bar_cache.update(info["code"], "day", board["data"])
+        self.bar_cache.update(info["code"], "minute", self.source.minute_bars(info["code"], period=1, count=480))
+        return board
+
+    def _macro_tables_fingerprint(self):
+        """
+        Content hash of the stored macro tables. The store's version bumps on every fetch, even
+        an identical one, so tables are only re-hashed when it moves.
+        """
+        store = self.macro_store
+        version, fingerprint = self._macro_fingerprint
+        if version != store.version:
+            fingerprint = digest(frame_fingerprint(store.get("margin")), frame_fingerprint(store.get("money_supply")))
+            self._macro_fingerprint = (store.version, fingerprint)
+        return fingerprint
+
+    def _state_fingerprint(self, state):
+        """Identity of the slow-tier inputs: board builds and macro contents."""
+        boards = tuple(b.get("build_id") for b in state["boards"].values())
+        macro = self._macro_tables_fingerprint() if self.macro_store is not None else state["built_at"]
+        return boards, macro
+
+    def _macro_blocks(self, state):
+        """Margin and money-supply blocks; rebuilt from the macro store only when its tables changed."""
+        store = self.macro_store
+        if store is None:
+            return state["margin"], state["money"]
+
+        def build():
+            margin = store.get("margin")
+            if margin.empty:
+                margin_block = {"date": "N/A", "margin_balance": 0, "error": "Margin data not fetched yet", "history": None}
+            else:
+                margin_block = MacroLoader.margin_summary(margin)
+            return margin_block, MacroLoader.money_supply_summary(store.get("money_supply"))
+
+        return self.gate.run("macro", self._macro_tables_fingerprint(), build)
+
+    def _build_board_state(self, info, kline_df, rt_row=None):
+        """
+        Split history into completed bars and the live bar, then precompute everything
+        that does not depend on the live bar.
+        The live bar is the quote's trade date when a valid quote exists (the K-line may or
+        may not contain it yet), otherwise the last K-line row.
+        """
+        code = info["code"]
+        trade_date = self._quote_trade_date(rt_row) if self._is_valid_quote(rt_row) else None
+        if trade_date is None or trade_date < kline_df.index[-1]:
+            trade_date = kline_df.index[-1]
+
+        base = kline_df[kline_df.index < trade_date]
+        # Own copy of the history: the live bar is updated in place on every tick
+        df = kline_df[kline_df.index <= trade_date].copy()
+        prev_close = float(base['close'].iloc[-1]) if len(base) else np.nan
+
+        if self._is_valid_quote(rt_row):
+            kline_live_vol = float(df['volume'].iloc[-1]) if df.index[-1] == trade_date else None
+            self.bar_builder.calibrate_volume(code, kline_live_vol, float(rt_row.volume),
+                                              typical_volume=base['volume'].tail(20).median())
+            self._update_bar(code, rt_row, trade_date)
+            df = self.bar_builder.write_live_bar(code, df, prev_close)
+
+        # Validated once per build; ticks only re-check the live row
+        flags = validation.validate_bars(df)
+        traded = ((flags.to_numpy() & validation.NO_VOLUME) == 0)[:len(base)]
+
+        build_id = next(self._build_ids)
+        ema200 = self.indicator_cache.get(code, "ema", df, build_id, span=200)
+
+        # Volatility: last 19 completed pctChg values + sorted window of previous 59 vols
+        vol_series = self.indicator_cache.get(code, "volatility", df, build_id, window=20)
+        lookback = 60
+
+        # Volume MA20 of completed traded days (shared with the volume chart); ticks only add the live value
+        volume_ma20 = self.indicator_cache.get(code, "sma", base[traded], build_id,
+                                               column="volume", window=20, min_periods=1)
+
+        return {
+            "name": info["name"],
+            "code": code,
+            "build_id": build_id,
+            "data": df,
+            "flags": flags,
+            "live_date": trade_date,
+            "prev_close": prev_close,
+            "ema_seed": float(ema200.iloc[-2]) if len(ema200) > 1 else np.nan,
+            "ema_series": ema200,
+            "close_tail_sum": float(base['close'].iloc[-19:].sum()),
+            # Days without reported volume would drag the MA20 down: average traded days only
+            "volume_tail_sum": float(base['volume'].to_numpy()[traded][-19:].sum()),
+            "volume_ma20": volume_ma20,
+            "pct_tail": base['pctChg'].to_numpy()[-19:],
+            "vol_window": np.sort(vol_series.iloc[:-1].to_numpy()[-(lookback - 1):]),
+            "vol_lookback_ok": len(vol_series) >= lookback
+        }
+
+    @staticmethod
+    def _index_quotes(realtime_df):
+        if realtime_df is None or realtime_df.empty:
+            return {}
+        return {row.code: row for row in realtime_df.itertuples(index=False)}
+
+    @staticmethod
+    def _is_valid_quote(rt_row):
+        if rt_row is None:
+            return False
+        # Tick-store quotes were validated on arrival (no volume/price, stale exchange time)
+        flags = getattr(rt_row, "flags", None)
+        if flags is not None and not pd.isna(flags):
+            return not int(flags) & (validation.NO_VOLUME | validation.STALE)
+        # If RT volume is effectively 0 or price is 0, assume non-trading/pre-market
+        return float(rt_row.close) > 0 and float(rt_row.volume) > 0
+
+    @staticmethod
+    def _quote_trade_date(rt_row):
+        trade_time = getattr(rt_row, "trade_time", None)
+        if trade_time is None or pd.isna(trade_time):
+            return None
+        return pd.Timestamp(trade_time).normalize()
+
+    def _update_bar(self, code, rt_row, trade_date):
+        return self.bar_builder.update(
+            code, trade_date, float(rt_row.close), float(rt_row.volume),
+            open_price=getattr(rt_row, "open", None),
+            high=getattr(rt_row, "high", None),
+            low=getattr(rt_row, "low", None)
+        )
+
+    def _build_style_state(self, boards):
+        """RS (创业板/沪指) base series and MA20 tail for Step 5."""
+        sh, cyb = boards.get("sh", {}), boards.get("cyb", {})
+        if "data" not in sh or "data" not in cyb:
+            return None
+
+        rs_line, rs_ma20 = self.indicator_cache.get(
+            (cyb["code"], sh["code"]), "relative_strength", (cyb["data"]['close'], sh["data"]['close']),
+            (cyb["build_id"], sh["build_id"]), window=20)
+        if len(rs_line) < 2:
+            return None
+
+        common_idx = rs_line.index
+        base_ratio = cyb["data"]['close'].loc[common_idx[0]] / sh["data"]['close'].loc[common_idx[0]]
+        return {
+            "rs_line": rs_line,
+            "rs_ma20": rs_ma20,
+            "base_ratio": base_ratio,
+            "live_aligned": common_idx[-1] == sh["data"].index[-1] == cyb["data"].index[-1],
+            "prev_rs": float(rs_line.iloc[-2]),
+            "rs_tail_sum": float(rs_line.iloc[-20:-1].sum())
+        }
+
+    def _build_correlation_state(self, boards):
+        """Correlation engine seeded with the boards' completed daily returns (live day excluded)."""
+        valid = [b for b in boards.values() if "data" in b]
+        if len(valid) < 2:
+            return None
+        closes = pd.concat({b["code"]: b["data"]["close"] for b in valid}, axis=1)
+        live_date = max(b["live_date"] for b in valid)
+        codes = list(closes.columns)
+        benchmark = BOARDS["sh"]["code"] if BOARDS["sh"]["code"] in codes else codes[0]
+        engine = CorrelationEngine(codes, benchmark=benchmark)
+        engine.seed(daily_returns(closes[closes.index < live_date]))
+        return {"engine": engine, "live_date": live_date, "names": {b["code"]: b["name"] for b in valid}}
+
+    # --- Fast tier ---
+
+    def apply_quotes(self, realtime_df):
+        """
+        Apply a realtime quote batch to the precomputed daily state.
+        Returns the same dict shape as analyze_market_status.
+        """
+        state = self.daily_state
+        results = {}
+        latest_date = None
+
+        quotes = self._index_quotes(realtime_df)
+        inputs = []
+
+        for key, board in state["boards"].items():
+            if "error" in board:
+                results[key] = board
+                continue
+            code = board["code"]
+            # A board whose quote did not change keeps its previous signals (no bar/cache writes)
+            fingerprint = (board["build_id"], quote_fingerprint(quotes.get(code)))
+            results[key] = self.gate.run(("board", code), fingerprint,
+                                         lambda: self._apply_board(board, quotes.get(code)))
+            inputs.append(fingerprint)
+            latest_date = board["data"].index[-1]
+
+        inputs = (state["built_at"], tuple(inputs))
+        style = self.gate.run("style", inputs, lambda: self._evaluate_style(state["style"], state["boards"]))
+        correlation = self.gate.run("correlation", inputs,
+                                    lambda: self._evaluate_correlation(state.get("correlation"), state["boards"]))
+
+        # Step 6: AI Commentary
+        # Prepare context for AI
+        # Use Shanghai Index as the "Market" representative
+        margin_data, money_supply = self._macro_blocks(state)
+        sh_data = results.get("sh", {})
+        ai_context = {
+            "margin_balance": f"{margin_data.get('margin_balance', 0):.2f}B ({margin_data.get('date')})",
+            "m1_m2_scissors": f"{money_supply.get('scissors', 0):.2f}% ({money_supply.get('date')})",
+            "nhr": "N/A (Requires Full Market Scan)", # Placeholder
+            "panic_index": sh_data.get("sentiment", {}).get("status", "N/A"),
+            "trend_status": sh_data.get("trend", {}).get("status", "N/A")
+        }
+
+        # Commentary only depends on categorical statuses; re-ask the model only when they change
+        if self.ai is not None:
+            self._ai_commentary = self.gate.run("ai_commentary", digest(sorted(ai_context.items())),
+                                                lambda: self.ai.analyze_market(ai_context))
+        if self.commentary_scheduler is not None:
+            annotate_boards(self.commentary_scheduler, results)
+
+        return {
+            "date": latest_date,
+            "boards": results,
+            "style": style,
+            "correlation": correlation,
+            "macro": {
+                "margin": margin_data,
+                "money": money_supply
+            },
+            "ai_commentary": self._ai_commentary
+        }
+
+    def _apply_board(self, board, rt_row):
+        code = board["code"]
+        result = self._evaluate_board(board, rt_row)
+        # Only the live day's week/month buckets are re-aggregated
+        self.bar_cache.update(code, "day", board["data"].iloc[-1:])
+        if self.tick_store is not None:
+            intraday = self.tick_store.minute_bars(code)
+            result["intraday"] = intraday
+            # Store bars are labeled by minute start; the cache uses end labels like Tencent
+            forming = intraday.tail(2)
+            forming.index = forming.index + pd.Timedelta(minutes=1)
+            self.bar_cache.update(code, "minute", forming)
+        return result
+
+    def skip_stats(self):
+        """
+        Runs vs skips per gated stage (analysis, board_state, board, style, correlation, macro,
+        ai_commentary), plus indicator cache misses vs hits as "indicators".
+        """
+        stats = self.gate.stats()
+        cache = self.indicator_cache.stats()
+        total = cache["hits"] + cache["misses"]
+        stats["indicators"] = {"runs": cache["misses"], "skips": cache["hits"],
+                               "skip_ratio": cache["hits"] / total if total else 0.0}
+        return stats
+
+    def _evaluate_board(self, board, rt_row):
+        df = board["data"]
+        code = board["code"]
+
+        # Use real-time quote if valid (market open), else keep the K-line live bar (market close).
+        # A quote from a newer session is left to the slow tier, which rebuilds before this runs.
+        trade_date = self._quote_trade_date(rt_row) or board["live_date"]
+        if self._is_valid_quote(rt_row) and trade_date == board["live_date"]:
+            self._update_bar(code, rt_row, trade_date)
+            # Live bar is already the last row: this is an in-place update, no copy
+            self.bar_builder.write_live_bar(code, df, board["prev_close"])
+            validation.refresh_last(board["flags"], df)
+
+        current_price = float(df['close'].iat[-1])
+        current_vol = float(df['volume'].iat[-1])
+        pct_chg = float(df['pctChg'].iat[-1])
+
+        # Step 1: Funding (Water)
+        vol_ma20 = (board["volume_tail_sum"] + current_vol) / 20
+        # The last row is always the live bar, never part of the cached completed-day series
+        ma20_series = pd.concat([board["volume_ma20"], pd.Series([vol_ma20], index=df.index[-1:])])
+        funding = {
+            "value": current_vol,
+            "ma20": vol_ma20,
+            "status": "放量" if current_vol > vol_ma20 else "缩量",
+            "description": "成交量 vs 20日均量",
+            "series": ma20_series
+        }
+
+        # Step 2: Sentiment (NHR/Bias)
+        # Proxy: Use Bias as "Overheat/Panic" gauge for the index itself.
+        price_ma20 = (board["close_tail_sum"] + current_price) / 20
+        bias_20 = (current_price - price_ma20) / price_ma20 * 100
+
+        # Panic Index Proxy: If drop > 3% in a day or bias < -5
+        panic_score = 0
+        if pct_chg < -3: panic_score += 50
+        if bias_20 < -5: panic_score += 40
+
+        sentiment_status = "过热" if bias_20 > 5 else ("极度恐慌" if bias_20 < -7 else ("恐慌" if bias_20 < -5 else "中性"))
+        sentiment = {
+            "score": bias_20,
+            "panic_score": panic_score, # Proxy for "Panic Index"
+            "status": sentiment_status,
+            "description": "乖离率 & 暴跌"
+        }
+
+        # Step 3: Trend (EMA200) - The "Red Line"
+        ema_live = indicators.ema_step(board["ema_seed"], current_price, span=200)
+        ema_series = board["ema_series"].copy()
+        ema_series.iloc[-1] = ema_live
+        trend = {
+            "current_price": current_price,
+            "ema200": ema_live,
+            "status": "牛市 (做多)" if current_price > ema_live else "熊市 (防守)",
+            "series": ema_series
+        }
+
+        # Step 4: Timing (Vol) - rolling std(20) of pctChg with the live value appended
+        window = np.append(board["pct_tail"], pct_chg)
+        current_volatility = np.std(window, ddof=1) if len(window) == 20 else np.nan
+        if board["vol_lookback_ok"]:
+            rank = indicators.volatility_rank(board["vol_window"], current_volatility)
+        else:
+            rank = 1.0
+        is_contracting = board["vol_lookback_ok"] and rank <= 0.2
+        timing = {
+            "volatility_rank": rank,
+            "is_contracting": is_contracting,
+            "status": "即将变盘" if is_contracting else "波动扩大",
+            "description": "波动率收敛"
+        }
+
+        return {
+            "name": board["name"],
+            "code": board["code"],
+            "build_id": board["build_id"],
+            # Published results are read (and lazily encoded) while the next tick rewrites the
+            # live bar in place, so each result gets its own copy of the frame and flags
+            "data": df.copy(),
+            "flags": board["flags"].copy(),
+            "funding": funding,
+            "sentiment": sentiment,
+            "trend": trend,
+            "timing": timing
+        }
+
+    @staticmethod
+    def _evaluate_correlation(corr_state, boards):
+        """Rolling correlation/beta with each board's live return; O(boards^2) per tick."""
+        if corr_state is None:
+            return {"error": "Insufficient data"}
+        by_code = {b["code"]: b for b in boards.values() if "data" in b}
+        live = [
+            by_code[code]["data"]["close"].iat[-1] / by_code[code]["prev_close"] - 1
+            if by_code[code]["live_date"] == corr_state["live_date"] else np.nan
+            for code in corr_state["engine"].instruments
+        ]
+        result = corr_state["engine"].evaluate(live)
+        result["names"] = corr_state["names"]
+        return result
+
+    def _evaluate_style(self, style_state, boards):
+        # Step 5: Style (Relative Strength)
+        if style_state is None:
+            return {"error": "Insufficient data"}
+
+        rs_line = style_state["rs_line"].copy()
+        rs_ma20 = style_state["rs_ma20"].copy()
+        if style_state["live_aligned"]:
+            live_ratio = boards["cyb"]["data"]['close'].iloc[-1] / boards["sh"]["data"]['close'].iloc[-1]
+            rs_line.iloc[-1] = live_ratio / style_state["base_ratio"] * 100
+            if len(rs_line) >= 20:
+                rs_ma20.iloc[-1] = (style_state["rs_tail_sum"] + rs_line.iloc[-1]) / 20
+        current_rs = rs_line.iloc[-1]
+        prev_rs = style_state["prev_rs"]
+
+        # Logic: Suggested style based on Trend (RS vs MA20)
+        # If RS is above its 20-day MA, Growth is leading.
+        current_ma20 = rs_ma20.iloc[-1]
+
+        is_growth_stronger = current_rs > current_ma20
+
+        # Determine trend strength description
+        if is_growth_stronger:
+             trend_desc = "强化 (RS > MA20)" if current_rs > prev_rs else "震荡 (RS > MA20)"
+        else:
+             trend_desc = "弱势 (RS < MA20)"
+
+        return {
+           "rs_value": current_rs,
+           "trend": trend_desc,
+           "suggestion": "成长/科技 (创业板)" if is_growth_stronger else "价值/蓝筹 (沪指)",
+           "rs_line": rs_line,
+           "rs_ma20": rs_ma20, # Pass MA20 for charting
+           "is_growth": is_growth_stronger
+        }
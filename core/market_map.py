@@ -0,0 +1,151 @@
+"""
+Full-market map: the quote snapshot of every stock aggregated by industry or listing board.
+
+The server does all aggregation once per snapshot (vectorized group-bys over ~5,000 rows)
+and the page only receives what it draws:
+    - tiles: one node per group (tens of nodes) for the treemap
+    - drill-down: the stocks of one group, capped at `limit` nodes in the treemap with the
+      remainder folded into one "其他" node, and all of them as a single WebGL scatter trace
+Tile area is turnover (amount), colour is the amount-weighted pctChg.
+"""
+import numpy as np
+import pandas as pd
+
+from framework.universe import UNCLASSIFIED
+
+ROOT_LABEL = "全市场"
+OTHERS_LABEL = "其他"
+
+# Upper bound of stock nodes sent for one drill-down treemap
+MAX_STOCK_NODES = 200
+
+# Colour scale clipped at +/- this pctChg; A-share colours (red up, green down)
+COLOR_RANGE = 5.0
+COLOR_SCALE = [[0.0, "#1a9850"], [0.5, "#f0f0f0"], [1.0, "#d73027"]]
+
+
+class MarketMap:
+    """
+    Aggregates one full-market quote snapshot.
+    quotes: DataFrame with code (canonical), name, close, pctChg, amount (TickStore.latest_quotes output)
+    sectors: DataFrame indexed by instrument with industry and board columns (fetch_sectors)
+    """
+
+    def __init__(self, quotes, sectors):
+        quotes = quotes[quotes["close"] > 0] if not quotes.empty else quotes
+        self.codes = quotes["code"].to_numpy() if not quotes.empty else np.array([], dtype=object)
+        self.names = quotes["name"].to_numpy() if not quotes.empty else np.array([], dtype=object)
+        self.pct_chg = quotes["pctChg"].to_numpy(dtype="float64") if not quotes.empty else np.array([])
+        self.amount = quotes["amount"].to_numpy(dtype="float64") if not quotes.empty else np.array([])
+        self.trade_time = quotes["trade_time"].max() if "trade_time" in quotes.columns and not quotes.empty else None
+
+        self._groups = {}
+        self._tiles = {}
+        for by in ("industry", "board"):
+            labels = sectors[by].reindex(self.codes).fillna(UNCLASSIFIED).to_numpy() if by in sectors.columns \
+                else np.full(len(self.codes), UNCLASSIFIED, dtype=object)
+            codes, uniques = pd.factorize(labels)
+            self._groups[by] = (codes, uniques)
+            self._tiles[by] = self._aggregate(codes, uniques)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _aggregate(self, codes, uniques):
+        n = len(uniques)
+        pct = np.nan_to_num(self.pct_chg)
+        amount = np.nan_to_num(self.amount)
+        count = np.bincount(codes, minlength=n)
+        total = np.bincount(codes, weights=amount, minlength=n)
+        weighted = np.bincount(codes, weights=pct * amount, minlength=n)
+        tiles = pd.DataFrame({
+            "count": count,
+            "amount": total,
+            "pct_chg": np.divide(weighted, total, out=np.zeros(n), where=total > 0),
+            "mean_pct_chg": np.bincount(codes, weights=pct, minlength=n) / np.maximum(count, 1),
+            "advancers": np.bincount(codes, weights=pct > 0, minlength=n).astype(int),
+            "decliners": np.bincount(codes, weights=pct < 0, minlength=n).astype(int)
+        }, index=pd.Index(uniques, name="group"))
+        return tiles.sort_values("amount", ascending=False)
+
+    def tiles(self, by="industry"):
+        """One row per group: count, amount, amount-weighted and mean pctChg, advancers/decliners."""
+        return self._tiles[by]
+
+    def members(self, by, group):
+        """All stocks of one group, by descending amount."""
+        codes, uniques = self._groups[by]
+        matches = np.flatnonzero(uniques == group)
+        if not len(matches):
+            return pd.DataFrame(columns=["name", "pct_chg", "amount"])
+        rows = np.flatnonzero(codes == matches[0])
+        rows = rows[np.argsort(-np.nan_to_num(self.amount[rows]), kind="stable")]
+        return pd.DataFrame({
+            "name": self.names[rows],
+            "pct_chg": self.pct_chg[rows],
+            "amount": self.amount[rows]
+        }, index=pd.Index(self.codes[rows], name="instrument"))
+
+    def treemap(self, by="industry", group=None, limit=MAX_STOCK_NODES):
+        """
+        Treemap node arrays (ids, labels, parents, values, colors, text) for
+        branchvalues="remainder": parents carry no value of their own.
+        Without a group: root + one tile per group. With a group: root + that group + its
+        top `limit` stocks by amount, the rest folded into one node, so the node count is bounded.
+        """
+        root = ROOT_LABEL
+        if group is None:
+            tiles = self.tiles(by)
+            labels = tiles.index.astype(str).tolist()
+            return {
+                "ids": [root] + labels,
+                "labels": [root] + labels,
+                "parents": [""] + [root] * len(labels),
+                "values": [0.0] + tiles["amount"].tolist(),
+                "colors": [0.0] + tiles["pct_chg"].tolist(),
+                "text": [""] + [f"{p:+.2f}% · {c}只 ↑{a} ↓{d}" for p, c, a, d in
+                                zip(tiles["pct_chg"], tiles["count"], tiles["advancers"], tiles["decliners"])]
+            }
+
+        members = self.members(by, group)
+        head, rest = members.iloc[:limit], members.iloc[limit:]
+        group_id = f"{root}/{group}"
+        ids, labels = [root, group_id], [root, str(group)]
+        parents, values = ["", root], [0.0, 0.0]
+        total = members["amount"].sum()
+        group_pct = float((members["pct_chg"] * members["amount"]).sum() / total) if total > 0 else 0.0
+        colors, text = [0.0, group_pct], ["", f"{group_pct:+.2f}%"]
+
+        ids += [f"{group_id}/{c}" for c in head.index]
+        labels += head["name"].astype(str).tolist()
+        parents += [group_id] * len(head)
+        values += head["amount"].tolist()
+        colors += head["pct_chg"].fillna(0).tolist()
+        text += [f"{p:+.2f}%" for p in head["pct_chg"].fillna(0)]
+        if len(rest):
+            rest_amount = rest["amount"].sum()
+            rest_pct = float((rest["pct_chg"] * rest["amount"]).sum() / rest_amount) if rest_amount > 0 else 0.0
+            ids.append(f"{group_id}/{OTHERS_LABEL}")
+            labels.append(f"{OTHERS_LABEL} ({len(rest)}只)")
+            parents.append(group_id)
+            values.append(float(rest_amount))
+            colors.append(rest_pct)
+            text.append(f"{rest_pct:+.2f}%")
+        return {"ids": ids, "labels": labels, "parents": parents, "values": values, "colors": colors, "text": text}
+
+    def scatter(self, by="industry", group=None):
+        """
+        Point arrays for a WebGL scatter (one point per stock): x = pctChg, y = amount (亿),
+        restricted to one group when given.
+        """
+        if group is None:
+            rows = np.arange(len(self.codes))
+        else:
+            codes, uniques = self._groups[by]
+            matches = np.flatnonzero(uniques == group)
+            rows = np.flatnonzero(codes == matches[0]) if len(matches) else np.array([], dtype=int)
+        return {
+            "x": self.pct_chg[rows],
+            "y": self.amount[rows] / 1e8,
+            "text": [f"{n} {c}" for n, c in zip(self.names[rows], self.codes[rows])]
+        }
@@ -0,0 +1,222 @@
+"""
+Full-market five-step screener.
+Runs the dashboard's five signals (funding, sentiment, trend, timing, style) on every stock
+at once: bars are aligned into (dates x instruments) panels and each signal is one vectorized
+pass over the panel. Instruments are split into chunks across a process pool, since panel
+alignment and the per-column rolling/EWM loops are CPU bound.
+
+Usage:
+    python -m core.screener --store data/universe_bars.pkl [--refresh] [--top 50]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core import indicators
+
+BENCHMARK = "000001.SH"
+
+# Default screen: above EMA200, volatility contracting, RS vs benchmark rising
+DEFAULT_REQUIRE = ("above_ema200", "is_contracting", "rs_rising")
+
+# Below this many instruments a process pool costs more than it saves
+MIN_PARALLEL_INSTRUMENTS = 400
+
+
+def build_panel(bars_by_instrument, fields=("close", "volume", "pctChg")):
+    """
+    Align per-instrument bars into one (dates x instruments) DataFrame per field.
+    Dates are the union of all instruments' dates; suspensions and pre-listing days are NaN.
+    """
+    if not bars_by_instrument:
+        return {f: pd.DataFrame() for f in fields}
+    instruments = list(bars_by_instrument)
+    stamps = [bars_by_instrument[i].index.values.astype("datetime64[ns]") for i in instruments]
+    dates = np.unique(np.concatenate(stamps))
+
+    # Fill preallocated arrays by position: per-instrument reindex/concat dominates otherwise
+    values = np.full((len(fields), len(dates), len(instruments)), np.nan)
+    for j, inst in enumerate(instruments):
+        rows = np.searchsorted(dates, stamps[j])
+        df = bars_by_instrument[inst]
+        for k, f in enumerate(fields):
+            values[k, rows, j] = df[f].to_numpy(dtype="float64")
+
+    index = pd.DatetimeIndex(dates, name="date")
+    return {f: pd.DataFrame(values[k], index=index, columns=instruments) for k, f in enumerate(fields)}
+
+
+def panel_signals(close, volume, pct_chg, benchmark_close, lookback=60):
+    """
+    Five-step signals for the last row of each column, same formulas as MarketAnalyzer.
+    Instruments without a bar on the panel's last date (suspended) are dropped.
+    Returns: DataFrame indexed by instrument.
+    """
+    traded = close.iloc[-1].notna() & volume.iloc[-1].notna()
+    close, volume, pct_chg = close.loc[:, traded], volume.loc[:, traded], pct_chg.loc[:, traded]
+    if close.empty:
+        return pd.DataFrame()
+
+    last_close = close.iloc[-1]
+    last_volume = volume.iloc[-1]
+
+    # Step 1: Funding - volume vs 20-day mean (live bar included)
+    vol_ma20 = _last_mean(volume, 20)
+
+    # Step 2: Sentiment - bias vs 20-day MA
+    price_ma20 = _last_mean(close, 20)
+    bias_20 = (last_close - price_ma20) / price_ma20 * 100
+
+    # Step 3: Trend - EMA200
+    ema200 = indicators.calculate_ema(close, span=200).iloc[-1]
+
+    # Step 4: Timing - rank of std(20) of pctChg within the lookback window
+    rank = indicators.panel_volatility_rank(_rolling_std_tail(pct_chg, 20, lookback), lookback=lookback)
+
+    # Step 5: Style - RS vs benchmark (ratio, its MA20 and its direction)
+    bench = benchmark_close.reindex(close.index)
+    rs = close.div(bench.replace(0, np.nan), axis=0)
+    rs_ma20 = _last_mean(rs, 20)
+    rs_last = rs.iloc[-1]
+    rs_prev = rs.iloc[-2] if len(rs) > 1 else rs_last
+    rs_base = rs.iloc[-21] if len(rs) > 20 else rs.iloc[0]
+
+    out = pd.DataFrame({
+        "close": last_close,
+        "pctChg": pct_chg.iloc[-1],
+        "volume": last_volume,
+        "vol_ma20": vol_ma20,
+        "funding": np.where(last_volume > vol_ma20, "放量", "缩量"),
+        "bias_20": bias_20,
+        "ema200": ema200,
+        "ema200_gap": (last_close / ema200 - 1) * 100,
+        "above_ema200": last_close > ema200,
+        "volatility_rank": rank,
+        "is_contracting": rank <= 0.2,
+        "rs_change_20": (rs_last / rs_base - 1) * 100,
+        "rs_rising": (rs_last > rs_ma20) & (rs_last > rs_prev)
+    })
+    # EMA200 is only meaningful with a full year of history
+    out.loc[close.notna().sum() < 200, "above_ema200"] = False
+    out.index.name = "instrument"
+    return out
+
+
+def _last_mean(panel, window):
+    """Last row of panel.rolling(window).mean(): NaN unless the whole window is present."""
+    if len(panel) < window:
+        return pd.Series(np.nan, index=panel.columns)
+    return panel.iloc[-window:].mean(skipna=False)
+
+
+def _rolling_std_tail(panel, window, rows):
+    """
+    Last `rows` rows of panel.rolling(window).std(), computed in one NumPy pass over
+    sliding windows instead of pandas' per-column loop.
+    """
+    values = panel.to_numpy(dtype="float64")[-(rows + window - 1):]
+    out = np.full((min(rows, len(values)), values.shape[1]), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+        out[-len(windows):] = windows.std(axis=-1, ddof=1)
+    return pd.DataFrame(out, index=panel.index[len(panel) - len(out):], columns=panel.columns)
+
+
+def _scan_chunk(bars_chunk, benchmark_close, lookback):
+    """Worker: panel build + signals for one chunk of instruments."""
+    panel = build_panel(bars_chunk)
+    return panel_signals(panel["close"], panel["volume"], panel["pctChg"], benchmark_close, lookback)
+
+
+def scan(bars_by_instrument, benchmark_close=None, workers=None, chunk_size=500, lookback=60):
+    """
+    Five-step signals for every instrument.
+    benchmark_close: close Series for RS (default: BENCHMARK's bars if present)
+    workers: process count (default: CPU count; 1 disables the pool)
+    """
+    if benchmark_close is None:
+        if BENCHMARK not in bars_by_instrument:
+            raise ValueError(f"No benchmark: pass benchmark_close or include {BENCHMARK}")
+        benchmark_close = bars_by_instrument[BENCHMARK]["close"]
+
+    # Every chunk must share the same last date, otherwise "suspended" means different things
+    last_date = max(df.index[-1] for df in bars_by_instrument.values() if not df.empty)
+    items = [(inst, df) for inst, df in bars_by_instrument.items()
+             if inst != BENCHMARK and not df.empty and df.index[-1] == last_date]
+    if not items:
+        return pd.DataFrame()
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < MIN_PARALLEL_INSTRUMENTS:
+        return _scan_chunk(dict(items), benchmark_close, lookback)
+
+    chunks = [dict(items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_scan_chunk, chunks, [benchmark_close] * len(chunks), [lookback] * len(chunks))
+        frames = [r for r in results if not r.empty]
+    return pd.concat(frames) if frames else pd.DataFrame()
+
+
+def rank(signals, require=DEFAULT_REQUIRE, sort_by="rs_change_20", ascending=False, top=None):
+    """Rows satisfying every boolean column in `require`, sorted by `sort_by`."""
+    if signals.empty:
+        return signals
+    mask = np.ones(len(signals), dtype=bool)
+    for column in require:
+        mask &= signals[column].to_numpy(dtype=bool)
+    ranked = signals[mask].sort_values(sort_by, ascending=ascending)
+    return ranked.head(top) if top else ranked
+
+
+def screen(bars_by_instrument, names=None, require=DEFAULT_REQUIRE, top=None, workers=None):
+    """
+    Scan and rank in one call.
+    names: optional {instrument: name} (or Series) added as a "name" column.
+    """
+    signals = scan(bars_by_instrument, workers=workers)
+    if names is not None and not signals.empty:
+        signals.insert(0, "name", pd.Series(names).reindex(signals.index))
+    return rank(signals, require=require, top=top)
+
+
+def main():
+    from framework.data_source import default_router
+    from framework.universe import fetch_universe, load_bars, save_bars, load_stored_bars
+
+    parser = argparse.ArgumentParser(description="Five-step screener over the A-share universe")
+    parser.add_argument("--store", default="data/universe_bars.pkl", help="local bar store")
+    parser.add_argument("--refresh", action="store_true", help="re-download bars into the store")
+    parser.add_argument("--count", type=int, default=300, help="daily bars per stock")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--all", action="store_true", help="rank every stock instead of the default screen")
+    args = parser.parse_args()
+
+    universe = fetch_universe()
+    names = dict(zip(universe["instrument"], universe["name"])) if not universe.empty else None
+
+    bars = {} if args.refresh else load_stored_bars(args.store)
+    if not bars:
+        if universe.empty:
+            print("Universe unavailable and no local store; nothing to scan.")
+            return
+        source = default_router()
+        started = time.perf_counter()
+        bars = load_bars([BENCHMARK] + universe["instrument"].tolist(), source, count=args.count)
+        print(f"Loaded {len(bars)} instruments in {time.perf_counter() - started:.1f}s")
+        save_bars(bars, args.store)
+
+    started = time.perf_counter()
+    result = screen(bars, names=names, require=() if args.all else DEFAULT_REQUIRE,
+                    top=args.top, workers=args.workers)
+    print(f"Scanned {len(bars)} instruments in {time.perf_counter() - started:.2f}s")
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
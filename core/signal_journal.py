@@ -0,0 +1,231 @@
+"""
+Append-only signal journal.
+Every refresh's scalar signals become one row; rows are buffered in memory and written by a
+background thread as immutable part files, partitioned by Beijing trading day:
+    <root>/date=YYYY-MM-DD/part-<nanoseconds>.parquet
+Range queries only open the partitions they cover and include rows still in the buffer.
+
+Parquet needs the optional pyarrow package; without it parts are written as pickled
+DataFrames (same layout, .pkl), so the journal keeps working on minimal installs.
+"""
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from framework.columnar import default_format, is_frame_file, read_frame, write_frame
+from framework.timezone_utils import get_beijing_now
+
+DEFAULT_ROOT = os.path.join("data", "journal")
+
+def journal_row(result, recorded_at=None):
+    """
+    Flatten an analyze_market_status() result into one journal row (dict).
+    Board signals are prefixed with the board key ("sh_bias_20", "cyb_ema200_gap", ...).
+    """
+    ts = pd.Timestamp(recorded_at or get_beijing_now())
+    if ts.tzinfo is not None:
+        # Stored as naive Beijing wall-clock time, like the rest of the app's indexes
+        ts = ts.tz_convert("Asia/Shanghai").tz_localize(None)
+    row = {
+        "ts": ts,
+        "market_date": str(result.get("date"))
+    }
+
+    for key, info in result.get("boards", {}).items():
+        if "error" in info or "trend" not in info:
+            continue
+        df = info["data"]
+        price, ema = info["trend"]["current_price"], info["trend"]["ema200"]
+        funding = info["funding"]
+        row.update({
+            f"{key}_close": price,
+            f"{key}_pct_chg": float(df["pctChg"].iat[-1]),
+            f"{key}_funding_status": funding["status"],
+            f"{key}_volume_ratio": funding["value"] / funding["ma20"] if funding["ma20"] else np.nan,
+            f"{key}_bias_20": info["sentiment"]["score"],
+            f"{key}_panic_score": info["sentiment"]["panic_score"],
+            f"{key}_ema200_gap": (price / ema - 1) * 100 if ema else np.nan,
+            f"{key}_volatility_rank": info["timing"]["volatility_rank"],
+            f"{key}_is_contracting": bool(info["timing"]["is_contracting"])
+        })
+
+    style = result.get("style", {})
+    if "error" not in style:
+        row["rs_value"] = style.get("rs_value")
+        row["rs_is_growth"] = style.get("is_growth")
+
+    correlation = result.get("correlation", {})
+    if "error" not in correlation and correlation:
+        vs_benchmark = correlation["vs_benchmark"]
+        for key, info in result.get("boards", {}).items():
+            if info.get("code") in vs_benchmark.index:
+                row[f"{key}_corr_20"] = vs_benchmark.at[info["code"], "corr_20"]
+                row[f"{key}_beta_60"] = vs_benchmark.at[info["code"], "beta_60"]
+        row["correlation_status"] = correlation["status"]
+
+    macro = result.get("macro", {})
+    row["margin_balance"] = (macro.get("margin") or {}).get("margin_balance")
+    row["scissors"] = (macro.get("money") or {}).get("scissors")
+    row["ai_verdict"] = result.get("ai_commentary")
+    return row
+
+
+class SignalJournal:
+    """
+    record() only appends to an in-memory buffer; a writer thread flushes the buffer every
+    `flush_interval` seconds or once it holds `flush_rows` rows. Parts are never modified
+    after being written (compact() rewrites a whole day into a single part).
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, flush_rows=200, flush_interval=60, fmt=None):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fmt = fmt or default_format()
+        self._pending = []
+        self._writing = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Writing ---
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="signal-journal", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Flush what is buffered and stop the writer thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def record(self, result, recorded_at=None):
+        """Buffer one snapshot (failed analyses are ignored)."""
+        if not result or "error" in result:
+            return
+        row = journal_row(result, recorded_at)
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write buffered rows now. Returns: number of rows written."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._writing = batch
+        if not batch:
+            return 0
+        try:
+            frame = pd.DataFrame(batch)
+            for day, part in frame.groupby(frame["ts"].dt.strftime("%Y-%m-%d")):
+                self._write_part(day, part.reset_index(drop=True))
+        except Exception as e:
+            # Keep the rows for the next attempt rather than dropping history
+            print(f"Signal journal flush failed: {e}")
+            with self._lock:
+                self._pending = batch + self._pending
+                self._writing = []
+            return 0
+        with self._lock:
+            self._writing = []
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _partition_dir(self, day):
+        return os.path.join(self.root, f"date={day}")
+
+    def _write_part(self, day, frame):
+        write_frame(frame, os.path.join(self._partition_dir(day), f"part-{time.time_ns()}"), self.fmt)
+
+    # --- Reading ---
+
+    def read(self, start=None, end=None, columns=None):
+        """
+        Rows with start <= ts <= end (Beijing time; dates or timestamps, both optional).
+        Returns: DataFrame sorted by ts, including rows not yet flushed.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        # A bare date as `end` means the whole day
+        if end is not None and end == end.normalize():
+            end = end + pd.Timedelta(days=1) - pd.Timedelta(1)
+
+        frames = [self._read_part(p, columns) for p in self._parts(start, end)]
+        with self._lock:
+            buffered = self._writing + self._pending
+        if buffered:
+            frames.append(pd.DataFrame(buffered))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df["ts"] >= start]
+        if end is not None:
+            df = df[df["ts"] <= end]
+        # A batch being flushed can be seen both on disk and in the buffer
+        df = df.drop_duplicates(subset="ts", keep="last").sort_values("ts").reset_index(drop=True)
+        if columns is not None:
+            df = df[[c for c in ["ts"] + list(columns) if c in df.columns]]
+        return df
+
+    def today(self, columns=None):
+        now = get_beijing_now()
+        return self.read(start=now.strftime("%Y-%m-%d"), columns=columns)
+
+    def days(self):
+        """Trading days that have a partition on disk."""
+        dirs = glob.glob(os.path.join(self.root, "date=*"))
+        return sorted(os.path.basename(d)[len("date="):] for d in dirs)
+
+    def _parts(self, start, end):
+        paths = []
+        for day in self.days():
+            if start is not None and day < start.strftime("%Y-%m-%d"):
+                continue
+            if end is not None and day > end.strftime("%Y-%m-%d"):
+                continue
+            directory = self._partition_dir(day)
+            paths.extend(sorted(p for p in glob.glob(os.path.join(directory, "part-*")) if is_frame_file(p)))
+        return paths
+
+    @staticmethod
+    def _read_part(path, columns):
+        cols = None if columns is None else ["ts"] + [c for c in columns if c != "ts"]
+        return read_frame(path, cols)
+
+    def compact(self, day):
+        """Merge a finished day's parts into one file. Returns: number of parts replaced."""
+        parts = self._parts(pd.Timestamp(day), pd.Timestamp(day))
+        if len(parts) <= 1:
+            return 0
+        frame = pd.concat([self._read_part(p, None) for p in parts], ignore_index=True)
+        frame = frame.drop_duplicates(subset="ts", keep="last").sort_values("ts").reset_index(drop=True)
+        self._write_part(pd.Timestamp(day).strftime("%Y-%m-%d"), frame)
+        for path in parts:
+            os.remove(path)
+        return len(parts)
@@ -0,0 +1,124 @@
+"""
+Serialization helpers for MarketAnalyzer results.
+Turns the analysis dict (DataFrames, Series, Timestamps, numpy scalars) into
+compact JSON-safe structures and optional Arrow IPC streams for external consumers.
+"""
+import io
+import json
+import math
+import numpy as np
+import pandas as pd
+
+
+def to_jsonable(obj):
+    """
+    Recursively convert analysis output into JSON-serializable Python objects.
+    DataFrames become {"columns", "index", "data"}, Series become {"index", "values"},
+    timestamps become ISO strings and NaN/inf become None.
+    """
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, pd.DataFrame):
+        return {
+            "columns": [str(c) for c in obj.columns],
+            "index": [to_jsonable(i) for i in obj.index],
+            "data": [[to_jsonable(v) for v in row] for row in obj.itertuples(index=False, name=None)]
+        }
+    if isinstance(obj, pd.Series):
+        return {
+            "index": [to_jsonable(i) for i in obj.index],
+            "values": [to_jsonable(v) for v in obj.tolist()]
+        }
+    if obj is None or obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(obj) else pd.Timestamp(obj).isoformat()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def dumps(obj):
+    """Serialize to compact UTF-8 JSON bytes (keeps Chinese labels readable)."""
+    return json.dumps(to_jsonable(obj), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def extract_signals(result):
+    """
+    Strip heavy series out of an analyze_market_status() result, keeping only scalar signals.
+    Returns: dict with date, per-board signals, style, index correlation, macro snapshot and
+    AI commentary.
+    """
+    boards = {}
+    for key, info in result.get("boards", {}).items():
+        if "error" in info:
+            boards[key] = {"error": info["error"]}
+            continue
+        boards[key] = {
+            "name": info["name"],
+            "funding": {k: v for k, v in info["funding"].items() if k != "series"},
+            "sentiment": dict(info["sentiment"]),
+            "trend": {k: v for k, v in info["trend"].items() if k != "series"},
+            "timing": dict(info["timing"]),
+            "commentary": info.get("commentary")
+        }
+
+    style = {k: v for k, v in result.get("style", {}).items() if k not in ("rs_line", "rs_ma20")}
+    # Full matrices stay out; the per-board correlation/beta vs the benchmark is kept
+    correlation = {k: v for k, v in result.get("correlation", {}).items() if k != "windows"}
+
+    macro = {}
+    for name, block in result.get("macro", {}).items():
+        macro[name] = {k: v for k, v in block.items() if k != "history"}
+
+    return {
+        "date": result.get("date"),
+        "boards": boards,
+        "style": style,
+        "correlation": correlation,
+        "macro": macro,
+        "ai_commentary": result.get("ai_commentary")
+    }
+
+
+def board_series(result, key):
+    """
+    Daily bars of one board with its EMA200 line attached.
+    Returns: DataFrame indexed by date, or None if the board is missing/failed.
+    """
+    info = result.get("boards", {}).get(key)
+    if not info or "data" not in info:
+        return None
+    df = info["data"].copy()
+    series = info.get("trend", {}).get("series")
+    if series is not None:
+        df["ema200"] = series
+    return df
+
+
+def macro_history(result, name):
+    """History frame of a macro block ("margin" or "money"), or None if unavailable."""
+    block = result.get("macro", {}).get(name)
+    if not block:
+        return None
+    return block.get("history")
+
+
+def frame_to_arrow(df):
+    """
+    Encode a DataFrame as an Arrow IPC stream.
+    Requires the optional pyarrow dependency; raises ImportError if it is missing.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
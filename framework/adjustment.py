@@ -0,0 +1,322 @@
+"""
+Raw daily bars with per-instrument adjustment factors.
+
+Forward-adjusted (qfq) K-lines rewrite an instrument's whole history on every dividend or
+split, so caching them means re-downloading everything after each corporate action. Here
+unadjusted bars are stored once, next to a cumulative backward factor per row (1.0 at the
+first stored bar, stepping up at every ex-date). Adjusted series are derived on read with one
+vectorized multiply:
+    hfq = raw * factor                  history never changes after an ex-date
+    qfq = raw * factor / factor[-1]     history is rescaled by a constant
+
+Factors are learnt incrementally: a sync fetches only the last SYNC_WINDOW bars raw and
+forward-adjusted, and every step in their ratio over completed bars is an ex-date (today's bar
+can move between the two requests). Baostock's published factors
+(BaostockLoader.fetch_adjust_factor) can be fed in directly instead.
+update() returns the first date whose factor changed, so caches only drop what is downstream
+of a corporate action; version(instrument) only increases when factors change.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from framework.data_source import BAR_COLUMNS, DataSource, normalize_bars, to_tencent
+from framework.timezone_utils import get_beijing_now
+
+DEFAULT_ROOT = os.path.join("data", "adjust")
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+_PRICE = [BAR_COLUMNS.index(c) for c in PRICE_COLUMNS]
+_CLOSE, _PCT_CHG = BAR_COLUMNS.index("close"), BAR_COLUMNS.index("pctChg")
+
+# Bars re-fetched by an incremental sync; older stores (or longer requests) are fetched whole
+SYNC_WINDOW = 30
+
+# A stored instrument is served without upstream requests for this long after its last sync
+SYNC_INTERVAL = 300
+
+# Adjusted prices are published with 3 decimals; ratio steps smaller than that rounding are noise
+PRICE_TICK = 0.001
+
+# Relative factor difference below which two factor tables are the same
+FACTOR_EPSILON = 1e-9
+
+
+def factor_steps(raw_close, adjusted_close):
+    """
+    Ex-dates learnt from adjusted / raw close on the dates both series share: a ratio step wider
+    than one price tick is an ex-date. Each step is measured between the median ratios of the
+    segments around it, so single rounded prices do not leak into the factor.
+    Returns: Series of factor ratios (new / previous) indexed by ex-date.
+    """
+    both = pd.concat([raw_close, adjusted_close], axis=1, join="inner").dropna()
+    both = both[(both.iloc[:, 0] > 0) & (both.iloc[:, 1] > 0)]
+    if both.empty:
+        return pd.Series(dtype="float64")
+    raw, adjusted = both.iloc[:, 0].to_numpy(), both.iloc[:, 1].to_numpy()
+    ratio = adjusted / raw
+    tolerance = PRICE_TICK / np.minimum(adjusted, raw)
+    step = np.zeros(len(ratio), dtype=bool)
+    step[1:] = np.abs(ratio[1:] / ratio[:-1] - 1) > tolerance[1:]
+    at = np.flatnonzero(step)
+    levels = pd.Series(ratio).groupby(np.cumsum(step)).transform("median").to_numpy()
+    return pd.Series(levels[at] / levels[at - 1], index=both.index[at])
+
+
+def stored_steps(frame):
+    """Factor ratios (new / previous) of a stored frame at its ex-dates."""
+    factor = frame["factor"]
+    ratio = factor / factor.shift()
+    return ratio[np.abs(ratio - 1) > FACTOR_EPSILON]
+
+
+def published_levels(factors, index):
+    """Published cumulative factors (Series indexed by ex-date) expanded to one value per date."""
+    factors = pd.Series(factors, dtype="float64").sort_index()
+    factors.index = pd.DatetimeIndex(factors.index)
+    position = factors.index.searchsorted(index, side="right") - 1
+    values = np.where(position >= 0, factors.to_numpy()[np.maximum(position, 0)], 1.0)
+    return pd.Series(values, index=index)
+
+
+def factor_table(frame):
+    """Ex-dates and cumulative factors of a stored frame (the rows where the factor steps)."""
+    return frame["factor"][stored_steps(frame).index]
+
+
+def adjust(frame, how="qfq"):
+    """
+    Bars in the canonical schema from a stored frame (BAR_COLUMNS + "factor").
+    how: "qfq" (forward), "hfq" (backward) or None (raw). Volume and amount stay unadjusted;
+    pctChg of adjusted series is the close-to-close total return.
+    """
+    if how is None or frame.empty:
+        return frame[BAR_COLUMNS].copy()
+    factor = frame["factor"].to_numpy()
+    if how == "qfq":
+        factor = factor / factor[-1]
+    elif how != "hfq":
+        raise ValueError(f"Unsupported adjustment: {how}")
+    values = frame[BAR_COLUMNS].to_numpy(dtype="float64", copy=True)
+    values[:, _PRICE] *= factor[:, None]
+    close = values[:, _CLOSE]
+    values[0, _PCT_CHG] = np.nan
+    values[1:, _PCT_CHG] = (close[1:] / close[:-1] - 1) * 100
+    return pd.DataFrame(values, index=frame.index, columns=BAR_COLUMNS)
+
+
+class AdjustmentStore:
+    """
+    Per-instrument raw bars and factors: in memory, persisted one pickle per instrument and
+    loaded lazily (a universe-sized store is only read for the instruments asked for).
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._frames = {}
+        self._synced_at = {}
+        self._versions = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def _path(self, instrument):
+        return os.path.join(self.root, f"{instrument}.pkl")
+
+    def _frame(self, instrument):
+        with self._lock:
+            if instrument in self._frames:
+                return self._frames[instrument]
+        frame, synced_at = None, None
+        path = self._path(instrument)
+        if os.path.exists(path):
+            try:
+                frame = pd.read_pickle(path)
+                synced_at = os.path.getmtime(path)
+            except Exception as e:
+                print(f"Ignoring unreadable adjustment store {path}: {e}")
+        with self._lock:
+            self._frames.setdefault(instrument, frame)
+            self._synced_at.setdefault(instrument, synced_at)
+            return self._frames[instrument]
+
+    def raw(self, instrument):
+        """Stored frame (BAR_COLUMNS + "factor"), or None. Never does network I/O."""
+        return self._frame(instrument)
+
+    def bars(self, instrument, how="qfq", count=None):
+        frame = self._frame(instrument)
+        if frame is None:
+            return normalize_bars(None)
+        out = adjust(frame, how)
+        return out if count is None else out.tail(count)
+
+    def factors(self, instrument):
+        frame = self._frame(instrument)
+        return factor_table(frame) if frame is not None else pd.Series(dtype="float64", name="factor")
+
+    def synced_at(self, instrument):
+        self._frame(instrument)
+        with self._lock:
+            return self._synced_at.get(instrument)
+
+    def version(self, instrument):
+        """Increases whenever the instrument's factors change (not on new bars)."""
+        with self._lock:
+            return self._versions.get(instrument, 0)
+
+    def subscribe(self, callback):
+        """callback(instrument, first_changed_date) after each corporate action seen by update()."""
+        self._listeners.append(callback)
+
+    def update(self, instrument, raw, adjusted=None, factors=None):
+        """
+        Merge freshly fetched raw bars; stored rows from the first new date onwards are replaced.
+        adjusted: the same window forward-adjusted, to learn ex-dates from the price ratio.
+        factors: published cumulative backward factors (Series indexed by ex-date) instead.
+        Without either, the last known factor is carried forward.
+        Returns: first date whose factor changed (a corporate action), or None.
+        """
+        raw = normalize_bars(raw)
+        if raw.empty:
+            return None
+        stored = self._frame(instrument)
+        start = raw.index[0]
+        kept = stored[stored.index < start] if stored is not None else None
+
+        if factors is not None:
+            levels = published_levels(factors, raw.index)
+        else:
+            steps = stored_steps(stored) if stored is not None else pd.Series(dtype="float64")
+            if adjusted is not None and not adjusted.empty:
+                steps = self._merge_steps(steps, raw["close"], adjusted["close"])
+            levels = steps.reindex(raw.index, fill_value=1.0).cumprod()
+        factor = levels * self._anchor(levels, stored)
+
+        merged = raw.assign(factor=factor.to_numpy())
+        if kept is not None and not kept.empty:
+            merged = pd.concat([kept, merged])
+        changed = self._first_change(stored, merged)
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._path(instrument) + ".tmp"
+        merged.to_pickle(tmp)
+        os.replace(tmp, self._path(instrument))
+        with self._lock:
+            self._frames[instrument] = merged
+            self._synced_at[instrument] = time.time()
+            if changed is not None:
+                self._versions[instrument] = self._versions.get(instrument, 0) + 1
+        if changed is not None:
+            for callback in self._listeners:
+                callback(instrument, changed)
+        return changed
+
+    @staticmethod
+    def _merge_steps(steps, raw_close, adjusted_close):
+        """
+        Stored ex-dates reconciled with the ones learnt from a raw/qfq window. Only completed
+        bars are compared: the live bar can trade between the two requests. Within the dates the
+        window covers it is authoritative, so a stored step it does not show is dropped; steps it
+        confirms keep their stored ratio, so a resync never nudges the factors.
+        """
+        today = pd.Timestamp(get_beijing_now().date())
+        raw_close = raw_close[raw_close.index < today]
+        adjusted_close = adjusted_close[adjusted_close.index < today]
+        learnt = factor_steps(raw_close, adjusted_close)
+        shared = raw_close.index.intersection(adjusted_close.index)
+        if len(shared) > 1 and len(steps):
+            # A step on the first shared date has no previous bar in the window to be seen against
+            covered = (steps.index > shared[0]) & (steps.index <= shared[-1])
+            steps = steps[~covered | steps.index.isin(learnt.index)]
+        return pd.concat([steps, learnt[~learnt.index.isin(steps.index)]]).sort_index()
+
+    @staticmethod
+    def _anchor(levels, stored):
+        """
+        Scale that maps window levels onto the stored factors: matched on the first date the
+        window shares with the store (or continuing its last factor), so extending or
+        re-fetching never rebases history.
+        """
+        if stored is None or stored.empty:
+            return 1.0 / levels.iloc[0]
+        common = levels.index.intersection(stored.index)
+        if len(common):
+            return stored.at[common[0], "factor"] / levels.at[common[0]]
+        return stored["factor"].iloc[-1] / levels.iloc[0]
+
+    @staticmethod
+    def _first_change(stored, merged):
+        """
+        First date whose factor differs from the stored one, or steps on a newly added bar.
+        A first load has nothing downstream to invalidate (None).
+        """
+        if stored is None or stored.empty:
+            return None
+        factor = merged["factor"]
+        candidates = []
+        old = stored["factor"].reindex(factor.index)
+        differs = (np.abs(factor / old - 1) > FACTOR_EPSILON) & old.notna()
+        if differs.any():
+            candidates.append(factor.index[differs.to_numpy()][0])
+        new = factor[factor.index > stored.index[-1]]
+        previous = factor.shift()[new.index]
+        steps = (np.abs(new / previous - 1) > FACTOR_EPSILON) & previous.notna()
+        if steps.any():
+            candidates.append(new.index[steps.to_numpy()][0])
+        return min(candidates) if candidates else None
+
+
+class AdjustedSource(DataSource):
+    """
+    Daily bars served from an AdjustmentStore, synced from Tencent raw + qfq K-lines.
+    A stored instrument costs two SYNC_WINDOW-bar requests per SYNC_INTERVAL instead of a full
+    forward-adjusted history, and none at all within the interval.
+    """
+    name = "adjusted"
+    capabilities = frozenset({"daily_bars"})
+
+    def __init__(self, store=None, loader=None, how="qfq", sync_interval=SYNC_INTERVAL):
+        if loader is None:
+            from framework.tencent_loader import TencentLoader
+            loader = TencentLoader()
+        self.store = store if store is not None else AdjustmentStore()
+        self.loader = loader
+        self.how = how
+        self.sync_interval = sync_interval
+
+    def daily_bars(self, instrument, count=300):
+        stored = self.store.raw(instrument)
+        synced_at = self.store.synced_at(instrument)
+        if stored is None or len(stored) < count or synced_at is None \
+                or time.time() - synced_at >= self.sync_interval:
+            self.sync(instrument, count)
+        return self.store.bars(instrument, self.how, count)
+
+    def sync(self, instrument, count=300):
+        """
+        Fetch the recent window (or `count` bars when the store is short or too old to overlap
+        it) raw and forward-adjusted. Returns: update()'s first changed date.
+        """
+        stored = self.store.raw(instrument)
+        window = count
+        if stored is not None and len(stored) >= count:
+            behind = np.busday_count(stored.index[-1].date(), get_beijing_now().date())
+            if behind < SYNC_WINDOW - 5:
+                window = SYNC_WINDOW
+        code = to_tencent(instrument)
+        raw = self.loader.fetch_k_line(code, day_count=window, fq="")
+        if raw.empty:
+            return None
+        adjusted = normalize_bars(self.loader.fetch_k_line(code, day_count=window, fq="qfq"))
+        return self.store.update(instrument, raw, adjusted=adjusted)
+
+
+def find_store(source):
+    """AdjustmentStore behind a source (an AdjustedSource, or a router holding one), or None."""
+    for provider in getattr(source, "providers", [source]):
+        if isinstance(provider, AdjustedSource):
+            return provider.store
+    return None
@@ -0,0 +1,163 @@
+"""
+Multi-timeframe bar cache.
+Stores the finest bars per instrument (1-minute intraday, daily) and derives higher
+timeframes from them. Each derived timeframe is cached; when new bars arrive only the
+buckets they touch (normally just the last one) are re-aggregated.
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+# timeframe -> (base series, bucket size in minutes for intraday timeframes)
+TIMEFRAMES = {
+    "1m": ("minute", 1),
+    "5m": ("minute", 5),
+    "15m": ("minute", 15),
+    "30m": ("minute", 30),
+    "60m": ("minute", 60),
+    "day": ("day", None),
+    "week": ("day", None),
+    "month": ("day", None)
+}
+
+# Max number of base bars in one derived bucket (60-minute bar / calendar month)
+BUCKET_LOOKBACK = {"minute": 60, "day": 31}
+
+AGGREGATIONS = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+    "amount": "sum"
+}
+
+NS_PER_DAY = 86400 * 10**9
+NS_PER_MINUTE = 60 * 10**9
+
+
+def _as_ns(index):
+    """int64 nanoseconds since epoch, independent of the index's datetime resolution."""
+    return index.values.astype("datetime64[ns]").view("int64")
+
+
+def session_minute_index(index):
+    """
+    Map end-labeled minute timestamps to the A-share session minute (1..240).
+    09:31-11:30 -> 1..120, 13:01-15:00 -> 121..240; the 09:30 auction bar folds into minute 1.
+    """
+    minutes = (_as_ns(index) % NS_PER_DAY) // NS_PER_MINUTE
+    k = np.where(minutes <= 11 * 60 + 30, minutes - (9 * 60 + 30), minutes - 13 * 60 + 120)
+    return np.clip(k, 1, 240)
+
+
+def bucket_keys(index, timeframe):
+    """Monotonic int64 bucket key per bar for the given timeframe."""
+    base, size = TIMEFRAMES[timeframe]
+    if base == "minute":
+        day = _as_ns(index) // NS_PER_DAY
+        bucket = (session_minute_index(index) - 1) // size
+        return day * 1000 + bucket
+    if timeframe == "week":
+        return index.to_period("W-FRI").asi8
+    if timeframe == "month":
+        return index.to_period("M").asi8
+    return _as_ns(index) // NS_PER_DAY
+
+
+def _bucket_labels(keys, grouped_last, timeframe):
+    """Minute buckets are labeled by their end time; day/week/month by the last bar's date."""
+    base, size = TIMEFRAMES[timeframe]
+    if base != "minute":
+        return pd.DatetimeIndex(grouped_last)
+    day = keys // 1000
+    end_k = np.minimum((keys % 1000 + 1) * size, 240)
+    minutes = np.where(end_k <= 120, 9 * 60 + 30 + end_k, 13 * 60 + end_k - 120)
+    return pd.to_datetime(day * NS_PER_DAY + minutes * NS_PER_MINUTE)
+
+
+def resample_bars(bars, timeframe):
+    """
+    Aggregate bars into the given timeframe.
+    Returns: (DataFrame of aggregated bars, int64 array of their bucket keys)
+    """
+    if bars.empty:
+        return bars.iloc[:0].copy(), np.zeros(0, dtype="int64")
+    keys = bucket_keys(bars.index, timeframe)
+    agg = {c: f for c, f in AGGREGATIONS.items() if c in bars.columns}
+    grouped = bars[list(agg)].groupby(keys, sort=True)
+    out = grouped.agg(agg)
+    last_ts = pd.Series(bars.index, index=keys).groupby(level=0).last()
+    out_keys = out.index.to_numpy(dtype="int64")
+    out.index = _bucket_labels(out_keys, last_ts.to_numpy(), timeframe)
+    out.index.name = bars.index.name
+    return out, out_keys
+
+
+class BarCache:
+    """
+    Per-instrument bar cache.
+    update(code, base, bars) merges new finest bars; get(code, timeframe) never touches
+    the network and only resamples a timeframe from scratch the first time it is asked for.
+    """
+
+    def __init__(self):
+        self._base = {}      # (code, "minute"|"day") -> DataFrame
+        self._frames = {}    # (code, timeframe) -> (DataFrame, keys)
+        self._lock = threading.Lock()
+
+    def update(self, code, base, bars):
+        """
+        Merge bars into the base series ("minute" for end-labeled 1-minute bars, "day" for
+        daily bars). Bars at or after the first new timestamp replace the stored ones.
+        """
+        if bars is None or bars.empty:
+            return
+        bars = bars.sort_index()
+        start = bars.index[0]
+
+        with self._lock:
+            stored = self._base.get((code, base))
+            if stored is None or stored.empty:
+                merged = bars
+            else:
+                merged = pd.concat([stored[stored.index < start], bars])
+            self._base[(code, base)] = merged
+
+            # Re-aggregate only buckets from the first affected one onwards
+            for (c, timeframe), (frame, keys) in list(self._frames.items()):
+                if c != code or TIMEFRAMES[timeframe][0] != base:
+                    continue
+                first_key = bucket_keys(bars.index[:1], timeframe)[0]
+                # A bucket spans at most BUCKET_LOOKBACK base bars, so only that window is scanned
+                pos = merged.index.searchsorted(start)
+                window = merged.iloc[max(pos - BUCKET_LOOKBACK[base], 0):]
+                tail = window[bucket_keys(window.index, timeframe) >= first_key]
+                tail_frame, tail_keys = resample_bars(tail, timeframe)
+                keep = keys < first_key
+                self._frames[(c, timeframe)] = (
+                    pd.concat([frame[keep], tail_frame]),
+                    np.concatenate([keys[keep], tail_keys])
+                )
+
+    def get(self, code, timeframe):
+        """Bars of an instrument in the given timeframe (empty DataFrame if no data)."""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        base = TIMEFRAMES[timeframe][0]
+
+        with self._lock:
+            if timeframe in ("1m", "day"):
+                return self._base.get((code, base), pd.DataFrame())
+            cached = self._frames.get((code, timeframe))
+            if cached is None:
+                bars = self._base.get((code, base))
+                if bars is None:
+                    return pd.DataFrame()
+                cached = resample_bars(bars, timeframe)
+                self._frames[(code, timeframe)] = cached
+            return cached[0]
+
+    def timeframes(self, code):
+        """Timeframes that can be served for an instrument from stored bars."""
+        return [tf for tf, (base, _) in TIMEFRAMES.items() if (code, base) in self._base]
@@ -0,0 +1,54 @@
+"""
+Local columnar file helpers shared by the on-disk stores.
+Parquet when the optional pyarrow package is installed, pickled DataFrames otherwise
+(same layout, so the stores work on minimal installs).
+"""
+import os
+
+import pandas as pd
+
+EXTENSIONS = {"parquet": ".parquet", "pickle": ".pkl"}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def default_format():
+    return "parquet" if parquet_available() else "pickle"
+
+
+def write_frame(frame, path_stem, fmt=None):
+    """
+    Atomically write a frame to path_stem + extension (readers never see a partial file).
+    Returns: the final path.
+    """
+    fmt = fmt or default_format()
+    path = path_stem + EXTENSIONS[fmt]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_pickle(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def read_frame(path, columns=None):
+    """Read a file written by write_frame (columns is a hint; pickles are read whole)."""
+    if path.endswith(EXTENSIONS["parquet"]):
+        try:
+            return pd.read_parquet(path, columns=columns)
+        except Exception:
+            # Older files may lack a newer column: read all and let the caller select
+            return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def is_frame_file(path):
+    return path.endswith(tuple(EXTENSIONS.values()))
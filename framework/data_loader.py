@@ -60,11 +60,12 @@ class BaostockLoader:
             print(f"Exception querying data for {code}: {e}")
             return pd.DataFrame()
 
-    def fetch_daily_kline(self, code, start_date=None, end_date=None, limit_days=365):
+    def fetch_daily_kline(self, code, start_date=None, end_date=None, limit_days=365, adjustflag="3"):
         """
         Fetch daily K-line data
         Standard indices: sh.000001 (ShangZheng), sz.399001 (ShenZheng)
         Standard stocks: sh.600000, sz.000001
+        adjustflag: "3" unadjusted, "2" forward-adjusted (qfq), "1" backward-adjusted (hfq)
         """
         if not end_date:
             end_date = get_beijing_now().strftime('%Y-%m-%d')
@@ -78,13 +79,78 @@ class BaostockLoader:
         else:
             fields = "date,code,open,high,low,close,volume,amount,turn,pctChg,peTTM,pbMRQ"
             
-        return self._query_data(code, fields, start_date, end_date)
+        return self._query_data(code, fields, start_date, end_date, adjustflag=adjustflag)
 
     def fetch_index_data(self, code="sh.000001", days=365):
         """Wrapper for fetching index data"""
         return self.fetch_daily_kline(code, limit_days=days)
 
+    def fetch_adjust_factor(self, code, start_date=None, end_date=None):
+        """
+        Fetch published adjustment factors (one row per ex-date).
+        Returns: Series of cumulative backward factors (backAdjustFactor) indexed by ex-date,
+        the `factors` input of AdjustmentStore.update().
+        """
+        try:
+            self.login()
+            rs = bs.query_adjust_factor(code=code, start_date=start_date or "1990-01-01",
+                                        end_date=end_date or get_beijing_now().strftime('%Y-%m-%d'))
+            if rs.error_code != '0':
+                print(f"Adjust factor query failed for {code}: {rs.error_msg}")
+                return pd.Series(dtype="float64")
+            data_list = []
+            while (rs.error_code == '0') & rs.next():
+                data_list.append(rs.get_row_data())
+            df = pd.DataFrame(data_list, columns=rs.fields)
+            if df.empty:
+                return pd.Series(dtype="float64")
+            return pd.Series(pd.to_numeric(df["backAdjustFactor"], errors="coerce").to_numpy(),
+                             index=pd.to_datetime(df["dividOperateDate"]), name="factor").dropna()
+        except Exception as e:
+            print(f"Exception fetching adjust factors for {code}: {e}")
+            return pd.Series(dtype="float64")
+
     def search_stock(self, code_name):
         """Search for a stock code by name (partial support via baostock usually requires full code)"""
         # Baostock doesn't have a strong 'search by name' API, assumes known codes.
         pass
+
+    def fetch_stock_list(self, date=None):
+        """
+        Fetch all listed securities trading on a given day (default: today).
+        Returns: DataFrame with columns [code, tradeStatus, code_name]; codes in Baostock format.
+        Note: on non-trading days Baostock returns an empty list, so callers may retry earlier dates.
+        """
+        try:
+            self.login()
+            day = date or get_beijing_now().strftime('%Y-%m-%d')
+            rs = bs.query_all_stock(day=day)
+            if rs.error_code != '0':
+                print(f"Stock list query failed: {rs.error_msg}")
+                return pd.DataFrame()
+            data_list = []
+            while (rs.error_code == '0') & rs.next():
+                data_list.append(rs.get_row_data())
+            return pd.DataFrame(data_list, columns=rs.fields)
+        except Exception as e:
+            print(f"Exception fetching stock list: {e}")
+            return pd.DataFrame()
+
+    def fetch_stock_industry(self):
+        """
+        Fetch the CSRC industry classification of all listed stocks.
+        Returns: DataFrame with columns [updateDate, code, code_name, industry, industryClassification].
+        """
+        try:
+            self.login()
+            rs = bs.query_stock_industry()
+            if rs.error_code != '0':
+                print(f"Industry query failed: {rs.error_msg}")
+                return pd.DataFrame()
+            data_list = []
+            while (rs.error_code == '0') & rs.next():
+                data_list.append(rs.get_row_data())
+            return pd.DataFrame(data_list, columns=rs.fields)
+        except Exception as e:
+            print(f"Exception fetching stock industry: {e}")
+            return pd.DataFrame()
@@ -0,0 +1,300 @@
+"""
+Unified market data source interface.
+
+Canonical instrument IDs are "<6-digit code>.<EXCHANGE>" (e.g. "000001.SH", "399006.SZ").
+Every provider returns the same normalized schema:
+    bars:   DatetimeIndex "date", float64 columns BAR_COLUMNS (volume in hands, amount in CNY)
+    quotes: one row per instrument with QUOTE_COLUMNS, "code" holding the canonical ID
+
+DataRouter picks the fastest healthy provider per call from observed latency and error
+rate and falls back to the next one automatically (e.g. Tencent K-line -> Baostock).
+"""
+import threading
+import time
+import pandas as pd
+
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "amount", "pctChg"]
+QUOTE_COLUMNS = ["code", "name", "close", "pctChg", "open", "high", "low", "preclose",
+                 "volume", "amount", "trade_time", "timestamp"]
+
+EXCHANGES = ("SH", "SZ", "BJ")
+
+# Latency charged to a provider whose first calls failed (the upstream read timeout), so it
+# ranks by a finite score instead of staying unmeasured behind every working fallback
+FAILED_CALL_LATENCY = 5.0
+
+
+def to_canonical(code):
+    """
+    Convert any supported code format to the canonical ID.
+    Accepts "sh000001" (Tencent), "sh.000001" (Baostock), "000001.SH" and "SH000001".
+    """
+    code = code.strip()
+    if "." in code:
+        left, right = code.split(".", 1)
+        if right.upper() in EXCHANGES:
+            return f"{left}.{right.upper()}"
+        return f"{right}.{left.upper()}"
+    prefix = code[:2].upper()
+    if prefix in EXCHANGES:
+        return f"{code[2:]}.{prefix}"
+    raise ValueError(f"Unrecognized instrument code: {code}")
+
+
+def to_tencent(instrument):
+    """Canonical ID -> Tencent code ("000001.SH" -> "sh000001")."""
+    symbol, exchange = instrument.split(".")
+    return f"{exchange.lower()}{symbol}"
+
+
+def to_baostock(instrument):
+    """Canonical ID -> Baostock code ("000001.SH" -> "sh.000001")."""
+    symbol, exchange = instrument.split(".")
+    return f"{exchange.lower()}.{symbol}"
+
+
+def normalize_bars(df):
+    """Coerce a provider's bar frame to the canonical bar schema."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS, dtype="float64")
+    out = df.reindex(columns=BAR_COLUMNS).apply(pd.to_numeric, errors="coerce").astype("float64")
+    out.index = pd.DatetimeIndex(out.index, name="date")
+    out = out[~out.index.duplicated(keep="last")].sort_index()
+    if out["pctChg"].isna().all():
+        out["pctChg"] = out["close"].pct_change() * 100
+    return out
+
+
+class DataSource:
+    """
+    Provider protocol. Subclasses declare `capabilities` and implement the matching methods;
+    an empty result counts as a failure for routing purposes.
+    """
+    name = "base"
+    capabilities = frozenset()
+
+    def daily_bars(self, instrument, count=300):
+        raise NotImplementedError
+
+    def minute_bars(self, instrument, period=1, count=320):
+        raise NotImplementedError
+
+    def quotes(self, instruments):
+        raise NotImplementedError
+
+    def covers(self, instruments):
+        """The instruments this provider can quote; asking for others is not a failure."""
+        return list(instruments)
+
+
+class TencentSource(DataSource):
+    name = "tencent"
+    capabilities = frozenset({"daily_bars", "minute_bars", "quotes"})
+
+    def __init__(self, loader=None):
+        if loader is None:
+            from framework.tencent_loader import TencentLoader
+            loader = TencentLoader()
+        self.loader = loader
+
+    def daily_bars(self, instrument, count=300):
+        return normalize_bars(self.loader.fetch_k_line(to_tencent(instrument), day_count=count))
+
+    def minute_bars(self, instrument, period=1, count=320):
+        return normalize_bars(self.loader.fetch_minute_k_line(to_tencent(instrument), period=period, count=count))
+
+    def quotes(self, instruments):
+        df = self.loader.fetch_realtime_quotes([to_tencent(i) for i in instruments])
+        if df.empty:
+            return df
+        df["code"] = df["code"].map(to_canonical)
+        return df.reindex(columns=QUOTE_COLUMNS)
+
+
+class BaostockSource(DataSource):
+    """
+    Daily bars from Baostock, forward-adjusted (qfq) like the Tencent/adjusted sources it
+    backs up; volume converted from shares to hands.
+    """
+    name = "baostock"
+    capabilities = frozenset({"daily_bars"})
+
+    def __init__(self, loader=None):
+        self._loader = loader
+
+    @property
+    def loader(self):
+        # baostock is only imported (and logged in) once this fallback is actually used
+        if self._loader is None:
+            from framework.data_loader import BaostockLoader
+            self._loader = BaostockLoader()
+        return self._loader
+
+    def daily_bars(self, instrument, count=300):
+        # ~245 trading days per 365 calendar days
+        df = self.loader.fetch_daily_kline(to_baostock(instrument), limit_days=int(count * 1.5) + 10,
+                                           adjustflag="2")
+        if df.empty:
+            return normalize_bars(df)
+        df = df.set_index(pd.to_datetime(df["date"]))
+        df["volume"] = df["volume"] / 100
+        return normalize_bars(df).tail(count)
+
+
+class ProviderHealth:
+    """EWMA latency / error rate of one provider for one capability."""
+
+    def __init__(self, alpha=0.2, cooldown=30):
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.latency = None
+        self.measured = False    # latency observed on a successful call (not just charged)
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.calls = 0
+
+    def record(self, ok, elapsed):
+        self.calls += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency = self.latency + self.alpha * (elapsed - self.latency) if self.measured else elapsed
+            self.measured = True
+            self.consecutive_failures = 0
+        else:
+            if self.latency is None:
+                self.latency = max(elapsed, FAILED_CALL_LATENCY)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= 3:
+                self.down_until = time.monotonic() + self.cooldown
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def score(self):
+        """
+        Lower is better. Unmeasured providers rank after measured ones (registration order
+        among themselves), so a healthy primary is never bypassed just to probe a backup.
+        A provider that failed before ever answering is charged FAILED_CALL_LATENCY.
+        """
+        if self.latency is None:
+            return float("inf")
+        return self.latency * (1 + 4 * self.error_rate)
+
+
+class DataRouter:
+    """
+    Routes each call to the best healthy provider supporting it.
+    When the preferred provider answers, no other provider is contacted.
+    """
+
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def daily_bars(self, instrument, count=300):
+        return self._route("daily_bars", instrument, count=count)
+
+    def minute_bars(self, instrument, period=1, count=320):
+        return self._route("minute_bars", instrument, period=period, count=count)
+
+    def quotes(self, instruments):
+        """
+        Quotes from the best provider holding each instrument: codes a provider does not cover,
+        or did not return, go to the next one without counting against its health.
+        """
+        ranked = self._ranked("quotes")
+        if not ranked:
+            raise ValueError("No provider supports quotes")
+
+        remaining, frames = list(instruments), []
+        for provider, health in ranked:
+            asked = provider.covers(remaining)
+            if not asked:
+                continue
+            result = self._call(provider, health, "quotes", asked)
+            if result.empty:
+                continue
+            frames.append(result)
+            returned = set(result["code"])
+            remaining = [code for code in remaining if code not in returned]
+            if not remaining:
+                break
+        if not frames:
+            return pd.DataFrame()
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def stats(self):
+        return {
+            f"{name}/{capability}": {
+                "latency": h.latency,
+                "error_rate": h.error_rate,
+                "healthy": h.healthy,
+                "calls": h.calls
+            }
+            for (name, capability), h in self._health.items()
+        }
+
+    def _ranked(self, capability):
+        candidates = []
+        for order, provider in enumerate(self.providers):
+            if capability not in provider.capabilities:
+                continue
+            health = self._get_health(provider.name, capability)
+            # Unhealthy providers stay as a last resort rather than being dropped
+            candidates.append(((not health.healthy, health.score(), order), provider, health))
+        candidates.sort(key=lambda c: c[0])
+        return [(p, h) for _, p, h in candidates]
+
+    def _route(self, capability, *args, **kwargs):
+        ranked = self._ranked(capability)
+        if not ranked:
+            raise ValueError(f"No provider supports {capability}")
+
+        result = pd.DataFrame()
+        for provider, health in ranked:
+            result = self._call(provider, health, capability, *args, **kwargs)
+            if not result.empty:
+                return result
+        return result
+
+    def _call(self, provider, health, capability, *args, **kwargs):
+        """One provider call, recorded in its health; failures come back as an empty frame."""
+        started = time.monotonic()
+        try:
+            result = getattr(provider, capability)(*args, **kwargs)
+            ok = result is not None and not result.empty
+        except Exception as e:
+            print(f"{provider.name} {capability} failed: {e}")
+            result, ok = None, False
+        with self._lock:
+            health.record(ok, time.monotonic() - started)
+        return result if result is not None else pd.DataFrame()
+
+    def _get_health(self, name, capability):
+        key = (name, capability)
+        with self._lock:
+            if key not in self._health:
+                self._health[key] = ProviderHealth()
+            return self._health[key]
+
+
+def default_router():
+    """
+    Tencent first (realtime + K-line), Baostock as daily K-line fallback.
+    Daily bars come from the local adjustment store (raw bars + factors, synced from Tencent
+    incrementally), with full qfq downloads only as a fallback.
+    If the host runs a shared panel collector (AMARKET_SHARED_PANEL), it is tried first
+    so workers read shared memory instead of polling upstream themselves.
+    """
+    from framework.adjustment import AdjustedSource
+    from framework.shared_panel import attach_from_env
+
+    tencent = TencentSource()
+    providers = [AdjustedSource(loader=tencent.loader), tencent, BaostockSource()]
+    panel = attach_from_env()
+    if panel is not None:
+        providers.insert(0, panel)
+    return DataRouter(providers)
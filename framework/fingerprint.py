@@ -0,0 +1,105 @@
+"""
+Content fingerprints of upstream payloads, and a gate that reuses a stage's previous output
+while the fingerprint of its inputs is unchanged.
+
+A fingerprint digests exactly what downstream computation depends on:
+    quotes_fingerprint / quote_fingerprint   code, exchange time, price, volume per quote
+    bars_fingerprint                         length, first date and the whole last bar (in a
+                                             K-line only the live bar moves between fetches)
+    frame_fingerprint                        every cell of a table (macro series)
+ChangeGate.run(key, fingerprint, compute) returns the stored output when the key's previous
+fingerprint matches and otherwise computes and stores it. Runs and skips are counted per stage,
+so stats() shows how much work unchanged inputs saved.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Quote fields that change whenever a new trade prints
+QUOTE_FIELDS = ["code", "trade_time", "close", "volume"]
+
+EMPTY = "empty"
+
+
+def digest(*parts):
+    """Short stable hex digest of strings/bytes/reprs."""
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def frame_fingerprint(df):
+    """Every cell, the index and the column names of a table."""
+    if df is None or len(df) == 0:
+        return EMPTY
+    values = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return digest(tuple(map(str, df.columns)), values.tobytes())
+
+
+def bars_fingerprint(df):
+    """Bar count, first/last date and the last bar's values."""
+    if df is None or df.empty:
+        return EMPTY
+    last = df.iloc[-1].to_numpy(dtype="float64", na_value=np.nan)
+    return digest(len(df), str(df.index[0]), str(df.index[-1]), last.tobytes())
+
+
+def quotes_fingerprint(quotes):
+    """A quote batch, independent of row order (canonical quote schema)."""
+    if quotes is None or quotes.empty:
+        return EMPTY
+    columns = [c for c in QUOTE_FIELDS if c in quotes.columns]
+    return frame_fingerprint(quotes[columns].sort_values("code").reset_index(drop=True))
+
+
+def quote_fingerprint(row):
+    """One quote row (itertuples namedtuple) or None."""
+    if row is None:
+        return EMPTY
+    return digest(*(str(getattr(row, f, None)) for f in QUOTE_FIELDS))
+
+
+class ChangeGate:
+    """
+    Last (fingerprint, output) per key, LRU-bounded to max_entries keys.
+    Keys are a stage name or a (stage, item) tuple; counters are kept per stage.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, fingerprint, compute):
+        stage = key[0] if isinstance(key, tuple) else key
+        with self._lock:
+            entry = self._entries.get(key)
+            counts = self._counts.setdefault(stage, {"runs": 0, "skips": 0})
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                counts["skips"] += 1
+                return entry[1]
+        # Computed outside the lock: stages may be slow (network, model calls)
+        output = compute()
+        with self._lock:
+            self._entries[key] = (fingerprint, output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            counts["runs"] += 1
+        return output
+
+    def stats(self):
+        """{stage: {"runs", "skips", "skip_ratio"}}."""
+        with self._lock:
+            counts = {stage: dict(c) for stage, c in self._counts.items()}
+        for c in counts.values():
+            total = c["runs"] + c["skips"]
+            c["skip_ratio"] = c["skips"] / total if total else 0.0
+        return counts
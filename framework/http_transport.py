@@ -0,0 +1,223 @@
+"""
+Resilient HTTP transport for upstream data APIs.
+- Pooled keep-alive connections (one requests.Session, tuned HTTPAdapter)
+- Jittered exponential-backoff retries within a per-call deadline
+- Hedged requests: a duplicate is sent once the primary exceeds the endpoint's
+  observed latency percentile; the first successful response wins
+- Per-endpoint circuit breaker; while open, the last-known-good payload is served
+  (kept for the most recently fetched `fallback_entries` URLs)
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+class CircuitOpenError(Exception):
+    """Raised when an endpoint's breaker is open and no cached payload exists."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `reset_timeout` seconds (one trial call);
+    half-open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of successful request latencies (seconds) for one endpoint."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        return float(np.percentile(np.fromiter(self.samples, dtype=float), q * 100))
+
+
+class HttpTransport:
+    def __init__(self, pool_size=20, timeout=(3.05, 5), retries=2, backoff=0.2, deadline=8.0,
+                 hedge_percentile=0.95, hedge_min_samples=20, hedge_max_delay=2.0,
+                 failure_threshold=5, reset_timeout=30, fallback_entries=256):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Connection": "keep-alive"
+        })
+
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_delay = hedge_max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback_entries = fallback_entries
+
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="http")
+        self._breakers = {}
+        self._latency = {}
+        # url -> parsed payload, LRU: quote URLs carry their code batch, so keys keep changing
+        self._last_good = OrderedDict()
+        self._counters = {}      # endpoint -> dict of counts
+        self._lock = threading.Lock()
+
+    def get(self, url, endpoint="default", parse=lambda r: r.text):
+        """
+        GET url and return parse(response).
+        On failure (or while the endpoint's breaker is open) returns the last-known-good
+        payload for the same URL; raises if none exists.
+        """
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            self._count(endpoint, "short_circuited")
+            return self._fallback(url, endpoint, CircuitOpenError(f"circuit open for {endpoint}"))
+
+        started = time.monotonic()
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                payload = self._hedged(url, endpoint, parse, started + self.deadline)
+                breaker.record_success()
+                self._remember(url, payload)
+                return payload
+            except Exception as e:
+                error = e
+                self._count(endpoint, "errors")
+                # Full-jitter backoff, never past the call deadline
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                if attempt == self.retries or time.monotonic() - started + delay >= self.deadline:
+                    break
+                self._count(endpoint, "retries")
+                time.sleep(delay)
+
+        breaker.record_failure()
+        return self._fallback(url, endpoint, error)
+
+    def stats(self):
+        """Per-endpoint breaker state, latency percentiles and counters."""
+        out = {}
+        for endpoint, breaker in self._breakers.items():
+            tracker = self._latency[endpoint]
+            out[endpoint] = {
+                "state": breaker.state,
+                "p50": tracker.percentile(0.5),
+                "p95": tracker.percentile(0.95),
+                **self._counters.get(endpoint, {})
+            }
+        return out
+
+    # --- Internals ---
+
+    def _hedged(self, url, endpoint, parse, deadline_at):
+        tracker = self._latency[endpoint]
+        primary = self._executor.submit(self._fetch, url, parse)
+        hedge_delay = None
+        if len(tracker.samples) >= self.hedge_min_samples:
+            hedge_delay = min(tracker.percentile(self.hedge_percentile), self.hedge_max_delay)
+
+        pending = {primary}
+        if hedge_delay is not None:
+            done, _ = wait(pending, timeout=max(min(hedge_delay, deadline_at - time.monotonic()), 0))
+            if not done and time.monotonic() < deadline_at:
+                self._count(endpoint, "hedged")
+                pending.add(self._executor.submit(self._fetch, url, parse))
+
+        error = None
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                # Call deadline passed: abandon the attempts still in flight
+                for future in pending:
+                    future.cancel()
+                self._count(endpoint, "deadline_exceeded")
+                raise TimeoutError(f"{endpoint} exceeded the {self.deadline}s call deadline")
+            for future in done:
+                try:
+                    payload, elapsed = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                tracker.add(elapsed)
+                return payload
+        raise error
+
+    def _fetch(self, url, parse):
+        started = time.monotonic()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        payload = parse(response)
+        return payload, time.monotonic() - started
+
+    def _remember(self, url, payload):
+        with self._lock:
+            self._last_good[url] = payload
+            self._last_good.move_to_end(url)
+            while len(self._last_good) > self.fallback_entries:
+                self._last_good.popitem(last=False)
+
+    def _fallback(self, url, endpoint, error):
+        with self._lock:
+            payload = self._last_good.get(url)
+        if payload is not None:
+            self._count(endpoint, "served_stale")
+            print(f"Serving last-known-good data for {endpoint}: {error}")
+            return payload
+        raise error
+
+    def _breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._latency[endpoint] = LatencyTracker()
+            return self._breakers[endpoint]
+
+    def _count(self, endpoint, name):
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {})
+            counters[name] = counters.get(name, 0) + 1
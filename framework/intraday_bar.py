@@ -0,0 +1,93 @@
+"""
+Intraday bar builder.
+Maintains today's open/high/low/close/volume per instrument from successive realtime
+quote snapshots and writes it into a cached daily K-line frame as the live bar.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+# Cumulative intraday volume should never exceed this multiple of a normal full day;
+# anything above means the quote reports shares while the K-line reports hands.
+UNIT_MISMATCH_RATIO = 20
+
+
+class IntradayBarBuilder:
+    def __init__(self):
+        self.bars = {}           # code -> dict(date, open, high, low, close, volume)
+        self.volume_scale = {}   # code -> multiplier converting quote volume to K-line units
+
+    def calibrate_volume(self, code, kline_volume, quote_volume, typical_volume=None):
+        """
+        Determine the quote->K-line volume multiplier for an instrument (a power of 10).
+        Uses an overlapping bar (same trade date in both sources) when available,
+        otherwise a magnitude check against a typical full-day K-line volume.
+        """
+        if quote_volume is None or not quote_volume > 0:
+            return self.volume_scale.get(code, 1.0)
+
+        if kline_volume is not None and kline_volume > 0:
+            self.volume_scale[code] = 10.0 ** round(math.log10(kline_volume / quote_volume))
+        elif code not in self.volume_scale and typical_volume is not None and typical_volume > 0:
+            self.volume_scale[code] = 0.01 if quote_volume > typical_volume * UNIT_MISMATCH_RATIO else 1.0
+        return self.volume_scale.get(code, 1.0)
+
+    def update(self, code, trade_date, price, cum_volume, open_price=None, high=None, low=None):
+        """
+        Merge one quote snapshot into today's bar. A new trade_date starts a new bar.
+        open/high/low from the quote (session values) take precedence when present, so a
+        late start or missed snapshots still yield the exchange's session range.
+        Returns: the current bar dict (unchanged if the snapshot is not a valid trading quote).
+        """
+        if not price > 0 or not cum_volume > 0:
+            return self.bars.get(code)
+
+        trade_date = pd.Timestamp(trade_date).normalize()
+        volume = cum_volume * self.volume_scale.get(code, 1.0)
+        bar = self.bars.get(code)
+
+        if bar is None or bar["date"] != trade_date:
+            bar = {
+                "date": trade_date,
+                "open": open_price if open_price and open_price > 0 else price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "volume": volume
+            }
+            self.bars[code] = bar
+
+        if high and high > 0:
+            bar["high"] = max(bar["high"], high)
+        if low and low > 0:
+            bar["low"] = min(bar["low"], low)
+        bar["high"] = max(bar["high"], price)
+        bar["low"] = min(bar["low"], price)
+        bar["close"] = price
+        # Cumulative volume is monotonic within a session; ignore out-of-order snapshots
+        bar["volume"] = max(bar["volume"], volume)
+        return bar
+
+    def write_live_bar(self, code, df, prev_close):
+        """
+        Write today's bar into df as its last row.
+        Replaces the last row in place when it is already today's bar; otherwise appends
+        once (the only copy of the day), after which every tick is an in-place update.
+        Returns: the frame holding the live bar (df itself unless a row was appended).
+        """
+        bar = self.bars.get(code)
+        if bar is None:
+            return df
+
+        if df.empty or df.index[-1] != bar["date"]:
+            if not df.empty and df.index[-1] > bar["date"]:
+                return df
+            row = pd.DataFrame({c: [np.nan] for c in df.columns}, index=pd.DatetimeIndex([bar["date"]], name=df.index.name))
+            df = pd.concat([df, row.astype(df.dtypes.to_dict())])
+
+        values = dict(bar)
+        values["pctChg"] = (bar["close"] / prev_close - 1) * 100 if prev_close and prev_close > 0 else np.nan
+        for col in ("open", "high", "low", "close", "volume", "pctChg"):
+            if col in df.columns:
+                df.iat[-1, df.columns.get_loc(col)] = values[col]
+        return df
@@ -0,0 +1,307 @@
+"""
+Macro series registry, local time-series cache and background fetch scheduler.
+
+Each MacroSeries declares where its data comes from (an AkShare call plus parsing into a
+normalized frame: DatetimeIndex "date", float columns), its unit and its publication
+cadence. MacroScheduler fetches the series that are due on a bounded thread pool and writes
+them to MacroStore; the dashboard only ever reads the store, so rendering does no I/O.
+
+Adding an indicator:
+    register(MacroSeries("lpr_1y", "1年期LPR", "%", "monthly", fetch_lpr, value_column="lpr_1y"))
+"""
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+DEFAULT_ROOT = os.path.join("data", "macro")
+
+# Seconds between refreshes by publication cadence (data lands at unpredictable times
+# within the period, so series are re-checked well before the next release)
+CADENCE_SECONDS = {
+    "daily": 2 * 3600,
+    "weekly": 6 * 3600,
+    "monthly": 12 * 3600
+}
+
+# Seconds before a failed series is tried again
+RETRY_SECONDS = 300
+
+
+class MacroSeries:
+    """
+    One macro indicator.
+    fetch: callable returning the normalized frame (may raise; an empty frame is a failure)
+    value_column: the column shown as the series' headline value
+    """
+
+    def __init__(self, name, title, unit, cadence, fetch, value_column="value"):
+        if cadence not in CADENCE_SECONDS:
+            raise ValueError(f"Unknown cadence for {name}: {cadence}")
+        self.name = name
+        self.title = title
+        self.unit = unit
+        self.cadence = cadence
+        self.fetch = fetch
+        self.value_column = value_column
+
+    @property
+    def refresh_interval(self):
+        return CADENCE_SECONDS[self.cadence]
+
+
+REGISTRY = {}
+
+
+def register(series):
+    REGISTRY[series.name] = series
+    return series
+
+
+def normalize_series(df, date_column, columns, date_format=None):
+    """
+    AkShare frame -> normalized frame.
+    columns: {source column: output column}; values are coerced to float (bad cells -> NaN).
+    """
+    out = pd.DataFrame({
+        dst: pd.to_numeric(df[src], errors="coerce") for src, dst in columns.items()
+    })
+    out.index = pd.DatetimeIndex(pd.to_datetime(df[date_column], format=date_format, errors="coerce"), name="date")
+    out = out[out.index.notna()]
+    return out[~out.index.duplicated(keep="last")].sort_index().astype("float64")
+
+
+# --- Built-in series (akshare is imported only when a fetch actually runs) ---
+
+def _fetch_margin():
+    from framework.macro_loader import MacroLoader
+    return MacroLoader().fetch_margin_history()
+
+
+def _fetch_money_supply():
+    from framework.macro_loader import MacroLoader
+    return MacroLoader().fetch_money_supply_history()
+
+
+def _fetch_shibor():
+    import akshare as ak
+    df = ak.macro_china_shibor_all()
+    # Columns: 日期, O/N-定价, O/N-涨跌幅, 1W-定价, ..., 3M-定价, ...
+    return normalize_series(df, "日期", {"O/N-定价": "overnight", "1W-定价": "1w", "3M-定价": "3m"})
+
+
+def _fetch_social_financing():
+    import akshare as ak
+    df = ak.macro_china_shrzgm()
+    # Columns: 月份 (YYYYMM), 社会融资规模增量 (亿元), 其中-人民币贷款, ...
+    return normalize_series(df, "月份", {"社会融资规模增量": "increment", "其中-人民币贷款": "rmb_loans"},
+                            date_format="%Y%m")
+
+
+def _fetch_northbound():
+    import akshare as ak
+    df = ak.stock_hsgt_hist_em(symbol="北向资金")
+    # Columns: 日期, 当日成交净买额 (亿元), 历史累计净买额, ...
+    return normalize_series(df, "日期", {"当日成交净买额": "net_buy", "历史累计净买额": "cumulative"})
+
+
+def _fetch_yearly_rate(func_name):
+    def fetch():
+        import akshare as ak
+        df = getattr(ak, func_name)()
+        # Columns: 商品, 日期, 今值, 预测值, 前值 (unreleased months have 今值 NaN)
+        return normalize_series(df, "日期", {"今值": "yoy", "预测值": "forecast"}).dropna(subset=["yoy"])
+    return fetch
+
+
+register(MacroSeries("margin", "两融余额", "元", "daily", _fetch_margin, value_column="total_balance"))
+register(MacroSeries("money_supply", "M1-M2剪刀差", "%", "monthly", _fetch_money_supply, value_column="scissors"))
+register(MacroSeries("shibor", "SHIBOR隔夜", "%", "daily", _fetch_shibor, value_column="overnight"))
+register(MacroSeries("social_financing", "社融增量", "亿元", "monthly", _fetch_social_financing, value_column="increment"))
+register(MacroSeries("northbound", "北向资金净买入", "亿元", "daily", _fetch_northbound, value_column="net_buy"))
+register(MacroSeries("cpi", "CPI同比", "%", "monthly", _fetch_yearly_rate("macro_china_cpi_yearly"), value_column="yoy"))
+register(MacroSeries("ppi", "PPI同比", "%", "monthly", _fetch_yearly_rate("macro_china_ppi_yearly"), value_column="yoy"))
+
+
+class MacroStore:
+    """
+    Local time-series cache: frames live in memory and are persisted one file per series,
+    so a restarted process serves the last fetched data immediately.
+    `version` increases on every write (cheap change detection for readers).
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.version = 0
+        self._frames = {}
+        self._fetched_at = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.pkl")
+
+    def _load(self):
+        self.reload()
+
+    def reload(self):
+        """
+        Pick up series files written by another process (e.g. the shared panel collector)
+        since they were last read. Returns: names of the reloaded series.
+        """
+        reloaded = []
+        for path in glob.glob(os.path.join(self.root, "*.pkl")):
+            name = os.path.basename(path)[:-len(".pkl")]
+            try:
+                mtime = os.path.getmtime(path)
+                known = self.fetched_at(name)
+                if known is not None and mtime <= known:
+                    continue
+                frame = pd.read_pickle(path)
+            except Exception as e:
+                print(f"Ignoring unreadable macro cache {path}: {e}")
+                continue
+            with self._lock:
+                self._frames[name] = frame
+                self._fetched_at[name] = mtime
+                self.version += 1
+            reloaded.append(name)
+        return reloaded
+
+    def put(self, name, frame):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._path(name) + ".tmp"
+        frame.to_pickle(tmp)
+        os.replace(tmp, self._path(name))
+        with self._lock:
+            self._frames[name] = frame
+            self._fetched_at[name] = time.time()
+            self.version += 1
+
+    def get(self, name):
+        """Stored frame (empty if the series was never fetched). Never does network I/O."""
+        with self._lock:
+            return self._frames.get(name, pd.DataFrame())
+
+    def fetched_at(self, name):
+        with self._lock:
+            return self._fetched_at.get(name)
+
+    def latest(self, registry=None):
+        """One row per registered series: title, unit, latest date and headline value."""
+        registry = REGISTRY if registry is None else registry
+        rows = []
+        for name, series in registry.items():
+            df = self.get(name)
+            values = df[series.value_column].dropna() if series.value_column in df.columns else pd.Series(dtype=float)
+            rows.append({
+                "name": name,
+                "title": series.title,
+                "unit": series.unit,
+                "date": values.index[-1] if not values.empty else pd.NaT,
+                "value": float(values.iloc[-1]) if not values.empty else float("nan"),
+                "fetched_at": self.fetched_at(name)
+            })
+        return pd.DataFrame(rows).set_index("name")
+
+
+class MacroScheduler:
+    """
+    Fetches due series concurrently on at most `workers` threads.
+    A series is due when it was never fetched, or its cadence interval has elapsed, and it
+    is not already in flight or backing off after a failure.
+    fetch=False only follows the on-disk cache another process (the shared panel collector)
+    keeps current, reloading changed files every tick.
+    """
+
+    def __init__(self, store=None, registry=None, workers=4, tick=30, fetch=True):
+        self.store = store or MacroStore()
+        self.registry = REGISTRY if registry is None else registry
+        self.tick = tick
+        self.fetch = fetch
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="macro")
+        self._in_flight = set()
+        self._retry_at = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        names = []
+        with self._lock:
+            for name, series in self.registry.items():
+                if name in self._in_flight or now < self._retry_at.get(name, 0):
+                    continue
+                fetched = self.store.fetched_at(name)
+                if fetched is None or now - fetched >= series.refresh_interval:
+                    names.append(name)
+        return names
+
+    def run_once(self, wait=True):
+        """Submit every due series. Returns: the submitted names."""
+        names = self.due()
+        futures = []
+        with self._lock:
+            self._in_flight.update(names)
+        for name in names:
+            futures.append(self._pool.submit(self._fetch, name))
+        if wait:
+            for future in futures:
+                future.result()
+        return names
+
+    def _fetch(self, name):
+        series = self.registry[name]
+        started = time.monotonic()
+        try:
+            frame = series.fetch()
+            ok = frame is not None and not frame.empty
+            if ok:
+                self.store.put(name, frame)
+            else:
+                print(f"Macro series {name} returned no data")
+        except Exception as e:
+            print(f"Macro series {name} failed: {e}")
+            ok = False
+        with self._lock:
+            self._in_flight.discard(name)
+            stats = self._stats.setdefault(name, {"ok": 0, "failed": 0, "last_seconds": None})
+            stats["ok" if ok else "failed"] += 1
+            stats["last_seconds"] = time.monotonic() - started
+            if ok:
+                self._retry_at.pop(name, None)
+            else:
+                self._retry_at[name] = time.time() + RETRY_SECONDS
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="macro-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._pool.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.fetch:
+                    self.run_once(wait=False)
+                else:
+                    self.store.reload()
+            except Exception as e:
+                print(f"Macro scheduler error: {e}")
+            self._stop.wait(self.tick)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
@@ -0,0 +1,227 @@
+"""
+Per-security margin financing detail.
+Ingests the daily per-stock margin tables of both exchanges (AkShare) into a local
+columnar store, one file per trading day:
+    <root>/date=YYYY-MM-DD.parquet    long format: date, instrument, financing_balance, ...
+Queries pivot the stored days into (dates x instruments) panels once and aggregate them
+by sector/board with vectorized group-bys, so rankings need no network access.
+
+Usage:
+    python -m framework.margin_detail --days 5          # ingest missing days, rank industries
+"""
+import argparse
+import glob
+import os
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from framework.columnar import default_format, is_frame_file, read_frame, write_frame
+from framework.timezone_utils import get_beijing_now
+from framework.universe import UNCLASSIFIED, fetch_sectors
+
+DEFAULT_ROOT = os.path.join("data", "margin_detail")
+
+# Stored per security and day (Yuan / shares)
+FIELDS = ["financing_balance", "financing_buy", "short_volume"]
+
+
+def _normalize(df, code_col, name_col, columns, exchange, date):
+    out = pd.DataFrame({dst: pd.to_numeric(df[src], errors="coerce") for src, dst in columns.items()})
+    out.insert(0, "name", df[name_col].astype(str).to_numpy())
+    out.insert(0, "instrument", df[code_col].astype(str).str.zfill(6).to_numpy() + f".{exchange}")
+    out.insert(0, "date", pd.Timestamp(date))
+    return out.reindex(columns=["date", "instrument", "name"] + FIELDS)
+
+
+def fetch_sse_detail(date):
+    """SSE per-security margin detail for a trading day (empty on failure/holiday)."""
+    import akshare as ak
+    try:
+        df = ak.stock_margin_detail_sse(date=pd.Timestamp(date).strftime("%Y%m%d"))
+        # Columns: 信用交易日期, 标的证券代码, 标的证券简称, 融资余额, 融资买入额, 融资偿还额, 融券余量, ...
+        return _normalize(df, "标的证券代码", "标的证券简称",
+                          {"融资余额": "financing_balance", "融资买入额": "financing_buy", "融券余量": "short_volume"},
+                          "SH", date)
+    except Exception as e:
+        print(f"Error fetching SSE margin detail for {date}: {e}")
+        return pd.DataFrame()
+
+
+def fetch_szse_detail(date):
+    """SZSE per-security margin detail for a trading day (empty on failure/holiday)."""
+    import akshare as ak
+    try:
+        df = ak.stock_margin_detail_szse(date=pd.Timestamp(date).strftime("%Y%m%d"))
+        # Columns: 证券代码, 证券简称, 融资买入额, 融资余额, 融券卖出量, 融券余量, 融券余额, 融资融券余额
+        return _normalize(df, "证券代码", "证券简称",
+                          {"融资余额": "financing_balance", "融资买入额": "financing_buy", "融券余量": "short_volume"},
+                          "SZ", date)
+    except Exception as e:
+        print(f"Error fetching SZSE margin detail for {date}: {e}")
+        return pd.DataFrame()
+
+
+class MarginDetailStore:
+    """
+    Day-partitioned store of per-security margin detail.
+    panel(field) pivots all stored days into a (dates x instruments) float64 frame and caches
+    it until the next ingest.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, fmt=None, fetchers=(fetch_sse_detail, fetch_szse_detail)):
+        self.root = root
+        self.fmt = fmt or default_format()
+        self.fetchers = fetchers
+        self._panels = {}
+        self._lock = threading.Lock()
+
+    def _path_stem(self, day):
+        return os.path.join(self.root, f"date={pd.Timestamp(day).strftime('%Y-%m-%d')}")
+
+    def days(self):
+        files = [p for p in glob.glob(os.path.join(self.root, "date=*")) if is_frame_file(p)]
+        return sorted(os.path.basename(p)[len("date="):len("date=YYYY-MM-DD")] for p in files)
+
+    def ingest(self, day):
+        """
+        Fetch and store one trading day for both exchanges.
+        Returns: number of securities stored (0 for holidays/failures; nothing is written
+        unless every exchange answered, so a partial day is retried later).
+        """
+        frames = [fetch(day) for fetch in self.fetchers]
+        if any(f.empty for f in frames):
+            return 0
+        frame = pd.concat(frames, ignore_index=True)
+        frame = frame.drop_duplicates(subset="instrument", keep="last")
+        frame["instrument"] = frame["instrument"].astype("category")
+        write_frame(frame, self._path_stem(day), self.fmt)
+        with self._lock:
+            self._panels.clear()
+        return len(frame)
+
+    def ingest_missing(self, days=5, today=None):
+        """Ingest the last `days` weekdays not yet stored. Returns: {day: rows}."""
+        stored = set(self.days())
+        day = pd.Timestamp(today) if today else pd.Timestamp(get_beijing_now().date())
+        results = {}
+        checked = 0
+        while checked < days:
+            day -= timedelta(days=1)
+            if day.weekday() >= 5:
+                continue
+            checked += 1
+            key = day.strftime("%Y-%m-%d")
+            if key not in stored:
+                results[key] = self.ingest(day)
+        return results
+
+    def load(self, start=None, end=None):
+        """Long-format rows for stored days in [start, end]."""
+        frames = []
+        for day in self.days():
+            if start is not None and day < pd.Timestamp(start).strftime("%Y-%m-%d"):
+                continue
+            if end is not None and day > pd.Timestamp(end).strftime("%Y-%m-%d"):
+                continue
+            path = next(p for p in glob.glob(self._path_stem(day) + ".*") if is_frame_file(p))
+            frames.append(read_frame(path))
+        if not frames:
+            return pd.DataFrame(columns=["date", "instrument", "name"] + FIELDS)
+        return pd.concat(frames, ignore_index=True)
+
+    def panel(self, field="financing_balance"):
+        """(dates x instruments) panel of one field across all stored days."""
+        with self._lock:
+            cached = self._panels.get(field)
+        if cached is not None:
+            return cached
+        rows = self.load()
+        if rows.empty:
+            panel = pd.DataFrame()
+        else:
+            panel = rows.pivot(index="date", columns="instrument", values=field).astype("float64")
+            panel.columns = panel.columns.astype(str)
+        with self._lock:
+            self._panels[field] = panel
+        return panel
+
+    def names(self):
+        """Latest known name per instrument."""
+        days = self.days()
+        rows = self.load(start=days[-1]) if days else self.load()
+        return rows.set_index(rows["instrument"].astype(str))["name"]
+
+
+def group_change(panel, groups, periods=1):
+    """
+    Aggregate a (dates x instruments) panel by group for the last row vs `periods` rows before.
+    groups: Series instrument -> group label (unmapped instruments go to UNCLASSIFIED).
+    Only instruments present on both days are counted, so listings/delistings do not show up
+    as flows. Returns: DataFrame [balance, prev_balance, change, change_pct, count] by group,
+    ranked by change_pct.
+    """
+    if len(panel) <= periods:
+        return pd.DataFrame(columns=["balance", "prev_balance", "change", "change_pct", "count"])
+    values = panel.to_numpy(dtype="float64")
+    current, previous = values[-1], values[-1 - periods]
+    both = ~np.isnan(current) & ~np.isnan(previous)
+
+    labels = groups.reindex(panel.columns).fillna(UNCLASSIFIED).to_numpy()[both]
+    codes, uniques = pd.factorize(labels)
+    balance = np.bincount(codes, weights=current[both], minlength=len(uniques))
+    prev_balance = np.bincount(codes, weights=previous[both], minlength=len(uniques))
+    count = np.bincount(codes, minlength=len(uniques))
+
+    out = pd.DataFrame({
+        "balance": balance,
+        "prev_balance": prev_balance,
+        "change": balance - prev_balance,
+        "change_pct": np.divide(balance - prev_balance, prev_balance,
+                                out=np.full(len(uniques), np.nan), where=prev_balance > 0) * 100,
+        "count": count
+    }, index=pd.Index(uniques, name=groups.name or "group"))
+    return out.sort_values("change_pct", ascending=False)
+
+
+def stock_change(panel, periods=1, top=20, names=None):
+    """Per-security day-over-day balance change, ranked by percentage change."""
+    if len(panel) <= periods:
+        return pd.DataFrame(columns=["balance", "change", "change_pct"])
+    current, previous = panel.iloc[-1], panel.iloc[-1 - periods]
+    out = pd.DataFrame({
+        "balance": current,
+        "change": current - previous,
+        "change_pct": (current / previous.where(previous > 0) - 1) * 100
+    }).dropna()
+    if names is not None:
+        out.insert(0, "name", names.reindex(out.index))
+    out = out.sort_values("change_pct", ascending=False)
+    return out.head(top) if top else out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest per-security margin detail and rank sectors")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--days", type=int, default=5, help="weekdays to backfill")
+    parser.add_argument("--by", choices=["industry", "board"], default="industry")
+    parser.add_argument("--periods", type=int, default=1, help="compare with N stored days earlier")
+    args = parser.parse_args()
+
+    store = MarginDetailStore(args.root)
+    for day, rows in store.ingest_missing(args.days).items():
+        print(f"{day}: {rows} securities")
+
+    sectors = fetch_sectors()
+    if sectors.empty:
+        print("Sector classification unavailable.")
+        return
+    ranking = group_change(store.panel("financing_balance"), sectors[args.by], periods=args.periods)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(ranking)
+
+
+if __name__ == "__main__":
+    main()
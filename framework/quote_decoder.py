@@ -0,0 +1,185 @@
+"""
+Bulk decoder for Tencent realtime quote payloads (qt.gtimg.cn).
+
+A response is one `v_<code>="f0~f1~...~fN";` line per instrument. decode_quotes() maps the
+full field layout (price block, 5-level order book, turnover, valuation, limit prices and
+exchange time) into a NumPy structured array with fixed dtypes (QUOTE_DTYPE). The numeric
+cells of all rows are parsed in one np.fromstring call rather than per field and row.
+Order-book and limit statistics are then plain array reads (order_book_imbalance, limit_hits).
+
+Units are normalized: volume in hands, amount and market caps in Yuan, percentages as %.
+"""
+import warnings
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from framework.data_source import to_canonical
+
+BOOK_LEVELS = 5
+
+# Field positions in the `~`-separated payload
+F_NAME = 1
+F_TIME = 30
+F_BID = 9        # bid1 price, bid1 volume, ..., bid5 price, bid5 volume (9..18)
+F_ASK = 19       # ask1 price, ask1 volume, ..., ask5 volume (19..28)
+
+# Scalar numeric fields: (name, position, scale)
+NUMERIC_FIELDS = [
+    ("price", 3, 1), ("preclose", 4, 1), ("open", 5, 1), ("volume", 6, 1),
+    ("outer_volume", 7, 1), ("inner_volume", 8, 1),
+    ("change", 31, 1), ("pct_chg", 32, 1), ("high", 33, 1), ("low", 34, 1),
+    ("amount", 37, 1e4),            # 万 -> Yuan
+    ("turnover", 38, 1), ("pe", 39, 1), ("amplitude", 43, 1),
+    ("float_cap", 44, 1e8), ("total_cap", 45, 1e8),   # 亿 -> Yuan
+    ("pb", 46, 1), ("limit_up", 47, 1), ("limit_down", 48, 1), ("volume_ratio", 49, 1)
+]
+
+# Fields decoded per row (longer payloads are truncated, shorter ones padded with NaN)
+N_FIELDS = 50
+
+# Rows with fewer fields are not quotes (e.g. v_pv_none_match="1")
+MIN_FIELDS = 35
+
+QUOTE_DTYPE = np.dtype(
+    [("code", "U12"), ("name", "U16")]
+    + [(name, "f8") for name, _, _ in NUMERIC_FIELDS]
+    + [("bid_price", "f8", (BOOK_LEVELS,)), ("bid_volume", "f8", (BOOK_LEVELS,)),
+       ("ask_price", "f8", (BOOK_LEVELS,)), ("ask_volume", "f8", (BOOK_LEVELS,)),
+       ("exchange_time", "datetime64[s]")]
+)
+
+_BID_PRICE = [F_BID + 2 * i for i in range(BOOK_LEVELS)]
+_BID_VOLUME = [F_BID + 2 * i + 1 for i in range(BOOK_LEVELS)]
+_ASK_PRICE = [F_ASK + 2 * i for i in range(BOOK_LEVELS)]
+_ASK_VOLUME = [F_ASK + 2 * i + 1 for i in range(BOOK_LEVELS)]
+_NUMERIC_POSITIONS = sorted({pos for _, pos, _ in NUMERIC_FIELDS} | set(_BID_PRICE + _BID_VOLUME + _ASK_PRICE + _ASK_VOLUME))
+_COLUMN = {pos: i for i, pos in enumerate(_NUMERIC_POSITIONS)}
+
+
+def split_payload(text):
+    """Response text -> (tencent codes, list of field lists), skipping non-quote lines."""
+    codes, rows = [], []
+    for line in text.split(";"):
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        fields = value.strip().strip('"').split("~")
+        if len(fields) < MIN_FIELDS:
+            continue
+        codes.append(key.strip().rsplit("_", 1)[-1])
+        if len(fields) < N_FIELDS:
+            fields += [""] * (N_FIELDS - len(fields))
+        rows.append(fields[:N_FIELDS])
+    return codes, rows
+
+
+def _numeric_matrix(rows):
+    """
+    (rows x numeric positions) float64 matrix. All cells are joined into one buffer and
+    parsed by a single np.fromstring call; empty cells become NaN. If a malformed cell breaks
+    that parse, each column is coerced separately instead (bad cells -> NaN).
+    """
+    getter = itemgetter(*_NUMERIC_POSITIONS)
+    cells = [x or "nan" for row in rows for x in getter(row)]
+    width = len(_NUMERIC_POSITIONS)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            values = np.fromstring(" ".join(cells), sep=" ")
+    except ValueError:
+        # Newer NumPy raises on unparsable text instead of stopping early
+        values = ()
+    if len(values) == len(cells):
+        return values.reshape(len(rows), width)
+    matrix = np.array(cells, dtype=object).reshape(len(rows), width)
+    return np.column_stack([pd.to_numeric(matrix[:, j], errors="coerce") for j in range(width)]).astype("f8")
+
+
+def decode_quotes(text):
+    """
+    Decode a quote response into a structured array of QUOTE_DTYPE (one record per
+    instrument, canonical codes, exchange_time from field 30).
+    """
+    codes, rows = split_payload(text)
+    out = np.zeros(len(rows), dtype=QUOTE_DTYPE)
+    if not rows:
+        return out
+
+    values = _numeric_matrix(rows)
+    out["code"] = [to_canonical(c) for c in codes]
+    out["name"] = [row[F_NAME] for row in rows]
+    for name, pos, scale in NUMERIC_FIELDS:
+        out[name] = values[:, _COLUMN[pos]] * scale if scale != 1 else values[:, _COLUMN[pos]]
+    out["bid_price"] = values[:, [_COLUMN[p] for p in _BID_PRICE]]
+    out["bid_volume"] = values[:, [_COLUMN[p] for p in _BID_VOLUME]]
+    out["ask_price"] = values[:, [_COLUMN[p] for p in _ASK_PRICE]]
+    out["ask_volume"] = values[:, [_COLUMN[p] for p in _ASK_VOLUME]]
+    out["exchange_time"] = pd.to_datetime([row[F_TIME] for row in rows], format="%Y%m%d%H%M%S",
+                                          errors="coerce").values.astype("datetime64[s]")
+    return out
+
+
+def to_frame(records):
+    """Structured records -> DataFrame; book levels become bid1..bid5 / bid1_volume.. columns."""
+    scalars = {name: records[name] for name in QUOTE_DTYPE.names if QUOTE_DTYPE[name].shape == ()}
+    frame = pd.DataFrame(scalars)
+    for side in ("bid", "ask"):
+        for level in range(BOOK_LEVELS):
+            frame[f"{side}{level + 1}"] = records[f"{side}_price"][:, level]
+            frame[f"{side}{level + 1}_volume"] = records[f"{side}_volume"][:, level]
+    return frame
+
+
+def to_arrow(records):
+    """
+    Structured records -> pyarrow Table with a fixed schema (book levels as fixed-size lists).
+    Requires the optional pyarrow dependency; raises ImportError if it is missing.
+    """
+    import pyarrow as pa
+
+    columns, fields = [], []
+    for name in QUOTE_DTYPE.names:
+        values = records[name]
+        if QUOTE_DTYPE[name].shape:
+            flat = pa.array(values.reshape(-1), type=pa.float64())
+            array = pa.FixedSizeListArray.from_arrays(flat, BOOK_LEVELS)
+        elif values.dtype.kind == "U":
+            array = pa.array(values.tolist(), type=pa.string())
+        else:
+            array = pa.array(values)
+        columns.append(array)
+        fields.append(pa.field(name, array.type))
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+# --- Vectorized reads ---
+
+def order_book_imbalance(records, levels=BOOK_LEVELS):
+    """(bid size - ask size) / (bid size + ask size) over the top `levels`; NaN for an empty book."""
+    bid = np.nansum(records["bid_volume"][:, :levels], axis=1)
+    ask = np.nansum(records["ask_volume"][:, :levels], axis=1)
+    total = bid + ask
+    return np.divide(bid - ask, total, out=np.full(len(records), np.nan), where=total > 0)
+
+
+def spread(records):
+    """Best ask - best bid (NaN when either side is empty, e.g. at a limit price)."""
+    bid, ask = records["bid_price"][:, 0], records["ask_price"][:, 0]
+    valid = (bid > 0) & (ask > 0)
+    return np.where(valid, ask - bid, np.nan)
+
+
+def limit_state(records, tolerance=1e-6):
+    """Boolean arrays (at_limit_up, at_limit_down) for instruments with known limit prices."""
+    price = records["price"]
+    at_up = (records["limit_up"] > 0) & (price >= records["limit_up"] - tolerance)
+    at_down = (records["limit_down"] > 0) & (price <= records["limit_down"] + tolerance) & (price > 0)
+    return at_up, at_down
+
+
+def limit_hits(records):
+    """Counts of instruments trading at their limit-up / limit-down price."""
+    at_up, at_down = limit_state(records)
+    return {"limit_up": int(at_up.sum()), "limit_down": int(at_down.sum())}
@@ -0,0 +1,359 @@
+"""
+Background quote collector.
+Polls realtime quotes (via the data source router) on a trading-calendar-aware schedule and writes
+every batch into a TickStore, so readers never touch the network themselves.
+
+Requests are spent under a requests-per-second budget by a PollSchedule: each instrument gets a
+priority (watched on a dashboard, close to an alert threshold, moving a lot today) and a matching
+target refresh interval, and every request carries the instruments most overdue for theirs.
+With a few codes everything is refreshed every `interval` seconds; with thousands the budget
+goes to the codes that matter and staleness() reports how fresh each one actually is.
+"""
+import threading
+import time
+from datetime import time as clock
+
+import numpy as np
+import pandas as pd
+
+from framework.data_source import default_router
+from framework.tick_store import TickStore
+from framework.timezone_utils import get_beijing_now, is_trading_hours, seconds_until_next_session
+
+# Max codes per request (Tencent accepts long lists, but keep URLs reasonable)
+BATCH_SIZE = 60
+
+# Default upstream budget (requests per second)
+DEFAULT_RPS = 2.0
+
+# Priority = 1 + boosts. Watched codes; codes within ALERT_BAND rule bands (Rule.band, the
+# hysteresis) of an alert threshold, more the closer they are; intraday moves up to MOVE_SCALE % |pctChg|
+WATCH_WEIGHT = 10.0
+ALERT_WEIGHT = 8.0
+ALERT_BAND = 2.0
+MOVE_WEIGHT = 4.0
+MOVE_SCALE = 5.0
+
+# Session hours start at 9:00 but trades only print from the 9:15 auction: an old trade date
+# means an exchange holiday only once continuous trading has opened
+HOLIDAY_CHECK_FROM = clock(9, 30)
+
+
+class PollSchedule:
+    """
+    Decides which codes the next request carries.
+    The budget of `rps` requests of `batch_size` codes is a capacity in codes per second.
+    Each code gets a share proportional to its priority, capped at one poll per min_interval
+    (capacity freed by capped codes goes to the rest), which gives it a target refresh interval.
+    A batch takes the codes most overdue relative to their target (age / target), so the
+    weighted staleness stays low and no code starves. Not thread-safe (QuotePoller locks).
+    """
+
+    def __init__(self, codes=(), rps=DEFAULT_RPS, batch_size=BATCH_SIZE, min_interval=3):
+        self.rps = rps
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.codes = []
+        self._pos = {}
+        self._watched = np.zeros(0, dtype=bool)
+        self._alert_distance = np.zeros(0)
+        self._move = np.zeros(0)
+        self._attempted = np.zeros(0)
+        self._updated = np.zeros(0)
+        self.add_codes(codes)
+
+    def add_codes(self, codes):
+        """Register codes. Returns: the ones not scheduled before."""
+        new = [c for c in dict.fromkeys(codes) if c not in self._pos]
+        if not new:
+            return new
+        k = len(new)
+        self.codes += new
+        self._pos = {c: i for i, c in enumerate(self.codes)}
+        self._watched = np.concatenate([self._watched, np.zeros(k, dtype=bool)])
+        self._alert_distance = np.concatenate([self._alert_distance, np.full(k, np.inf)])
+        self._move = np.concatenate([self._move, np.zeros(k)])
+        self._attempted = np.concatenate([self._attempted, np.full(k, -np.inf)])
+        self._updated = np.concatenate([self._updated, np.full(k, np.nan)])
+        return new
+
+    def remove_codes(self, codes):
+        drop = set(codes)
+        keep = np.array([c not in drop for c in self.codes], dtype=bool)
+        self.codes = [c for c in self.codes if c not in drop]
+        self._pos = {c: i for i, c in enumerate(self.codes)}
+        for name in ("_watched", "_alert_distance", "_move", "_attempted", "_updated"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _indexer(self, codes):
+        return np.array([self._pos[c] for c in codes if c in self._pos], dtype=int)
+
+    def watch(self, codes, watched=True):
+        """Mark codes as shown on a dashboard (or no longer shown)."""
+        self._watched[self._indexer(codes)] = watched
+
+    def watched_codes(self):
+        return [code for code, watched in zip(self.codes, self._watched) if watched]
+
+    def set_alert_distance(self, distances):
+        """
+        Distance of each code to its nearest alert threshold ({code: distance} or a Series,
+        e.g. AlertEngine.threshold_distance()). Codes not given keep their last distance.
+        """
+        items = distances.items() if hasattr(distances, "items") else distances
+        for code, distance in items:
+            i = self._pos.get(code)
+            if i is not None:
+                self._alert_distance[i] = np.inf if pd.isna(distance) else abs(distance)
+
+    def priorities(self):
+        alert = np.clip(1 - self._alert_distance / ALERT_BAND, 0, 1)
+        move = np.clip(self._move / MOVE_SCALE, 0, 1)
+        return 1 + WATCH_WEIGHT * self._watched + ALERT_WEIGHT * alert + MOVE_WEIGHT * move
+
+    def target_intervals(self):
+        """Seconds between polls each code is entitled to under the budget."""
+        weights = self.priorities()
+        n = len(weights)
+        max_rate = 1.0 / self.min_interval
+        rates = np.zeros(n)
+        free = np.ones(n, dtype=bool)
+        capacity = self.rps * self.batch_size
+        # Water-filling: codes whose share exceeds the cap get the cap, the rest share what is left
+        while free.any() and capacity > 0:
+            share = capacity * weights[free] / weights[free].sum()
+            capped = share >= max_rate
+            idx = np.flatnonzero(free)
+            if not capped.any():
+                rates[idx] = share
+                break
+            rates[idx[capped]] = max_rate
+            capacity -= max_rate * capped.sum()
+            free[idx[capped]] = False
+        with np.errstate(divide="ignore"):
+            return 1.0 / rates
+
+    def next_batch(self, now=None):
+        """
+        Codes for the next request: the most overdue ones, up to batch_size; empty when no code
+        is due yet (the request is saved). A batch that goes out is filled with the next most
+        overdue codes, since they cost nothing extra.
+        """
+        if not self.codes:
+            return []
+        now = time.time() if now is None else now
+        overdue = (now - self._attempted) / self.target_intervals()
+        if not overdue.max() >= 1:
+            return []
+        k = min(self.batch_size, len(overdue))
+        top = np.argpartition(-overdue, k - 1)[:k]
+        top = top[np.argsort(-overdue[top], kind="stable")]
+        return [self.codes[i] for i in top]
+
+    def record(self, codes, quotes, now=None):
+        """Register a request for `codes` and the quotes it returned (canonical quote schema)."""
+        now = time.time() if now is None else now
+        self._attempted[self._indexer(codes)] = now
+        if quotes is None or quotes.empty:
+            return
+        idx = np.array([self._pos.get(c, -1) for c in quotes["code"]], dtype=int)
+        found = idx >= 0
+        self._updated[idx[found]] = now
+        moves = np.abs(pd.to_numeric(quotes["pctChg"], errors="coerce").to_numpy(dtype="float64"))[found]
+        self._move[idx[found]] = np.nan_to_num(moves)
+
+    def staleness(self, now=None):
+        """
+        Per code: priority, target interval, age of the last quote received (seconds; inf if
+        none yet) and overdue = age / target interval (> 1: staler than the budget allows).
+        """
+        now = time.time() if now is None else now
+        target = self.target_intervals()
+        age = np.where(np.isnan(self._updated), np.inf, now - self._updated)
+        return pd.DataFrame({
+            "priority": self.priorities(),
+            "watched": self._watched,
+            "target_interval": target,
+            "age": age,
+            "overdue": age / target
+        }, index=pd.Index(self.codes, name="code"))
+
+
+class QuotePoller:
+    """
+    Polls while a session is open and sleeps until the next session otherwise.
+    In session it sends at most `rps` requests per second, each carrying the batch chosen by
+    its PollSchedule; `interval` is the refresh interval of codes the budget can fully serve.
+    If quotes still carry an old trade date once continuous trading should have opened
+    (exchange holiday), it backs off to polling the watched codes every `idle_interval`.
+    watch: codes shown on a dashboard (highest priority).
+    Codes added with seed=True are fetched once right away (paced, on the poller thread), even
+    outside a session, so readers have a snapshot of them before the schedule reaches them.
+    """
+
+    def __init__(self, codes, store=None, source=None, interval=3, idle_interval=300, rps=DEFAULT_RPS,
+                 watch=()):
+        self.schedule = PollSchedule(codes, rps=rps, min_interval=interval)
+        self.schedule.watch(watch)
+        self.store = store or TickStore()
+        self.source = source or default_router()
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.rps = rps
+        self.polls = 0
+        self.requests = 0
+        self.last_error = None
+        self._last_trade_time = None
+        self._seed = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def codes(self):
+        with self._lock:
+            return list(self.schedule.codes)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def add_codes(self, codes, watch=False, seed=False):
+        codes = list(codes)
+        with self._lock:
+            new = self.schedule.add_codes(codes)
+            if watch:
+                self.schedule.watch(codes)
+            if seed and new:
+                self._seed += new
+        if seed and new:
+            self._wake.set()
+
+    def remove_codes(self, codes):
+        with self._lock:
+            self.schedule.remove_codes(codes)
+
+    def watch(self, codes, watched=True):
+        with self._lock:
+            self.schedule.watch(codes, watched)
+
+    def set_alert_distance(self, distances):
+        with self._lock:
+            self.schedule.set_alert_distance(distances)
+
+    def _request(self, codes):
+        df = self.source.quotes(codes)
+        added = self.store.append_quotes(df)
+        with self._lock:
+            self.schedule.record(codes, df)
+        self.requests += 1
+        if not df.empty and df["trade_time"].notna().any():
+            self._last_trade_time = df["trade_time"].max()
+        return added
+
+    def poll_once(self):
+        """
+        Fetch all codes once (batches paced to the budget) and store the result.
+        Returns the number of new ticks.
+        """
+        added = self._poll_codes(self.codes)
+        self.polls += 1
+        return added
+
+    def poll_watched(self):
+        """Fetch the watched codes (or the first batch if none is watched). Returns new ticks."""
+        with self._lock:
+            codes = self.schedule.watched_codes() or self.schedule.codes[:BATCH_SIZE]
+        return self._poll_codes(codes)
+
+    def poll_seed(self):
+        """Fetch the codes added with seed=True since the last call. Returns new ticks."""
+        with self._lock:
+            codes, self._seed = self._seed, []
+        return self._poll_codes(codes)
+
+    def _poll_codes(self, codes):
+        added = 0
+        for i in range(0, len(codes), BATCH_SIZE):
+            if i and self._stop.wait(1.0 / self.rps):
+                break
+            added += self._request(codes[i:i + BATCH_SIZE])
+        return added
+
+    def poll_due(self):
+        """Send one request with the codes the schedule picks (none if nothing is due). Returns new ticks."""
+        with self._lock:
+            batch = self.schedule.next_batch()
+        return self._request(batch) if batch else 0
+
+    def staleness(self):
+        """Per-code priority, target interval and quote age (see PollSchedule.staleness)."""
+        with self._lock:
+            return self.schedule.staleness()
+
+    def stats(self):
+        """Request counters and quote age percentiles (seconds), overall and for watched codes."""
+        table = self.staleness()
+        age = table["age"].to_numpy()
+        watched = age[table["watched"].to_numpy()]
+        return {
+            "codes": len(table),
+            "requests": self.requests,
+            "full_polls": self.polls,
+            "age_p50": float(np.percentile(age, 50)) if len(age) else None,
+            "age_p95": float(np.percentile(age, 95)) if len(age) else None,
+            "watched_age_max": float(watched.max()) if len(watched) else None,
+            "overdue": int((table["overdue"] > 1).sum())
+        }
+
+    def _run(self):
+        # Seed the store once so readers have a snapshot even outside trading hours
+        self._safe(self.poll_once)
+        while not self._stop.is_set():
+            with self._lock:
+                pending = bool(self._seed)
+            if pending:
+                self._safe(self.poll_seed)
+            wait = seconds_until_next_session()
+            if wait > 0:
+                self._sleep(min(wait, self.idle_interval))
+                continue
+            if self._is_holiday():
+                # Only enough to notice the session starting; the universe waits for it
+                self._safe(self.poll_watched)
+                self._sleep(self.idle_interval)
+                continue
+
+            self._safe(self.poll_due)
+            self._stop.wait(1.0 / self.rps)
+
+    def _sleep(self, seconds):
+        """Idle wait, cut short by stop() or codes to seed."""
+        self._wake.wait(seconds)
+        self._wake.clear()
+
+    def _safe(self, poll):
+        try:
+            poll()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Quote poller error: {e}")
+
+    def _is_holiday(self):
+        """Continuous trading hours but the exchange time is not today -> market closed today."""
+        trade_time = self._last_trade_time
+        now = get_beijing_now()
+        if trade_time is None or not is_trading_hours(now) or now.time() < HOLIDAY_CHECK_FROM:
+            return False
+        return trade_time.date() < now.date()
@@ -0,0 +1,389 @@
+"""
+Shared-memory market data panel.
+
+One collector process per host owns the upstream polling and publishes aligned float64
+arrays into a multiprocessing.shared_memory segment:
+    bars:    [BAR_FIELDS x instruments x dates]     daily bars (union of dates, NaN-aligned)
+    minutes: [BAR_FIELDS x instruments x minutes]   recent 1-minute bars (union of times)
+    quotes:  [QUOTE_FIELDS x instruments]           latest realtime quote per instrument
+Dashboard workers attach read-only and read through NumPy views (zero-copy), so memory
+scales with the data, not with the number of workers.
+
+Every publish stamps `updated_at` and the collector's publish interval. A worker treats the
+panel as stale after STALE_INTERVALS missed publishes (e.g. the collector died) and returns
+empty frames, so its router falls back to upstream instead of serving frozen data.
+
+Macro series are not in the panel: the collector also runs the MacroScheduler, which writes
+the on-disk cache (data/macro/), and workers started with the panel only reload that cache
+(MacroScheduler(fetch=False)). Collector and workers must share the working directory.
+
+Consistency uses a sequence lock: the writer makes the sequence number odd while
+publishing and even when done; readers retry if it changed (or was odd) during a read.
+
+Usage (collector):
+    python -m framework.shared_panel --name amarket_panel --codes 000001.SH,399001.SZ,399006.SZ
+Workers opt in with the AMARKET_SHARED_PANEL=<name> environment variable.
+"""
+import argparse
+import json
+import os
+import struct
+import time
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+from framework.data_source import DataSource, QUOTE_COLUMNS
+
+MAGIC = b"AMKTPNL2"
+# magic, seq, n_instruments, n_dates, n_minutes, meta_len, max_instruments, max_dates, max_minutes
+HEADER = struct.Struct("<8sqqqqqqqq")
+META_CAPACITY = 256 * 1024
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume", "amount", "pctChg"]
+QUOTE_FIELDS = ["close", "pctChg", "open", "high", "low", "preclose", "volume", "amount", "trade_time"]
+
+ENV_PANEL_NAME = "AMARKET_SHARED_PANEL"
+
+# Missed publishes after which workers stop trusting the panel
+STALE_INTERVALS = 3
+
+
+def _layout(max_instruments, max_dates, max_minutes):
+    """Byte offsets of each region for the given capacity."""
+    dates_off = HEADER.size + META_CAPACITY
+    bars_off = dates_off + 8 * max_dates
+    times_off = bars_off + 8 * len(BAR_FIELDS) * max_instruments * max_dates
+    minutes_off = times_off + 8 * max_minutes
+    quotes_off = minutes_off + 8 * len(BAR_FIELDS) * max_instruments * max_minutes
+    total = quotes_off + 8 * len(QUOTE_FIELDS) * max_instruments
+    return dates_off, bars_off, times_off, minutes_off, quotes_off, total
+
+
+class _PanelViews:
+    """NumPy views over a mapped segment."""
+
+    def __init__(self, buf, max_instruments, max_dates, max_minutes):
+        dates_off, bars_off, times_off, minutes_off, quotes_off, _ = _layout(max_instruments, max_dates, max_minutes)
+        self.dates = np.ndarray((max_dates,), dtype="int64", buffer=buf, offset=dates_off)
+        self.bars = np.ndarray((len(BAR_FIELDS), max_instruments, max_dates), dtype="float64", buffer=buf, offset=bars_off)
+        self.times = np.ndarray((max_minutes,), dtype="int64", buffer=buf, offset=times_off)
+        self.minutes = np.ndarray((len(BAR_FIELDS), max_instruments, max_minutes), dtype="float64",
+                                  buffer=buf, offset=minutes_off)
+        self.quotes = np.ndarray((len(QUOTE_FIELDS), max_instruments), dtype="float64", buffer=buf, offset=quotes_off)
+
+
+def _aligned_union(frames, limit):
+    """Union of the frames' indexes, most recent `limit` entries."""
+    index = pd.DatetimeIndex([])
+    for df in frames:
+        index = index.union(df.index)
+    return index[-limit:]
+
+
+class SharedPanelWriter:
+    """Owned by the collector process: creates the segment and publishes snapshots."""
+
+    def __init__(self, name, max_instruments=64, max_dates=512, max_minutes=480):
+        total = _layout(max_instruments, max_dates, max_minutes)[-1]
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        except FileExistsError:
+            # Stale segment from a crashed collector: replace it
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+
+        self.name = name
+        self.max_instruments = max_instruments
+        self.max_dates = max_dates
+        self.max_minutes = max_minutes
+        self.views = _PanelViews(self.shm.buf, max_instruments, max_dates, max_minutes)
+        self.views.bars.fill(np.nan)
+        self.views.minutes.fill(np.nan)
+        self.views.quotes.fill(np.nan)
+        self.seq = 0
+        self._write_header(0, 0, 0, 0)
+
+    def publish(self, bars_by_instrument, quotes=None, minute_bars=None, interval=None):
+        """
+        Publish daily bars ({instrument: DataFrame in the canonical bar schema}), optional
+        1-minute bars (same shape) and an optional quote frame (canonical quote schema).
+        Dates/times are aligned to their union; only the most recent max_dates/max_minutes
+        are kept. interval: seconds until the next publish (for staleness checks).
+        """
+        instruments = list(bars_by_instrument)[:self.max_instruments]
+        minute_bars = {inst: minute_bars[inst] for inst in instruments if inst in (minute_bars or {})}
+        dates = _aligned_union([bars_by_instrument[inst] for inst in instruments], self.max_dates)
+        times = _aligned_union(minute_bars.values(), self.max_minutes)
+
+        meta = json.dumps({
+            "instruments": instruments,
+            "bar_fields": BAR_FIELDS,
+            "quote_fields": QUOTE_FIELDS,
+            "updated_at": time.time(),
+            "interval": interval
+        }).encode("utf-8")
+        if len(meta) > META_CAPACITY:
+            raise ValueError("Panel metadata exceeds capacity")
+
+        n_inst, n_dates, n_minutes = len(instruments), len(dates), len(times)
+        views = self.views
+
+        # Odd sequence: readers back off until the write completes
+        self.seq += 1
+        self._write_header(n_inst, n_dates, n_minutes, len(meta))
+
+        self.shm.buf[HEADER.size:HEADER.size + len(meta)] = meta
+        views.dates[:n_dates] = dates.values.astype("datetime64[ns]").view("int64")
+        views.times[:n_minutes] = times.values.astype("datetime64[ns]").view("int64")
+        views.bars[:, :n_inst, :n_dates] = np.nan
+        views.minutes[:, :n_inst, :n_minutes] = np.nan
+        for i, inst in enumerate(instruments):
+            aligned = bars_by_instrument[inst].reindex(index=dates, columns=BAR_FIELDS)
+            views.bars[:, i, :n_dates] = aligned.to_numpy(dtype="float64").T
+            if inst in minute_bars:
+                aligned = minute_bars[inst].reindex(index=times, columns=BAR_FIELDS)
+                views.minutes[:, i, :n_minutes] = aligned.to_numpy(dtype="float64").T
+
+        views.quotes[:, :n_inst] = np.nan
+        if quotes is not None and not quotes.empty:
+            pos = {inst: i for i, inst in enumerate(instruments)}
+            for row in quotes.to_dict("records"):
+                i = pos.get(row["code"])
+                if i is None:
+                    continue
+                for f, field in enumerate(QUOTE_FIELDS):
+                    value = row.get(field)
+                    if field == "trade_time":
+                        value = pd.Timestamp(value).value if value is not None and not pd.isna(value) else np.nan
+                    views.quotes[f, i] = np.nan if value is None else float(value)
+
+        self.seq += 1
+        self._write_header(n_inst, n_dates, n_minutes, len(meta))
+
+    def close(self, unlink=True):
+        self.views = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    def _write_header(self, n_inst, n_dates, n_minutes, meta_len):
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, self.seq, n_inst, n_dates, n_minutes, meta_len,
+                         self.max_instruments, self.max_dates, self.max_minutes)
+
+
+class SharedPanelReader:
+    """Attached by dashboard workers; never writes to the segment."""
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        _untrack(self.shm)
+        magic, _, _, _, _, _, max_inst, max_dates, max_minutes = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory segment {name} is not a market panel")
+        self.views = _PanelViews(self.shm.buf, max_inst, max_dates, max_minutes)
+        for arr in (self.views.dates, self.views.bars, self.views.times, self.views.minutes, self.views.quotes):
+            arr.flags.writeable = False
+        self._meta_cache = (None, None)
+
+    def header(self):
+        _, seq, n_inst, n_dates, n_minutes, meta_len, _, _, _ = HEADER.unpack_from(self.shm.buf, 0)
+        return seq, n_inst, n_dates, n_minutes, meta_len
+
+    def snapshot(self, retries=100):
+        """
+        Consistent zero-copy view of the panel.
+        Returns: dict(seq, instruments, dates, bars, times, minutes, quotes, updated_at,
+        interval) where the arrays are read-only views. Callers that hold the views across a
+        publish can check is_current(seq).
+        """
+        for _ in range(retries):
+            seq, n_inst, n_dates, n_minutes, meta_len = self.header()
+            if seq % 2:
+                time.sleep(0.001)
+                continue
+            meta = self._meta(seq, meta_len)
+            snap = {
+                "seq": seq,
+                "instruments": meta["instruments"],
+                "dates": pd.DatetimeIndex(self.views.dates[:n_dates].view("datetime64[ns]")),
+                "bars": self.views.bars[:, :n_inst, :n_dates],
+                "times": pd.DatetimeIndex(self.views.times[:n_minutes].view("datetime64[ns]")),
+                "minutes": self.views.minutes[:, :n_inst, :n_minutes],
+                "quotes": self.views.quotes[:, :n_inst],
+                "updated_at": meta.get("updated_at"),
+                "interval": meta.get("interval")
+            }
+            if self.is_current(seq):
+                return snap
+        raise TimeoutError("Shared panel is being rewritten continuously")
+
+    def is_current(self, seq):
+        return self.header()[0] == seq
+
+    def instruments(self):
+        """Instruments the collector publishes."""
+        return self.snapshot()["instruments"]
+
+    def is_stale(self, intervals=STALE_INTERVALS):
+        """True when the collector missed `intervals` publishes (or never published)."""
+        snap = self.snapshot()
+        if snap["updated_at"] is None:
+            return True
+        return time.time() - snap["updated_at"] > intervals * (snap["interval"] or 0) + 1
+
+    def bars(self, instrument):
+        """Daily bars of one instrument (copied, so it stays valid after the next publish)."""
+        return self._series(instrument, "dates", "bars")
+
+    def minute_bars(self, instrument):
+        """Published 1-minute bars of one instrument (copied)."""
+        return self._series(instrument, "times", "minutes")
+
+    def _series(self, instrument, index_key, values_key):
+        while True:
+            snap = self.snapshot()
+            if instrument not in snap["instruments"]:
+                return pd.DataFrame(columns=BAR_FIELDS, dtype="float64")
+            i = snap["instruments"].index(instrument)
+            df = pd.DataFrame(snap[values_key][:, i, :].T.copy(), index=snap[index_key], columns=BAR_FIELDS)
+            if self.is_current(snap["seq"]):
+                df.index.name = "date"
+                return df.dropna(how="all")
+
+    def quotes(self, instruments):
+        """Latest quotes for the given instruments in the canonical quote schema."""
+        while True:
+            snap = self.snapshot()
+            pos = {inst: i for i, inst in enumerate(snap["instruments"])}
+            rows = []
+            for inst in instruments:
+                i = pos.get(inst)
+                if i is None or np.isnan(snap["quotes"][0, i]):
+                    continue
+                row = dict(zip(QUOTE_FIELDS, snap["quotes"][:, i].tolist()))
+                row["code"] = inst
+                row["trade_time"] = pd.Timestamp(int(row["trade_time"])) if not np.isnan(row["trade_time"]) else pd.NaT
+                rows.append(row)
+            if self.is_current(snap["seq"]):
+                return pd.DataFrame(rows).reindex(columns=QUOTE_COLUMNS) if rows else pd.DataFrame()
+
+    def close(self):
+        self.views = None
+        self.shm.close()
+
+    def _meta(self, seq, meta_len):
+        cached_seq, meta = self._meta_cache
+        if cached_seq != seq:
+            meta = json.loads(bytes(self.shm.buf[HEADER.size:HEADER.size + meta_len]).decode("utf-8"))
+            self._meta_cache = (seq, meta)
+        return meta
+
+
+def _untrack(shm):
+    """Readers must not unlink the collector's segment when they exit (Python < 3.13)."""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class PanelSource(DataSource):
+    """
+    DataSource backed by the host's shared panel (no upstream I/O in the worker).
+    A stale panel answers with empty frames, which the router treats as a failure; quotes for
+    instruments it does not publish are left to the next provider.
+    """
+    name = "shared_panel"
+    capabilities = frozenset({"daily_bars", "minute_bars", "quotes"})
+
+    def __init__(self, name):
+        self.reader = SharedPanelReader(name)
+
+    def daily_bars(self, instrument, count=300):
+        if self.reader.is_stale():
+            return pd.DataFrame()
+        return self.reader.bars(instrument).tail(count)
+
+    def minute_bars(self, instrument, period=1, count=320):
+        # Only 1-minute bars are published
+        if period != 1 or self.reader.is_stale():
+            return pd.DataFrame()
+        return self.reader.minute_bars(instrument).tail(count)
+
+    def quotes(self, instruments):
+        if self.reader.is_stale():
+            return pd.DataFrame()
+        return self.reader.quotes(instruments)
+
+    def covers(self, instruments):
+        # The collector only publishes its own codes (the boards), not the market-map universe
+        held = set(self.reader.instruments())
+        return [i for i in instruments if i in held]
+
+
+def attach_from_env():
+    """PanelSource for the segment named in AMARKET_SHARED_PANEL, or None if unset/unavailable."""
+    name = os.getenv(ENV_PANEL_NAME)
+    if not name:
+        return None
+    try:
+        return PanelSource(name)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Shared panel {name} unavailable: {e}")
+        return None
+
+
+def run_collector(name, codes, bar_interval=300, quote_interval=3, count=400, minute_count=480):
+    """
+    Collector loop: daily and 1-minute bars every bar_interval seconds, quotes every
+    quote_interval seconds during trading hours, macro series on their own cadence (into the
+    on-disk macro cache). The only process on the host that talks to upstream.
+    """
+    from framework.data_source import default_router
+    from framework.macro_registry import MacroScheduler
+    from framework.timezone_utils import is_trading_hours
+
+    router = default_router()
+    macro = MacroScheduler().start()
+    writer = SharedPanelWriter(name, max_instruments=max(len(codes), 1), max_dates=count, max_minutes=minute_count)
+    bars, minutes, quotes, last_bars = {}, {}, None, 0.0
+    print(f"Shared panel collector publishing {len(codes)} instruments to {name}")
+    try:
+        while True:
+            if time.monotonic() - last_bars >= bar_interval or not bars:
+                for code in codes:
+                    df = router.daily_bars(code, count=count)
+                    if not df.empty:
+                        bars[code] = df
+                    df = router.minute_bars(code, period=1, count=minute_count)
+                    if not df.empty:
+                        minutes[code] = df
+                last_bars = time.monotonic()
+            quotes = router.quotes(codes)
+            interval = quote_interval if is_trading_hours() else bar_interval
+            writer.publish(bars, quotes, minute_bars=minutes, interval=interval)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        macro.stop()
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish market data into a shared-memory panel")
+    parser.add_argument("--name", default=os.getenv(ENV_PANEL_NAME, "amarket_panel"))
+    parser.add_argument("--codes", default="000001.SH,399001.SZ,399006.SZ")
+    parser.add_argument("--bar-interval", type=int, default=300)
+    parser.add_argument("--quote-interval", type=int, default=3)
+    args = parser.parse_args()
+    run_collector(args.name, [c.strip() for c in args.codes.split(",") if c.strip()],
+                  bar_interval=args.bar_interval, quote_interval=args.quote_interval)
+
+
+if __name__ == "__main__":
+    main()
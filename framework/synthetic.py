@@ -0,0 +1,471 @@
+"""
+Synthetic A-share market for offline load tests and benchmarks.
+
+SyntheticMarket produces deterministic, reasonably realistic data for any number of
+instruments and years:
+    - daily OHLCV: market + sector + idiosyncratic returns with volatility clustering,
+      price limits and volume that rises with |return|
+    - the last trading day's intraday path (a Brownian bridge from open to close), so
+      quotes and 1-minute bars move through the session and end on the daily bar
+    - upstream payloads in Tencent's formats (qt.gtimg.cn `v_code="...~..."` quote text,
+      fqkline/mkline JSON) and AkShare-shaped macro/margin frames (FakeAkShare)
+Each instrument is generated on demand from its own seed, so 5,000 instruments x 10 years
+never have to be held in memory at once.
+"""
+import json
+import sys
+import types
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from framework.timezone_utils import get_beijing_now
+
+INDICES = {
+    "000001.SH": "上证指数",
+    "399001.SZ": "深证成指",
+    "399006.SZ": "创业板指"
+}
+
+SESSION_MINUTES = 240
+TRADING_DAYS_PER_YEAR = 245
+N_SECTORS = 20
+VOL_KERNEL = 0.97 ** np.arange(200)
+
+
+def _seed(*parts):
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+def session_minute(ts):
+    """Minutes of continuous trading elapsed at wall time ts (0 before 09:30, 240 after 15:00)."""
+    m = ts.hour * 60 + ts.minute
+    if m < 9 * 60 + 30:
+        return 0
+    if m <= 11 * 60 + 30:
+        return m - (9 * 60 + 30)
+    if m < 13 * 60:
+        return 120
+    return min(120 + m - 13 * 60, SESSION_MINUTES)
+
+
+def minute_end_times(day):
+    """End-labeled timestamps of the 240 session minutes of a day (09:31..11:30, 13:01..15:00)."""
+    day = pd.Timestamp(day).normalize()
+    am = day + pd.to_timedelta(np.arange(9 * 60 + 31, 11 * 60 + 31), unit="min")
+    pm = day + pd.to_timedelta(np.arange(13 * 60 + 1, 15 * 60 + 1), unit="min")
+    return am.append(pm)
+
+
+class SyntheticMarket:
+    """
+    Deterministic synthetic market.
+    n_instruments: number of stocks (indices are always included in addition)
+    end: last trading day (default: today, or the last weekday before it)
+    """
+
+    def __init__(self, n_instruments=5000, years=10, seed=0, end=None):
+        self.seed = seed
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp(get_beijing_now().date())
+        self.dates = pd.bdate_range(end=end, periods=int(years * TRADING_DAYS_PER_YEAR), name="date")
+        self.stocks = self._stock_codes(n_instruments)
+        self.instruments = list(INDICES) + self.stocks
+
+        rng = np.random.default_rng(_seed(seed, "market"))
+        n = len(self.dates)
+        self._market = rng.normal(0.0003, 0.011, n)
+        self._sectors = rng.normal(0, 0.006, (N_SECTORS, n))
+        self._known = set(self.instruments)
+        self._generate = lru_cache(maxsize=1024)(self._generate_uncached)
+        # Quotes only need the last two days and the intraday path: small enough to keep all
+        self._last_day = lru_cache(maxsize=None)(self._last_day_uncached)
+        self._intraday = lru_cache(maxsize=None)(self._intraday_uncached)
+
+    @staticmethod
+    def _stock_codes(n):
+        # Spread across the main boards like the real universe
+        pools = [("60", "SH", 0.35), ("00", "SZ", 0.30), ("30", "SZ", 0.25), ("688", "SH", 0.10)]
+        codes = []
+        for prefix, exchange, share in pools:
+            count = int(round(n * share)) if prefix != "688" else n - len(codes)
+            width = 6 - len(prefix)
+            codes.extend(f"{prefix}{i:0{width}d}.{exchange}" for i in range(min(count, 10 ** width)))
+        return codes[:n]
+
+    def name(self, instrument):
+        return INDICES.get(instrument, f"样本{instrument[:6]}")
+
+    def sector(self, instrument):
+        return _seed(self.seed, "sector", instrument) % N_SECTORS
+
+    def limit(self, instrument):
+        """Daily price limit (10%, 20% for ChiNext/STAR)."""
+        return 0.20 if instrument.startswith(("30", "68")) else 0.10
+
+    # --- Daily bars ---
+
+    def _generate_uncached(self, instrument):
+        rng = np.random.default_rng(_seed(self.seed, instrument))
+        n = len(self.dates)
+        is_index = instrument in INDICES
+
+        # Volatility clustering: AR(1) log-volatility (phi=0.97), as a truncated convolution
+        shocks = rng.normal(0, 0.15, n)
+        log_vol = np.convolve(shocks, VOL_KERNEL)[:n]
+        vol_scale = np.exp(log_vol)
+
+        if is_index:
+            returns = self._market * (0.8 + 0.4 * rng.random()) + rng.normal(0, 0.003, n) * vol_scale
+            base_price, base_volume = 3000.0, 2.5e8
+        else:
+            beta = rng.uniform(0.6, 1.4)
+            idio = rng.normal(0, rng.uniform(0.01, 0.025), n) * vol_scale
+            returns = beta * self._market + self._sectors[self.sector(instrument)] + idio
+            base_price, base_volume = rng.uniform(3, 80), rng.uniform(2e4, 5e5)
+
+        limit = self.limit(instrument)
+        returns = np.clip(returns, -limit, limit)
+        close = base_price * np.cumprod(1 + returns)
+        prev_close = np.concatenate([[close[0] / (1 + returns[0])], close[:-1]])
+
+        gap = np.clip(rng.normal(0, 0.3, n) * np.abs(returns), -limit, limit)
+        open_ = prev_close * (1 + gap)
+        wick = np.abs(rng.normal(0, 0.004, n)) * vol_scale
+        high = np.maximum(open_, close) * (1 + wick)
+        low = np.minimum(open_, close) * (1 - wick * rng.random(n))
+        high = np.minimum(high, prev_close * (1 + limit))
+        low = np.maximum(low, prev_close * (1 - limit))
+
+        volume = base_volume * np.exp(rng.normal(0, 0.3, n)) * (1 + 20 * np.abs(returns))
+        amount = volume * 100 * (open_ + close + high + low) / 4
+
+        return {
+            "open": open_, "high": high, "low": low, "close": close,
+            "volume": np.round(volume), "amount": amount, "pctChg": returns * 100
+        }
+
+    def daily_bars(self, instrument, count=None):
+        """Daily bars in the canonical bar schema."""
+        columns = self._generate(instrument)
+        start = 0 if count is None else max(len(self.dates) - count, 0)
+        return pd.DataFrame({k: v[start:] for k, v in columns.items()}, index=self.dates[start:])
+
+    def panel(self, field="close", instruments=None):
+        """(dates x instruments) panel of one field, e.g. for screener benchmarks."""
+        instruments = self.instruments if instruments is None else instruments
+        values = np.column_stack([self._generate(i)[field] for i in instruments])
+        return pd.DataFrame(values, index=self.dates, columns=instruments)
+
+    # --- Intraday (last trading day) ---
+
+    def _last_day_uncached(self, instrument):
+        columns = self._generate(instrument)
+        return {k: float(v[-1]) for k, v in columns.items()}, float(columns["close"][-2])
+
+    def _intraday_uncached(self, instrument):
+        """Per-minute close, high, low and cumulative volume/amount for the last day."""
+        bar, _ = self._last_day(instrument)
+        rng = np.random.default_rng(_seed(self.seed, "intraday", instrument))
+        steps = rng.normal(0, 1, SESSION_MINUTES)
+        walk = np.cumsum(steps)
+        # Brownian bridge from open to close, scaled to the day's range
+        bridge = walk - np.arange(1, SESSION_MINUTES + 1) / SESSION_MINUTES * walk[-1]
+        span = max(np.log(bar["high"] / bar["low"]), 1e-4)
+        scale = span / max(np.ptp(bridge), 1e-9) * 0.8
+        drift = np.linspace(0, np.log(bar["close"] / bar["open"]), SESSION_MINUTES + 1)[1:]
+        path = bar["open"] * np.exp(drift + bridge * scale)
+        path = np.clip(path, bar["low"], bar["high"])
+        path[-1] = bar["close"]
+
+        weights = rng.gamma(2.0, 1.0, SESSION_MINUTES)
+        weights[:10] *= 3
+        weights[-10:] *= 2
+        cum_share = np.cumsum(weights) / weights.sum()
+        high = np.maximum.accumulate(np.maximum(path, bar["open"]))
+        low = np.minimum.accumulate(np.minimum(path, bar["open"]))
+        # The close ends exactly on the daily bar
+        high[-1], low[-1] = bar["high"], bar["low"]
+        return {
+            "close": path,
+            "high": high,
+            "low": low,
+            "volume": bar["volume"] * cum_share,
+            "amount": bar["amount"] * cum_share
+        }
+
+    def quote(self, instrument, at=None):
+        """Quote fields as of wall time `at` (Beijing, naive) on the last trading day."""
+        at = pd.Timestamp(at) if at is not None else pd.Timestamp(get_beijing_now()).tz_localize(None)
+        day = self.dates[-1]
+        bar, prev_close = self._last_day(instrument)
+
+        if at.normalize() > day:
+            k = SESSION_MINUTES
+        elif at.normalize() < day:
+            k = 0
+        else:
+            k = session_minute(at)
+        if k == 0:
+            price = high = low = bar["open"]
+            volume = amount = 0.0
+            trade_time = day + pd.Timedelta(hours=9, minutes=25)
+        else:
+            intraday = self._intraday(instrument)
+            price, high, low = intraday["close"][k - 1], intraday["high"][k - 1], intraday["low"][k - 1]
+            volume, amount = intraday["volume"][k - 1], intraday["amount"][k - 1]
+            trade_time = min(at, day + pd.Timedelta(hours=15)) if at.normalize() == day else day + pd.Timedelta(hours=15)
+        return {
+            "instrument": instrument,
+            "name": self.name(instrument),
+            "price": float(price),
+            "preclose": float(prev_close),
+            "open": float(bar["open"]),
+            "high": float(high),
+            "low": float(low),
+            "volume": float(round(volume)),
+            "amount": float(amount),
+            "trade_time": trade_time
+        }
+
+    def minute_bars(self, instrument, period=1, at=None):
+        """End-labeled minute bars of the last day up to `at`, aggregated to `period` minutes."""
+        at = pd.Timestamp(at) if at is not None else pd.Timestamp(get_beijing_now()).tz_localize(None)
+        day = self.dates[-1]
+        k = SESSION_MINUTES if at.normalize() > day else (session_minute(at) if at.normalize() == day else 0)
+        if k == 0:
+            return pd.DataFrame(columns=["open", "close", "high", "low", "volume"])
+        intraday = self._intraday(instrument)
+        close = intraday["close"][:k]
+        open_ = np.concatenate([[self._last_day(instrument)[0]["open"]], close[:-1]])
+        volume = np.diff(np.concatenate([[0.0], intraday["volume"][:k]]))
+        df = pd.DataFrame({
+            "open": open_, "close": close,
+            "high": np.maximum(open_, close), "low": np.minimum(open_, close),
+            "volume": np.round(volume)
+        }, index=minute_end_times(day)[:k])
+        if period == 1:
+            return df
+        groups = np.arange(k) // period
+        out = df.groupby(groups).agg({"open": "first", "close": "last", "high": "max", "low": "min", "volume": "sum"})
+        out.index = df.index[np.minimum((out.index.to_numpy() + 1) * period, k) - 1]
+        return out
+
+    # --- Tencent payloads ---
+
+    @staticmethod
+    def tencent_code(instrument):
+        symbol, exchange = instrument.split(".")
+        return f"{exchange.lower()}{symbol}"
+
+    @staticmethod
+    def from_tencent(code):
+        return f"{code[2:]}.{code[:2].upper()}"
+
+    def tencent_quote_line(self, instrument, at=None):
+        """One `v_sh600000="1~name~code~price~..."` line (50 fields, as qt.gtimg.cn)."""
+        q = self.quote(instrument, at)
+        price, pre = q["price"], q["preclose"]
+        change = price - pre
+        tick = 0.01
+        f = [""] * 50
+        f[0] = "1" if instrument.endswith("SH") else "51"
+        f[1] = q["name"]
+        f[2] = instrument[:6]
+        f[3] = f"{price:.2f}"
+        f[4] = f"{pre:.2f}"
+        f[5] = f"{q['open']:.2f}"
+        f[6] = f"{q['volume']:.0f}"
+        f[7] = f"{q['volume'] * 0.52:.0f}"      # outer (buy-initiated) volume
+        f[8] = f"{q['volume'] * 0.48:.0f}"      # inner (sell-initiated) volume
+        is_index = instrument in INDICES
+        limit_up = round(pre * (1 + self.limit(instrument)), 2)
+        limit_down = round(pre * (1 - self.limit(instrument)), 2)
+        at_up = not is_index and round(price, 2) >= limit_up
+        at_down = not is_index and round(price, 2) <= limit_down
+        # Five levels: bid price/volume at 9..18, ask price/volume at 19..28 (one side is
+        # empty, "0.00", while a stock sits at its limit price)
+        for level in range(5):
+            f[9 + 2 * level] = "0.00" if at_down else f"{price - tick * level:.2f}"
+            f[10 + 2 * level] = "0" if at_down else str(100 * (level + 1))
+            f[19 + 2 * level] = "0.00" if at_up else f"{price + tick * (level + 1):.2f}"
+            f[20 + 2 * level] = "0" if at_up else str(100 * (5 - level))
+        f[29] = ""
+        f[30] = q["trade_time"].strftime("%Y%m%d%H%M%S")
+        f[31] = f"{change:.2f}"
+        f[32] = f"{change / pre * 100:.2f}"
+        f[33] = f"{q['high']:.2f}"
+        f[34] = f"{q['low']:.2f}"
+        f[35] = f"{price:.2f}/{q['volume']:.0f}/{q['amount']:.0f}"
+        f[36] = f"{q['volume']:.0f}"
+        f[37] = f"{q['amount'] / 10000:.0f}"
+        f[38] = "0.50"
+        f[39] = "15.00"
+        f[41] = f[33]
+        f[42] = f[34]
+        f[43] = f"{(q['high'] - q['low']) / pre * 100:.2f}"
+        if not is_index:
+            shares = (_seed(self.seed, "shares", instrument) % 1000 + 50) * 1e7
+            f[44] = f"{price * shares * 0.8 / 1e8:.2f}"      # float market cap (亿)
+            f[45] = f"{price * shares / 1e8:.2f}"            # total market cap (亿)
+            f[46] = "2.10"
+            f[47] = f"{limit_up:.2f}"
+            f[48] = f"{limit_down:.2f}"
+        f[49] = "1.00"
+        return f'v_{self.tencent_code(instrument)}="{"~".join(f)}";'
+
+    def tencent_quotes_text(self, tencent_codes, at=None):
+        lines = []
+        for code in tencent_codes:
+            instrument = self.from_tencent(code)
+            if instrument in self._known:
+                lines.append(self.tencent_quote_line(instrument, at))
+            else:
+                lines.append('v_pv_none_match="1";')
+        return "\n".join(lines)
+
+    def fqkline_json(self, tencent_code, period="day", count=300, at=None, fq="qfq"):
+        """
+        fqkline/get response: indices and unadjusted requests under "<period>", adjusted stock
+        requests under "<fq><period>" (synthetic instruments have no corporate actions).
+        During the last day's session its bar is the partial bar as of `at` (as upstream).
+        """
+        instrument = self.from_tencent(tencent_code)
+        if instrument not in self._known:
+            return json.dumps({"code": 0, "msg": "", "data": {}})
+        bars = self.daily_bars(instrument)
+        q = self.quote(instrument, at)
+        if q["volume"] == 0:
+            bars = bars.iloc[:-1]
+        else:
+            bars.iloc[-1, [bars.columns.get_loc(c) for c in ("high", "low", "close", "volume")]] = \
+                [q["high"], q["low"], q["price"], q["volume"]]
+        if period in ("week", "month"):
+            # Labeled by the period's last trading day, as Tencent does
+            key = bars.index.to_period("W-FRI" if period == "week" else "M")
+            grouped = bars.groupby(key)
+            bars = grouped.agg({"open": "first", "close": "last", "high": "max", "low": "min", "volume": "sum"})
+            bars.index = grouped.apply(lambda g: g.index[-1]).to_numpy()
+        bars = bars.iloc[-count:]
+        rows = [[d.strftime("%Y-%m-%d"), f"{o:.3f}", f"{c:.3f}", f"{h:.3f}", f"{lo:.3f}", f"{v:.0f}"]
+                for d, o, c, h, lo, v in zip(bars.index, bars["open"], bars["close"], bars["high"],
+                                              bars["low"], bars["volume"])]
+        key = period if instrument in INDICES or not fq else f"{fq}{period}"
+        return json.dumps({"code": 0, "msg": "", "data": {tencent_code: {key: rows}}})
+
+    def mkline_json(self, tencent_code, period=1, count=320, at=None):
+        """kline/mkline response with end-labeled YYYYMMDDHHMM minute rows."""
+        instrument = self.from_tencent(tencent_code)
+        if instrument not in self._known:
+            return json.dumps({"code": 0, "msg": "", "data": {}})
+        bars = self.minute_bars(instrument, period, at).iloc[-count:]
+        rows = [[d.strftime("%Y%m%d%H%M"), f"{o:.2f}", f"{c:.2f}", f"{h:.2f}", f"{lo:.2f}", f"{v:.0f}", "", ""]
+                for d, o, c, h, lo, v in zip(bars.index, bars["open"], bars["close"], bars["high"],
+                                              bars["low"], bars["volume"])]
+        return json.dumps({"code": 0, "msg": "", "data": {tencent_code: {f"m{period}": rows}}})
+
+
+class FakeAkShare:
+    """
+    AkShare-shaped frames for the functions this project calls, derived from a
+    SyntheticMarket. install() registers it as the `akshare` module for offline runs.
+    """
+
+    def __init__(self, market=None, seed=0):
+        self.market = market or SyntheticMarket(n_instruments=200, years=2, seed=seed)
+        self.seed = seed
+
+    def _months(self, n=120):
+        return pd.date_range(end=self.market.dates[-1], periods=n, freq="MS")
+
+    def _walk(self, name, n, start, step):
+        rng = np.random.default_rng(_seed(self.seed, name))
+        return start + np.cumsum(rng.normal(0, step, n))
+
+    def macro_china_money_supply(self):
+        months = self._months()
+        m2 = self._walk("m2", len(months), 9, 0.3)
+        m1 = m2 + self._walk("scissors", len(months), -3, 0.6)
+        return pd.DataFrame({
+            "月份": months.strftime("%Y.%m")[::-1],
+            "货币和准货币(M2)-同比增长": np.round(m2, 1)[::-1],
+            "货币(M1)-同比增长": np.round(m1, 1)[::-1]
+        })
+
+    def _margin_daily(self, name, level):
+        dates = self.market.dates[-500:]
+        return dates, np.abs(self._walk(name, len(dates), level, level * 0.004))
+
+    def stock_margin_sse(self, start_date, end_date):
+        dates, balance = self._margin_daily("sse_margin", 8e11)
+        mask = (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
+        return pd.DataFrame({"信用交易日期": dates[mask].strftime("%Y%m%d"), "融资余额": balance[mask]})
+
+    def macro_china_market_margin_sz(self):
+        dates, balance = self._margin_daily("szse_margin", 7e11)
+        return pd.DataFrame({"日期": dates.strftime("%Y-%m-%d"), "融资余额": balance})
+
+    def stock_margin_szse(self, date):
+        _, balance = self._margin_daily("szse_margin", 7e11)
+        return pd.DataFrame({"融资余额（元）": [balance[-1]]})
+
+    def _margin_detail(self, date, exchange):
+        day = pd.Timestamp(date)
+        stocks = [s for s in self.market.stocks if s.endswith(exchange)]
+        rng = np.random.default_rng(_seed(self.seed, "detail", exchange))
+        base = rng.uniform(1e7, 5e9, len(stocks))
+        trend = rng.normal(0, 0.002, len(stocks))
+        k = max((day - self.market.dates[0]).days, 0)
+        return stocks, base * (1 + trend) ** k
+
+    def stock_margin_detail_sse(self, date):
+        stocks, balance = self._margin_detail(date, "SH")
+        return pd.DataFrame({"信用交易日期": date, "标的证券代码": [s[:6] for s in stocks],
+                             "标的证券简称": [self.market.name(s) for s in stocks],
+                             "融资余额": balance, "融资买入额": balance * 0.05, "融券余量": 1000.0})
+
+    def stock_margin_detail_szse(self, date):
+        stocks, balance = self._margin_detail(date, "SZ")
+        return pd.DataFrame({"证券代码": [s[:6] for s in stocks],
+                             "证券简称": [self.market.name(s) for s in stocks],
+                             "融资买入额": balance * 0.05, "融资余额": balance, "融券余量": 1000.0})
+
+    def macro_china_shibor_all(self):
+        dates = self.market.dates[-500:]
+        on = np.abs(self._walk("shibor", len(dates), 1.6, 0.03))
+        return pd.DataFrame({"日期": dates.strftime("%Y-%m-%d"), "O/N-定价": on,
+                             "1W-定价": on + 0.1, "3M-定价": on + 0.3})
+
+    def macro_china_shrzgm(self):
+        months = self._months()
+        return pd.DataFrame({"月份": months.strftime("%Y%m"),
+                             "社会融资规模增量": np.abs(self._walk("sf", len(months), 25000, 3000)),
+                             "其中-人民币贷款": np.abs(self._walk("loans", len(months), 15000, 2000))})
+
+    def stock_hsgt_hist_em(self, symbol="北向资金"):
+        dates = self.market.dates[-500:]
+        net = self._walk("northbound", len(dates), 0, 30) - self._walk("northbound", len(dates), 0, 30)[0]
+        return pd.DataFrame({"日期": dates.strftime("%Y-%m-%d"), "当日成交净买额": np.diff(np.r_[0, net]),
+                             "历史累计净买额": net})
+
+    def _yearly_rate(self, name):
+        months = self._months(60)
+        return pd.DataFrame({"商品": name, "日期": (months + pd.Timedelta(days=9)).strftime("%Y-%m-%d"),
+                             "今值": np.round(self._walk(name, len(months), 1, 0.3), 1),
+                             "预测值": np.nan, "前值": np.nan})
+
+    def macro_china_cpi_yearly(self):
+        return self._yearly_rate("中国CPI年率报告")
+
+    def macro_china_ppi_yearly(self):
+        return self._yearly_rate("中国PPI年率报告")
+
+    def install(self):
+        """Register as the `akshare` module (only for offline runs; call before importing loaders)."""
+        module = types.ModuleType("akshare")
+        for attr in dir(self):
+            if attr.startswith(("macro_", "stock_")):
+                setattr(module, attr, getattr(self, attr))
+        sys.modules["akshare"] = module
+        return module
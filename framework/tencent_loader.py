@@ -1,115 +1,157 @@
-import requests
+import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from framework.timezone_utils import get_beijing_now
+from framework.http_transport import HttpTransport
+from framework.data_source import to_tencent
+from framework.quote_decoder import decode_quotes
+
+# Minute bar sizes served by Tencent's mkline endpoint
+MINUTE_PERIODS = (1, 5, 15, 30, 60)
+
+# Upstream hosts. AMARKET_TENCENT_BASE_URL points all three at one server instead, e.g. the
+# offline stand-in (python -m framework.upstream_standin) for load tests and benchmarks.
+QUOTE_BASE_URL = "http://qt.gtimg.cn"
+KLINE_BASE_URL = "http://web.ifzq.gtimg.cn"
+MKLINE_BASE_URL = "http://ifzq.gtimg.cn"
+BASE_URL_ENV = "AMARKET_TENCENT_BASE_URL"
 
 class TencentLoader:
-    def __init__(self):
-        self.session = requests.Session()
-        # Headers to mimic a browser, though Tencent API is generally open
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        })
+    def __init__(self, transport=None, quote_url=None, kline_url=None, mkline_url=None):
+        # Pooled keep-alive session with retries, hedging and per-endpoint circuit breakers.
+        # Headers mimic a browser, though Tencent API is generally open
+        self.transport = transport or HttpTransport()
+        self.session = self.transport.session
+        override = os.environ.get(BASE_URL_ENV)
+        self.quote_url = (quote_url or override or QUOTE_BASE_URL).rstrip("/")
+        self.kline_url = (kline_url or override or KLINE_BASE_URL).rstrip("/")
+        self.mkline_url = (mkline_url or override or MKLINE_BASE_URL).rstrip("/")
 
-    def fetch_realtime_quotes(self, codes):
+    def fetch_quote_records(self, codes):
         """
-        Fetch real-time data for a list of stock codes.
+        Full-field quotes as a NumPy structured array (framework.quote_decoder.QUOTE_DTYPE):
+        price block, 5-level order book, turnover, PE/PB, market caps, limit prices and
+        exchange time. Returns an empty array on failure.
         codes: list of strings, e.g., ["sh000001", "sz399001"]
-        Returns: DataFrame with columns [code, name, price, pct_chg, volume(hands), amount, time]
         """
         if not codes:
-            return pd.DataFrame()
-            
+            return decode_quotes("")
+
         code_str = ",".join(codes)
-        url = f"http://qt.gtimg.cn/q={code_str}"
-        
+        url = f"{self.quote_url}/q={code_str}"
+
         try:
-            response = self.session.get(url, timeout=5)
-            response.raise_for_status()
-            text = response.text
-            
-            data_list = []
             # Response format: v_sh000001="1~上证指数~000001~3268.00~...";
-            lines = text.split(";")
-            
-            for line in lines:
-                if "=" not in line:
-                    continue
-                    
-                key, val = line.split("=", 1)
-                val = val.strip('"')
-                parts = val.split("~")
-                
-                if len(parts) < 30:
-                    continue
-                    
-                # Parse key fields
-                # 1: Name, 3: Current Price, 31: Change, 32: Change%, 6: Volume (hands), 37: Amount (wan), 30: Time
-                code = key.split("_")[-1]
-                name = parts[1]
-                price = float(parts[3])
-                pct_chg = float(parts[32])
-                volume = float(parts[6]) # Keep in hands (1 hand = 100 shares) to match K-line data
-                amount = float(parts[37]) * 10000 # Convert wan to raw
-                
-                data_list.append({
-                    "code": code,
-                    "name": name,
-                    "close": price,
-                    "pctChg": pct_chg,
-                    "volume": volume,
-                    "amount": amount,
-                    "timestamp": get_beijing_now() # Beijing timezone (UTC+8)
-                })
-                
-            return pd.DataFrame(data_list)
-            
+            text = self.transport.get(url, endpoint="quote", parse=lambda r: r.text)
+            return decode_quotes(text)
         except Exception as e:
             print(f"Error fetching realtime quotes: {e}")
+            return decode_quotes("")
+
+    def fetch_realtime_quotes(self, codes):
+        """
+        Fetch real-time data for a list of stock codes.
+        codes: list of strings, e.g., ["sh000001", "sz399001"]
+        Returns: DataFrame with columns [code, name, close, pctChg, open, high, low, preclose,
+                 volume(hands), amount, trade_time (exchange time), timestamp (fetch time)]
+        """
+        records = self.fetch_quote_records(codes)
+        if not len(records):
             return pd.DataFrame()
 
-    def fetch_k_line(self, code, day_count=300):
+        return pd.DataFrame({
+            "code": [to_tencent(c) for c in records["code"]],
+            "name": records["name"],
+            "close": records["price"],
+            "pctChg": records["pct_chg"],
+            "open": np.nan_to_num(records["open"]),
+            "high": np.nan_to_num(records["high"]),
+            "low": np.nan_to_num(records["low"]),
+            "preclose": np.nan_to_num(records["preclose"]),
+            "volume": records["volume"],   # hands (1 hand = 100 shares), as in K-line data
+            "amount": records["amount"],   # Yuan
+            "trade_time": pd.to_datetime(records["exchange_time"].astype("datetime64[ns]")),
+            "timestamp": get_beijing_now()  # Beijing timezone (UTC+8)
+        })
+
+    def fetch_k_line(self, code, day_count=300, period="day", fq="qfq"):
         """
-        Fetch daily K-line data for EMA calculation.
+        Fetch daily (or weekly/monthly) K-line data for EMA calculation.
         code: e.g. "sh000001"
+        period: "day", "week" or "month"
+        fq: "qfq" (forward-adjusted), "hfq" (backward-adjusted) or "" (unadjusted)
         """
         # Mapping standard prefix to Tencent format if needed, but usually sh000001 works
-        url = f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get?param={code},day,,,{day_count},qfq"
+        url = f"{self.kline_url}/appstock/app/fqkline/get?param={code},{period},,,{day_count},{fq}"
         
         try:
-            response = self.session.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
+            data = self.transport.get(url, endpoint="kline", parse=lambda r: r.json())
             
-            # Navigate JSON structure: data -> code -> day
+            # Navigate JSON structure: data -> code -> day (indices, unadjusted) / qfqday (stocks)
             if "data" not in data or code not in data["data"]:
                 return pd.DataFrame()
                 
-            k_data = data["data"][code].get("day", [])
+            k_data = data["data"][code].get(f"{fq}{period}") or data["data"][code].get(period, [])
             
-            if not k_data:
-                return pd.DataFrame()
-                
-            # Tencent K-line format: [date, open, close, high, low, volume, ...others]
-            # Data might have 9 or 10 columns. We only need the first 6.
-            
-            clean_data = []
-            for item in k_data:
-                # Ensure we have at least 6 columns
-                if len(item) >= 6:
-                    clean_data.append(item[:6])
-            
-            df = pd.DataFrame(clean_data, columns=["date", "open", "close", "high", "low", "volume"])
-            df["date"] = pd.to_datetime(df["date"])
-            
-            for col in ["open", "close", "high", "low", "volume"]:
-                df[col] = pd.to_numeric(df[col])
+            df = self._parse_k_rows(k_data, time_format=None)
+            if df.empty:
+                return df
                 
             # Add pctChg for volatility calc
             df['pctChg'] = df['close'].pct_change() * 100
             
-            return df.set_index("date")
+            return df
             
         except Exception as e:
             print(f"Error fetching k-line for {code}: {e}")
             return pd.DataFrame()
+
+    def fetch_minute_k_line(self, code, period=1, count=320):
+        """
+        Fetch intraday minute K-line data.
+        code: e.g. "sh000001"
+        period: bar size in minutes, one of MINUTE_PERIODS (1, 5, 15, 30, 60)
+        Bars are labeled by their end time (e.g. 09:31 covers 09:30-09:31), as Tencent does.
+        """
+        if period not in MINUTE_PERIODS:
+            raise ValueError(f"Unsupported minute period: {period}")
+            
+        url = f"{self.mkline_url}/appstock/app/kline/mkline?param={code},m{period},,{count}"
+        
+        try:
+            data = self.transport.get(url, endpoint="mkline", parse=lambda r: r.json())
+            
+            # Navigate JSON structure: data -> code -> m5
+            if "data" not in data or code not in data["data"]:
+                return pd.DataFrame()
+                
+            k_data = data["data"][code].get(f"m{period}", [])
+            return self._parse_k_rows(k_data, time_format="%Y%m%d%H%M")
+            
+        except Exception as e:
+            print(f"Error fetching {period}-minute k-line for {code}: {e}")
+            return pd.DataFrame()
+
+    @staticmethod
+    def _parse_k_rows(k_data, time_format=None):
+        """
+        Tencent K-line format: [time, open, close, high, low, volume, ...others]
+        Data might have 9 or 10 columns. We only need the first 6.
+        """
+        if not k_data:
+            return pd.DataFrame()
+            
+        clean_data = []
+        for item in k_data:
+            # Ensure we have at least 6 columns
+            if len(item) >= 6:
+                clean_data.append(item[:6])
+        
+        df = pd.DataFrame(clean_data, columns=["date", "open", "close", "high", "low", "volume"])
+        df["date"] = pd.to_datetime(df["date"], format=time_format)
+        
+        for col in ["open", "close", "high", "low", "volume"]:
+            df[col] = pd.to_numeric(df[col])
+            
+        return df.set_index("date")
@@ -0,0 +1,182 @@
+"""
+In-memory intraday tick store.
+Each instrument gets preallocated NumPy ring buffers for quote ticks and 1-minute bars,
+so memory stays bounded no matter how long the collector runs.
+"""
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from framework.validation import validate_quotes
+
+# ts: exchange time (epoch seconds, Beijing wall clock as naive UTC), volume/amount: cumulative for the day
+TICK_DTYPE = np.dtype([
+    ("ts", "i8"),
+    ("price", "f8"),
+    ("volume", "f8"),
+    ("amount", "f8")
+])
+
+# ts: minute start; volume/amount: traded within the minute
+MINUTE_DTYPE = np.dtype([
+    ("ts", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+    ("amount", "f8")
+])
+
+
+class RingBuffer:
+    """Fixed-capacity structured array; overwrites the oldest record when full."""
+
+    def __init__(self, dtype, capacity):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.head = 0      # next write position
+        self.count = 0
+
+    def append(self, record):
+        self.data[self.head] = record
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last(self):
+        """View of the most recent record (writable, used to update the open minute bar)."""
+        if self.count == 0:
+            return None
+        return self.data[(self.head - 1) % self.capacity]
+
+    def snapshot(self):
+        """Copy of the stored records in chronological order."""
+        if self.count < self.capacity:
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+
+class TickStore:
+    """
+    Thread-safe store written by the quote collector and read by the dashboard.
+    Ticks are de-duplicated (an unchanged quote is not a new tick) and aggregated into
+    1-minute bars as they arrive.
+    """
+
+    def __init__(self, tick_capacity=8192, minute_capacity=1024):
+        self.tick_capacity = tick_capacity
+        self.minute_capacity = minute_capacity
+        self._ticks = {}
+        self._minutes = {}
+        self._latest = {}        # code -> last quote row (dict, fetch_realtime_quotes columns + flags)
+        self._received = {}      # code -> local receive time (epoch seconds)
+        self._lock = threading.Lock()
+
+    def append_quotes(self, realtime_df):
+        """
+        Record a fetch_realtime_quotes() batch. Each stored quote keeps its validation flags
+        (framework.validation) in a "flags" field.
+        Returns: number of new ticks stored.
+        """
+        if realtime_df is None or realtime_df.empty:
+            return 0
+
+        now = time.time()
+        added = 0
+        flags = validate_quotes(realtime_df)
+        with self._lock:
+            for row, flag in zip(realtime_df.to_dict("records"), flags.tolist()):
+                code = row["code"]
+                row["flags"] = flag
+                self._latest[code] = row
+                self._received[code] = now
+                if self._append_tick(code, row):
+                    added += 1
+        return added
+
+    def _append_tick(self, code, row):
+        trade_time = row.get("trade_time")
+        if trade_time is None or pd.isna(trade_time) or not row["close"] > 0:
+            return False
+        ts = int(pd.Timestamp(trade_time).value // 10**9)
+
+        ticks = self._ticks.get(code)
+        if ticks is None:
+            ticks = self._ticks[code] = RingBuffer(TICK_DTYPE, self.tick_capacity)
+            self._minutes[code] = RingBuffer(MINUTE_DTYPE, self.minute_capacity)
+
+        prev = ticks.last()
+        if prev is not None and ts <= prev["ts"]:
+            return False
+
+        price, volume, amount = float(row["close"]), float(row["volume"]), float(row.get("amount", 0.0))
+        ticks.append((ts, price, volume, amount))
+
+        # Cumulative volume resets each session: first tick of a day counts from zero
+        same_day = prev is not None and prev["ts"] // 86400 == ts // 86400
+        vol_delta = max(volume - prev["volume"], 0.0) if same_day else volume
+        amt_delta = max(amount - prev["amount"], 0.0) if same_day else amount
+
+        minutes = self._minutes[code]
+        minute_ts = ts - ts % 60
+        bar = minutes.last()
+        if bar is not None and bar["ts"] == minute_ts:
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += vol_delta
+            bar["amount"] += amt_delta
+        else:
+            minutes.append((minute_ts, price, price, price, price, vol_delta, amt_delta))
+        return True
+
+    # --- Readers ---
+
+    def latest_quotes(self, codes=None, max_age=None):
+        """
+        Latest quote per instrument as a DataFrame (fetch_realtime_quotes columns + flags).
+        max_age: drop quotes received more than max_age seconds ago.
+        """
+        now = time.time()
+        with self._lock:
+            codes = list(self._latest) if codes is None else codes
+            rows = [
+                self._latest[c] for c in codes
+                if c in self._latest and (max_age is None or now - self._received[c] <= max_age)
+            ]
+        return pd.DataFrame(rows)
+
+    def has_fresh(self, codes, max_age):
+        """True if every code has a quote received within max_age seconds (any age if None)."""
+        now = time.time()
+        with self._lock:
+            return all(
+                c in self._received and (max_age is None or now - self._received[c] <= max_age)
+                for c in codes
+            )
+
+    def ticks(self, code):
+        """Stored ticks for an instrument, indexed by exchange time."""
+        with self._lock:
+            buf = self._ticks.get(code)
+            data = buf.snapshot() if buf is not None else np.zeros(0, dtype=TICK_DTYPE)
+        return self._to_frame(data)
+
+    def minute_bars(self, code):
+        """1-minute bars for an instrument (the last one may still be forming)."""
+        with self._lock:
+            buf = self._minutes.get(code)
+            data = buf.snapshot() if buf is not None else np.zeros(0, dtype=MINUTE_DTYPE)
+        return self._to_frame(data)
+
+    def codes(self):
+        with self._lock:
+            return list(self._latest)
+
+    @staticmethod
+    def _to_frame(data):
+        df = pd.DataFrame(data)
+        df.index = pd.to_datetime(df.pop("ts"), unit="s")
+        df.index.name = "time"
+        return df
@@ -3,7 +3,7 @@ Timezone utility module for handling Beijing time (UTC+8).
 Centralizes timezone handling to ensure consistent time operations across the application.
 """
 import pytz
-from datetime import datetime
+from datetime import datetime, time, timedelta
 
 # Beijing timezone constant (Asia/Shanghai = UTC+8)
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
@@ -61,3 +61,51 @@ def get_beijing_datetime_str(format='%Y-%m-%d %H:%M:%S'):
         str: Formatted datetime string in Beijing timezone
     """
     return get_beijing_now().strftime(format)
+
+
+def is_trading_hours(now=None):
+    """
+    Check if the given (or current) Beijing time is within A-share trading hours.
+    
+    Args:
+        now (datetime): Optional datetime to check (default: current Beijing time)
+    
+    Returns:
+        bool: True on weekdays between 9:00-11:30 and 13:00-15:00
+    """
+    now = to_beijing_time(now) if now is not None else get_beijing_now()
+    
+    # Weekend check
+    if now.weekday() >= 5:  # Saturday=5, Sunday=6
+        return False
+    
+    current_time = now.time()
+    return (time(9, 0) <= current_time <= time(11, 30)) or \
+           (time(13, 0) <= current_time <= time(15, 0))
+
+
+def seconds_until_next_session(now=None):
+    """
+    Seconds from the given (or current) Beijing time until the next trading session opens
+    (9:00 or 13:00 on a weekday). Returns 0 while a session is open.
+    Exchange holidays are not known here; callers should back off if quotes stay stale.
+    
+    Args:
+        now (datetime): Optional datetime (default: current Beijing time)
+    
+    Returns:
+        float: Seconds until the next session start
+    """
+    now = to_beijing_time(now) if now is not None else get_beijing_now()
+    if is_trading_hours(now):
+        return 0.0
+    
+    candidate = now
+    for _ in range(8):
+        if candidate.weekday() < 5:
+            for start in (time(9, 0), time(13, 0)):
+                session = candidate.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+                if session > now:
+                    return (session - now).total_seconds()
+        candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return 0.0
@@ -0,0 +1,124 @@
+"""
+A-share stock universe.
+Lists the stocks trading on a given day and bulk-loads their daily bars, either from a
+DataSource or from a local store written by a previous load.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+
+from framework.data_source import to_canonical
+from framework.timezone_utils import get_beijing_now
+
+# Code prefixes of ordinary A shares (main boards, ChiNext, STAR, Beijing); excludes indices/funds/bonds
+A_SHARE_PREFIXES = {
+    "SH": ("600", "601", "603", "605", "688", "689"),
+    "SZ": ("000", "001", "002", "003", "300", "301"),
+    "BJ": ("43", "83", "87", "92")
+}
+
+
+# Listing board by exchange + code prefix (first match wins)
+BOARD_PREFIXES = [
+    ("SH", ("688", "689"), "科创板"),
+    ("SH", ("6",), "沪市主板"),
+    ("SZ", ("30",), "创业板"),
+    ("SZ", ("00",), "深市主板"),
+    ("BJ", ("",), "北交所")
+]
+
+UNCLASSIFIED = "未分类"
+
+
+def is_a_share(instrument):
+    symbol, exchange = instrument.split(".")
+    return symbol.startswith(A_SHARE_PREFIXES.get(exchange, ()))
+
+
+def board_of(instrument):
+    symbol, exchange = instrument.split(".")
+    for ex, prefixes, board in BOARD_PREFIXES:
+        if exchange == ex and symbol.startswith(prefixes):
+            return board
+    return UNCLASSIFIED
+
+
+def fetch_sectors(loader=None):
+    """
+    Industry (CSRC classification via Baostock) and listing board per stock.
+    Returns: DataFrame indexed by instrument with [name, industry, board]; empty on failure.
+    """
+    if loader is None:
+        from framework.data_loader import BaostockLoader
+        loader = BaostockLoader()
+    df = loader.fetch_stock_industry()
+    if df.empty:
+        return pd.DataFrame(columns=["name", "industry", "board"])
+    out = pd.DataFrame({
+        "name": df["code_name"].to_numpy(),
+        "industry": df["industry"].replace("", UNCLASSIFIED).to_numpy()
+    }, index=pd.Index(df["code"].map(to_canonical), name="instrument"))
+    out["board"] = out.index.map(board_of)
+    return out[out.index.map(is_a_share).to_numpy(dtype=bool)]
+
+
+def fetch_universe(date=None, loader=None, max_lookback_days=10):
+    """
+    Listed A shares trading on `date` (default: the latest trading day).
+    Returns: DataFrame [instrument, name] with canonical IDs; empty on failure.
+    """
+    if loader is None:
+        from framework.data_loader import BaostockLoader
+        loader = BaostockLoader()
+
+    day = pd.Timestamp(date) if date else pd.Timestamp(get_beijing_now().date())
+    for _ in range(max_lookback_days):
+        df = loader.fetch_stock_list(day.strftime('%Y-%m-%d'))
+        if not df.empty:
+            break
+        # Weekends/holidays return an empty list: walk back to the last trading day
+        day -= timedelta(days=1)
+    else:
+        return pd.DataFrame(columns=["instrument", "name"])
+
+    df = df[df["tradeStatus"] == "1"]
+    out = pd.DataFrame({
+        "instrument": df["code"].map(to_canonical),
+        "name": df["code_name"]
+    })
+    return out[out["instrument"].map(is_a_share)].reset_index(drop=True)
+
+
+def load_bars(instruments, source, count=300, workers=16):
+    """
+    Daily bars for many instruments, fetched concurrently (I/O bound, so threads).
+    Returns: {instrument: DataFrame in the canonical bar schema}; failed instruments are omitted.
+    """
+    def fetch(instrument):
+        try:
+            return instrument, source.daily_bars(instrument, count=count)
+        except Exception as e:
+            print(f"Failed to load {instrument}: {e}")
+            return instrument, None
+
+    bars = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for instrument, df in pool.map(fetch, instruments):
+            if df is not None and not df.empty:
+                bars[instrument] = df
+    return bars
+
+
+def save_bars(bars, path):
+    """Store a load_bars() result locally so later scans need no network."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pd.to_pickle(bars, path)
+
+
+def load_stored_bars(path):
+    """Bars written by save_bars(), or an empty dict if the store does not exist."""
+    if not os.path.exists(path):
+        return {}
+    return pd.read_pickle(path)
@@ -0,0 +1,163 @@
+"""
+Local HTTP stand-in for the Tencent quote/K-line endpoints, serving a SyntheticMarket.
+Point the loaders at it and throughput/latency benchmarks run fully offline:
+
+    python -m framework.upstream_standin --port 8900 --instruments 5000
+    AMARKET_TENCENT_BASE_URL=http://127.0.0.1:8900 python api_server.py
+
+Routes (same paths and payloads as the real hosts):
+    /q=sh000001,sz399001                                  quote text
+    /appstock/app/fqkline/get?param=sh000001,day,,,300,qfq  daily/weekly/monthly K-lines
+    /appstock/app/kline/mkline?param=sh000001,m1,,320       minute K-lines
+    /__stats                                              request counters (JSON)
+Optional --latency-ms / --error-rate inject upstream slowness and failures.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from framework.synthetic import SyntheticMarket
+from framework.tencent_loader import BASE_URL_ENV
+
+
+class StandinStats:
+    """Thread-safe request counters per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.instruments = {}
+            self.errors = 0
+            self.started = time.time()
+
+    def record(self, endpoint, codes):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.instruments[endpoint] = self.instruments.get(endpoint, 0) + len(codes)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "instruments": dict(self.instruments),
+                "errors": self.errors,
+                "seconds": time.time() - self.started
+            }
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, market, latency_ms=0, error_rate=0.0):
+        self.market = market
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.stats = StandinStats()
+        super().__init__(address, StandinHandler)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+
+        if path == "/__stats":
+            self._send(200, json.dumps(server.stats.snapshot()), "application/json")
+            return
+        if path == "/__reset":
+            server.stats.reset()
+            self._send(200, "{}", "application/json")
+            return
+
+        if server.latency_ms:
+            time.sleep(random.expovariate(1.0 / server.latency_ms) / 1000)
+        if server.error_rate and random.random() < server.error_rate:
+            server.stats.record_error()
+            self._send(502, "upstream error", "text/plain")
+            return
+
+        market = server.market
+        try:
+            if path.startswith("/q="):
+                codes = [c for c in path[3:].split(",") if c]
+                server.stats.record("quote", codes)
+                self._send(200, market.tencent_quotes_text(codes), "text/plain; charset=utf-8")
+            elif path == "/appstock/app/fqkline/get":
+                code, period, _, _, count, *fq = parse_qs(parts.query)["param"][0].split(",")
+                server.stats.record("kline", [code])
+                self._send(200, market.fqkline_json(code, period, int(count or 300), fq=fq[0] if fq else "qfq"),
+                           "application/json")
+            elif path == "/appstock/app/kline/mkline":
+                code, period, _, count = parse_qs(parts.query)["param"][0].split(",")[:4]
+                server.stats.record("mkline", [code])
+                self._send(200, market.mkline_json(code, int(period[1:]), int(count or 320)), "application/json")
+            else:
+                self._send(404, "not found", "text/plain")
+        except (KeyError, ValueError) as e:
+            server.stats.record_error()
+            self._send(400, f"bad request: {e}", "text/plain")
+
+
+def start_standin(market=None, host="127.0.0.1", port=0, latency_ms=0, error_rate=0.0):
+    """Serve in a daemon thread (port 0 picks a free port). Returns: the server; call shutdown() to stop."""
+    server = StandinServer((host, port), market or SyntheticMarket(), latency_ms, error_rate)
+    threading.Thread(target=server.serve_forever, name="upstream-standin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Tencent market data endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--instruments", type=int, default=5000, help="synthetic stocks (indices are added)")
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0, help="mean injected latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 502")
+    args = parser.parse_args()
+
+    market = SyntheticMarket(args.instruments, args.years, args.seed)
+    server = StandinServer((args.host, args.port), market, args.latency_ms, args.error_rate)
+    print(f"Serving {len(market.instruments)} synthetic instruments at {server.base_url}")
+    print(f"Use: {BASE_URL_ENV}={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Ingestion-time validation of OHLCV series and quotes.
+
+Data is checked once when it enters a store (the analyzer's daily state, the macro store,
+the tick store) and the result is kept next to it as one uint8 bit mask per row, so charts
+and indicators test bits instead of rescanning the data on every render:
+    ZERO_VOLUME / MISSING_VOLUME   no trading reported (suspension, placeholder bar, gap in the feed)
+    UNIT_JUMP                      value off by a unit factor (hands vs shares, 万 vs Yuan)
+    STALE                          bar identical to the previous one, or quote lagging the batch
+    DUPLICATE_DAY                  date repeated (all but the last occurrence are flagged)
+    GAP                            trading days missing before this row
+    OUTLIER_RETURN                 close-to-close move beyond any A-share price limit
+All checks are vectorized over the whole frame.
+"""
+import numpy as np
+import pandas as pd
+
+ZERO_VOLUME = 1
+MISSING_VOLUME = 2
+UNIT_JUMP = 4
+STALE = 8
+DUPLICATE_DAY = 16
+GAP = 32
+OUTLIER_RETURN = 64
+
+FLAG_NAMES = {
+    ZERO_VOLUME: "zero_volume",
+    MISSING_VOLUME: "missing_volume",
+    UNIT_JUMP: "unit_jump",
+    STALE: "stale",
+    DUPLICATE_DAY: "duplicate_day",
+    GAP: "gap",
+    OUTLIER_RETURN: "outlier_return"
+}
+
+# Rows without usable volume (excluded from volume charts and volume averages)
+NO_VOLUME = ZERO_VOLUME | MISSING_VOLUME
+
+# Volume this many times above/below the trailing median is a unit change, not trading
+UNIT_JUMP_RATIO = 50
+UNIT_WINDOW = 20
+
+# Widest daily limit is 20% (ChiNext/STAR); Beijing (30%) and first-day listings need a higher bound
+MAX_RETURN_PCT = 21.0
+
+# Without a trading calendar, more missing weekdays than the longest holiday closure is a gap
+MAX_HOLIDAY_WEEKDAYS = 7
+
+# A quote whose exchange time trails the newest one in its batch by this much is stale
+STALE_QUOTE_SECONDS = 300
+
+_BITS = np.array(list(FLAG_NAMES), dtype="uint8")
+
+
+def validate_bars(df, calendar=None, max_return_pct=MAX_RETURN_PCT, unit_jump_ratio=UNIT_JUMP_RATIO):
+    """
+    Flag every row of a bar frame (canonical bar schema, DatetimeIndex).
+    calendar: trading days (DatetimeIndex) for exact gap detection, e.g. an index's dates;
+    without it only gaps longer than MAX_HOLIDAY_WEEKDAYS weekdays are flagged.
+    Returns: uint8 Series "flags" aligned with df.
+    """
+    n = len(df)
+    flags = np.zeros(n, dtype="uint8")
+    if n == 0:
+        return pd.Series(flags, index=df.index, name="flags")
+
+    volume = df["volume"].to_numpy(dtype="float64") if "volume" in df.columns else np.full(n, np.nan)
+    flags[np.isnan(volume)] |= MISSING_VOLUME
+    flags[volume == 0] |= ZERO_VOLUME
+
+    # Unit jumps: traded volume against the median of the previous UNIT_WINDOW traded days
+    traded = np.where(volume > 0, volume, np.nan)
+    median = pd.Series(traded).rolling(UNIT_WINDOW, min_periods=5).median().shift(1).to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = traded / median
+    flags[(ratio > unit_jump_ratio) | (ratio < 1.0 / unit_jump_ratio)] |= UNIT_JUMP
+
+    # Stale: the provider repeated the previous bar verbatim on a new date
+    days = df.index.values.astype("datetime64[D]")
+    columns = [c for c in ("open", "high", "low", "close", "volume") if c in df.columns]
+    values = df[columns].to_numpy(dtype="float64")
+    flags[1:][np.all(values[1:] == values[:-1], axis=1) & (days[1:] != days[:-1])] |= STALE
+
+    flags[df.index.duplicated(keep="last")] |= DUPLICATE_DAY
+
+    if calendar is not None:
+        trading = pd.DatetimeIndex(calendar).values.astype("datetime64[D]")
+        position = np.searchsorted(trading, days)
+        missing = np.diff(position) - 1
+        flags[1:][(missing > 0) & (days[:-1] >= trading[0]) & (days[1:] <= trading[-1])] |= GAP
+    else:
+        missing = np.busday_count(days[:-1], days[1:]) - 1
+        flags[1:][missing > MAX_HOLIDAY_WEEKDAYS] |= GAP
+
+    close = df["close"].to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret = np.abs(close[1:] / close[:-1] - 1) * 100
+    outlier = np.zeros(n, dtype=bool)
+    outlier[1:] = ret > max_return_pct
+    if "pctChg" in df.columns:
+        outlier |= np.abs(df["pctChg"].to_numpy(dtype="float64")) > max_return_pct
+    flags[outlier] |= OUTLIER_RETURN
+
+    return pd.Series(flags, index=df.index, name="flags")
+
+
+def refresh_last(flags, df, max_return_pct=MAX_RETURN_PCT):
+    """
+    Re-check the live (last) row after an in-place quote update, in O(1).
+    Only the volume and return bits can change while a bar is forming.
+    """
+    if not len(flags):
+        return flags
+    volume = float(df["volume"].iat[-1])
+    pct_chg = float(df["pctChg"].iat[-1]) if "pctChg" in df.columns else np.nan
+    bits = int(flags.iat[-1]) & ~(NO_VOLUME | OUTLIER_RETURN)
+    if np.isnan(volume):
+        bits |= MISSING_VOLUME
+    elif volume == 0:
+        bits |= ZERO_VOLUME
+    if abs(pct_chg) > max_return_pct:
+        bits |= OUTLIER_RETURN
+    flags.iat[-1] = bits
+    return flags
+
+
+def validate_quotes(quotes, stale_seconds=STALE_QUOTE_SECONDS):
+    """
+    Flag a quote batch (canonical quote schema): no volume / no price, and exchange times
+    lagging the newest quote of the batch by more than stale_seconds.
+    Returns: uint8 array aligned with the rows.
+    """
+    n = len(quotes)
+    flags = np.zeros(n, dtype="uint8")
+    if n == 0:
+        return flags
+    volume = quotes["volume"].to_numpy(dtype="float64")
+    price = quotes["close"].to_numpy(dtype="float64")
+    flags[np.isnan(volume) | ~(price > 0)] |= MISSING_VOLUME
+    flags[volume == 0] |= ZERO_VOLUME
+
+    trade_time = pd.to_datetime(quotes["trade_time"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    known = ~np.isnat(trade_time)
+    if known.any():
+        lag = (trade_time[known].max() - trade_time) / np.timedelta64(1, "s")
+        flags[known & (lag > stale_seconds)] |= STALE
+    return flags
+
+
+def fix_unit_jumps(values, reference, low=0.01, high=3.0, factor=1e4):
+    """
+    Per-row unit correction of a series against a reference of similar magnitude (e.g. SZSE
+    vs SSE margin balance): rows whose ratio falls below `low` were reported in 万 and are
+    multiplied by `factor`, rows above `high` are divided by it.
+    Returns: (corrected float array, uint8 flags with UNIT_JUMP on corrected rows)
+    """
+    values = np.asarray(values, dtype="float64")
+    reference = np.asarray(reference, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(reference > 0, values / reference, np.nan)
+    too_small, too_large = ratio < low, ratio > high
+    fixed = np.where(too_small, values * factor, np.where(too_large, values / factor, values))
+    flags = np.where(too_small | too_large, UNIT_JUMP, 0).astype("uint8")
+    return fixed, flags
+
+
+def summarize(flags):
+    """Rows per flag name (only flags that occur)."""
+    flags = np.asarray(flags, dtype="uint8")
+    counts = ((flags[:, None] & _BITS) != 0).sum(axis=0)
+    return {FLAG_NAMES[int(bit)]: int(c) for bit, c in zip(_BITS, counts) if c}
+
+
+def flag_names(value):
+    """Names of the bits set in one flag value."""
+    return [name for bit, name in FLAG_NAMES.items() if int(value) & bit]
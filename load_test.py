@@ -0,0 +1,217 @@
+"""
+Concurrent-viewer load test for the Streamlit dashboard (app.py), fully offline.
+
+Each simulated viewer is a Streamlit AppTest session that reruns app.py every `interval`
+seconds, so the whole rerun cycle (get_analysis cache hits/misses, chart building and
+element serialization) runs as it does on a server. Upstream traffic goes to the local
+Tencent stand-in, AkShare calls to FakeAkShare and AI commentary to the stand-in model,
+so results only depend on this host.
+AppTest swaps process-wide state (the runtime instance, st.secrets) around each run, so the
+sessions' reruns are executed one at a time; a rerun's latency includes the wait for the
+reruns queued before it, as on a server whose reruns contend for one interpreter.
+
+Reports per level of concurrent sessions:
+    - per-rerun latency percentiles (first rerun of a session separately: it is the cold one)
+    - CPU: process cores busy per session and CPU milliseconds per rerun
+    - memory: RSS growth per session
+    - upstream requests per endpoint, per rerun
+
+Usage:
+    python load_test.py --sessions 1,5,10,20 --reruns 10 --interval 5
+    python load_test.py --sessions 20 --max-p95-ms 2000 --json report.json   # fails on regression
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PERCENTILES = (50, 90, 95, 99)
+
+# AppTest.run() is not thread-safe: overlapping runs reset each other's runtime and secrets
+_APPTEST_LOCK = threading.Lock()
+
+
+def rss_bytes():
+    """Current resident set size (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def latency_summary(seconds):
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1000
+    out = {f"p{q}": float(np.percentile(ms, q)) for q in PERCENTILES}
+    out["max"] = float(ms.max())
+    out["count"] = len(ms)
+    return out
+
+
+class UpstreamCounter:
+    """Reads the stand-in's request counters over HTTP (works for in-process or external stand-ins)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def reset(self):
+        requests.get(f"{self.base_url}/__reset", timeout=5)
+
+    def snapshot(self):
+        return requests.get(f"{self.base_url}/__stats", timeout=5).json()
+
+
+def run_session(app_path, reruns, interval, timeout):
+    """One viewer: `reruns` reruns spaced `interval` seconds apart. Returns: (latencies, errors)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    # The scratch workdir has no secrets.toml and app.py's `in st.secrets` check raises without
+    # one; any entry will do (no GEMINI_API_KEY: commentary uses the stand-in model)
+    at.secrets["AMARKET_LOAD_TEST"] = "1"
+    latencies, errors = [], []
+    for i in range(reruns):
+        started = time.perf_counter()
+        try:
+            with _APPTEST_LOCK:
+                at.run()
+            if at.exception:
+                errors.append(at.exception[0].value)
+        except Exception as e:
+            errors.append(str(e))
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        if i < reruns - 1:
+            time.sleep(max(interval - elapsed, 0))
+    return latencies, errors
+
+
+def run_level(sessions, reruns, interval, timeout, upstream, app_path=APP_PATH):
+    """Run `sessions` concurrent viewers and measure the level as a whole."""
+    upstream.reset()
+    rss_before = rss_bytes()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="viewer") as pool:
+        futures = [pool.submit(run_session, app_path, reruns, interval, timeout) for _ in range(sessions)]
+        results = [f.result() for f in futures]
+
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    rss_after = rss_bytes()
+    stats = upstream.snapshot()
+
+    cold = [lat[0] for lat, _ in results if lat]
+    warm = [x for lat, _ in results for x in lat[1:]]
+    errors = [e for _, errs in results for e in errs]
+    total_reruns = sessions * reruns
+    return {
+        "sessions": sessions,
+        "reruns": total_reruns,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "latency_ms": latency_summary(cold + warm),
+        "cold_latency_ms": latency_summary(cold),
+        "warm_latency_ms": latency_summary(warm),
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "cores_busy": cpu / wall if wall else 0.0,
+        "cores_per_session": cpu / wall / sessions if wall else 0.0,
+        "cpu_ms_per_rerun": cpu / total_reruns * 1000,
+        "rss_mb": rss_after / 2 ** 20,
+        "rss_mb_per_session": (rss_after - rss_before) / 2 ** 20 / sessions,
+        "upstream_requests": stats["requests"],
+        "upstream_errors": stats["errors"],
+        "upstream_requests_per_rerun": sum(stats["requests"].values()) / total_reruns
+    }
+
+
+def print_level(report):
+    lat, cold = report["latency_ms"], report["cold_latency_ms"]
+    print(f"--- {report['sessions']} sessions, {report['reruns']} reruns, {report['errors']} errors ---")
+    if lat:
+        print("  rerun latency ms: " + "  ".join(f"p{q}={lat[f'p{q}']:.0f}" for q in PERCENTILES) +
+              f"  max={lat['max']:.0f}  (cold p50={cold.get('p50', float('nan')):.0f})")
+    print(f"  CPU: {report['cores_busy']:.2f} cores busy, {report['cores_per_session']:.3f} cores/session, "
+          f"{report['cpu_ms_per_rerun']:.0f} ms/rerun")
+    print(f"  memory: {report['rss_mb']:.0f} MB RSS, +{report['rss_mb_per_session']:.1f} MB/session")
+    print(f"  upstream: {report['upstream_requests']} ({report['upstream_requests_per_rerun']:.2f}/rerun, "
+          f"{report['upstream_errors']} injected errors)")
+    if report["first_error"]:
+        print(f"  first error: {report['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test app.py with concurrent simulated viewers")
+    parser.add_argument("--sessions", default="1,5,10", help="comma-separated concurrency levels")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns per session")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between a session's reruns")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout")
+    parser.add_argument("--instruments", type=int, default=5000, help="synthetic market size")
+    parser.add_argument("--latency-ms", type=float, default=30, help="mean injected upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="injected upstream error rate")
+    parser.add_argument("--upstream", default=None, help="use an already running stand-in at this URL")
+    parser.add_argument("--workdir", default=None, help="directory for the app's data/ (default: temporary)")
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="exit 1 if any level's p95 exceeds this")
+    args = parser.parse_args()
+
+    from core.commentary import STANDIN_ENV
+    from framework.synthetic import FakeAkShare, SyntheticMarket
+    from framework.tencent_loader import BASE_URL_ENV
+    from framework.upstream_standin import start_standin
+
+    market = SyntheticMarket(args.instruments)
+    if args.upstream:
+        base_url = args.upstream
+    else:
+        server = start_standin(market, latency_ms=args.latency_ms, error_rate=args.error_rate)
+        base_url = server.base_url
+    # Set before the app (and its loaders) is first imported by AppTest
+    os.environ[BASE_URL_ENV] = base_url
+    # Per-board/sector commentary runs against the local stand-in model
+    os.environ[STANDIN_ENV] = "1"
+    FakeAkShare(market).install()
+
+    # Journal/macro caches go to a scratch data/ so runs do not touch the real stores
+    json_path = os.path.abspath(args.json) if args.json else None
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="amarket-load-"))
+    upstream = UpstreamCounter(base_url)
+
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+    print(f"Upstream stand-in: {base_url} ({len(market.instruments)} instruments), data dir: {os.getcwd()}")
+    reports = []
+    for sessions in levels:
+        report = run_level(sessions, args.reruns, args.interval, args.timeout, upstream)
+        print_level(report)
+        reports.append(report)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, default=str)
+
+    if args.max_p95_ms is not None:
+        worst = max((r["latency_ms"].get("p95", 0) for r in reports), default=0)
+        if worst > args.max_p95_ms:
+            print(f"FAIL: p95 rerun latency {worst:.0f} ms exceeds {args.max_p95_ms:.0f} ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()